@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Builds the reachability maps of HERB's arms. The maps are saved where
+WAM.GetReachabilityMap looks for them unless an output directory is given.
+"""
+import argparse, herbpy, logging, os
+from herbpy.reachability import GetDefaultPath, ReachabilityMap
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='build reachability maps for HERB')
+    parser.add_argument('--arms', nargs='+', default=['left_arm', 'right_arm'],
+                        help='arms to build maps for')
+    parser.add_argument('--resolution', type=float, default=0.05,
+                        help='edge length of a grid cell, in meters')
+    parser.add_argument('--num-directions', type=int, default=24,
+                        help='number of approach directions')
+    parser.add_argument('--num-rolls', type=int, default=4,
+                        help='number of rolls about each approach direction')
+    parser.add_argument('--output-dir', type=str,
+                        help='output directory; defaults to the herbpy cache')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    env, robot = herbpy.initialize(sim=True)
+
+    for arm_name in args.arms:
+        manip = getattr(robot, arm_name)
+        manip.WaitForIK()
+
+        reachability = ReachabilityMap.Generate(
+            manip, resolution=args.resolution,
+            num_directions=args.num_directions, num_rolls=args.num_rolls)
+
+        path = GetDefaultPath(manip)
+        if args.output_dir is not None:
+            path = os.path.join(args.output_dir, os.path.basename(path))
+        reachability.Save(path)
+        print('Saved the reachability map of {:s} to {:s}'.format(arm_name, path))
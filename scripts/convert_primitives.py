@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+"""
+Converts a YAML primitives file of the base planner, e.g.
+config/base_planner_parameters.yaml, to the binary format of
+herbpy.primitives. HERBRobot does this automatically the first time it loads
+a changed YAML file; this script is for converting files ahead of time.
+"""
+import argparse
+from herbpy.primitives import GetCachePath, PrimitiveSet
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='convert base planner primitives to the binary format')
+    parser.add_argument('yaml_file', type=str,
+                        help='YAML primitives file')
+    parser.add_argument('--output', type=str,
+                        help='output path; defaults to the herbpy cache')
+    args = parser.parse_args()
+
+    primitives = PrimitiveSet.LoadYaml(args.yaml_file)
+    path = args.output if args.output is not None else GetCachePath(args.yaml_file)
+    primitives.Save(path)
+    print('Wrote {:d} primitives to {:s}'.format(primitives.num_primitives, path))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Evaluates hand poses and preshapes on an object and saves the results as a
+grasp table that TSR factories can query. The table is saved where
+herbpy.graspeval.GetDefaultPath looks for it unless an output path is given.
+"""
+import argparse, herbpy, logging, numpy
+from herbpy.graspeval import EvaluateGrasps, GetDefaultPath, LoadPreshapes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='evaluate grasps for HERB')
+    parser.add_argument('object', type=str,
+                        help='URI of the object, e.g. a KinBody XML file')
+    parser.add_argument('poses', type=str,
+                        help='.npy file of (N, 4, 4) end-effector poses in'
+                             ' the object frame')
+    parser.add_argument('--arm', type=str, default='right_arm',
+                        help='arm whose hand is evaluated')
+    parser.add_argument('--preshapes', nargs='+',
+                        help='preshapes to evaluate; defaults to all')
+    parser.add_argument('--processes', type=int,
+                        help='number of worker processes; defaults to the'
+                             ' number of CPUs')
+    parser.add_argument('--output', type=str,
+                        help='output path; defaults to the herbpy cache')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    env, robot = herbpy.initialize(sim=True)
+
+    with env:
+        obj = env.ReadKinBodyURI(args.object)
+        if obj is None:
+            raise ValueError('Failed loading object from "{:s}".'.format(
+                             args.object))
+        env.Add(obj)
+
+    poses = numpy.load(args.poses)
+    table = EvaluateGrasps(getattr(robot, args.arm), obj, poses,
+                           preshapes=LoadPreshapes(names=args.preshapes),
+                           processes=args.processes)
+
+    path = args.output if args.output is not None else GetDefaultPath(obj)
+    table.Save(path)
+    print('Saved {:d} grasps of {:s} to {:s}'.format(
+          int((~table.collision).sum()), obj.GetName(), path))
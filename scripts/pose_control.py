@@ -29,8 +29,9 @@ if __name__ == '__main__':
             robot.Wave()
         elif user_input == 0:
             print 'Reset to relaxed home'
-            robot.right_arm.SetStiffness(1)
-            robot.left_arm.SetStiffness(1)
+            with robot.ControllerTransaction():
+                robot.right_arm.SetStiffness(1)
+                robot.left_arm.SetStiffness(1)
             robot.right_arm.PlanToNamedConfiguration('relaxed_home', execute=True)
             robot.left_arm.PlanToNamedConfiguration('relaxed_home', execute=True)
             robot.right_hand.OpenHand()
@@ -1,4 +1,4 @@
-import openravepy, time, math, numpy
+import openravepy, math
 from prpy.action import ActionMethod
 
 @ActionMethod
@@ -55,14 +55,11 @@ def MoveCupAndPour(robot, table, manip_pitcher, manip_cup, cup, pitcher):
 
     # Pour
     # slow the arm down
-    v = numpy.array([0.75, 0.75, 2., 2., 2.5, 2.5, 2.5])
-    with robot.CreateRobotStateSaver(openravepy.KinBody.SaveParameters.JointMaxVelocityAndAcceleration):
-        manip_pitcher.SetVelocityLimits(0.5*v, 0.3)
-
+    with manip_pitcher.UseLimitProfile('pour'):
         #Gets position of the pitcher and pours
         traj = robot.PostProcessPath(traj)
         robot.ExecuteTrajectory(traj)
-        time.sleep(1) #To let the water pour from pitcher into cup
+        robot.clock.Sleep(1) #To let the water pour from pitcher into cup
 
     # Tilts pitcher back to original position
     robot.ExecuteTrajectory(openravepy.planningutils.ReverseTrajectory(traj))
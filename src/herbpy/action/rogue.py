@@ -1,7 +1,7 @@
 import logging, openravepy, prpy
 from prpy.action import ActionMethod
 from prpy.util import FindCatkinResource, GetPointFrom
-import numpy, time
+import numpy
 
 logger = logging.getLogger('herbpy')
 
@@ -192,7 +192,7 @@ def Exhibit(robot, obj, manip=None, distance=0.1, wait=2, release=True, render=T
             robot.PlanToTSR(lift_tsr, execute=True)
 
         #Wait for 'time'
-        time.sleep(wait)
+        robot.clock.Sleep(wait)
 
         #'Unlift' the object, so place it back down
         unlift_tsr = robot.tsrlibrary(obj, 'lift', manip, distance=-distance)
@@ -205,41 +205,49 @@ def Exhibit(robot, obj, manip=None, distance=0.1, wait=2, release=True, render=T
         manip.hand.OpenHand()
         manip.PlanToConfiguration(preconfig)
 
+def _Nod(robot, velocity, pause=0.15, inc=4):
+    """
+    @param robot The robot being used to nod
+    @param velocity Pan and tilt velocity of the first sweep, in radians per
+                    second; the head sweeps back and forth around its start
+    @param pause Duration of each servo command, in seconds
+    @param inc Number of servo commands of the first sweep
+    """
+    velocity = numpy.array(velocity, dtype='float')
+    sweeps = [(velocity, inc), (-velocity, inc*3), (velocity, inc*2)]
+
+    # Servo steps are not scaled in instant mode and the clock does not
+    # wait, so the head would not move. Set the pose it ends at instead.
+    if robot.clock.IsInstant():
+        dof_indices = robot.head.GetArmIndices()
+        with robot.GetEnv():
+            lower, upper = robot.GetDOFLimits(dof_indices)
+            dof_values = robot.GetDOFValues(dof_indices)
+            for sweep_velocity, num_steps in sweeps:
+                for i in xrange(num_steps):
+                    dof_values = numpy.clip(
+                        dof_values + pause*sweep_velocity, lower, upper)
+            robot.SetDOFValues(dof_values, dof_indices)
+        return
+
+    for sweep_velocity, num_steps in sweeps:
+        for i in xrange(num_steps):
+            robot.head.Servo(sweep_velocity)
+            robot.clock.Sleep(pause)
+
 @ActionMethod
 def NodYes(robot):
     """
     @param robot The robot being used to nod
     """
-    pause = 0.15
-    inc = 4
-
-    for i in xrange(inc):
-        robot.head.Servo([0, 1])
-        time.sleep(pause)
-    for i in xrange((inc*3)):
-        robot.head.Servo([0, -1])
-        time.sleep(pause)
-    for i in xrange((inc*2)):
-        robot.head.Servo([0, 1])
-        time.sleep(pause)
+    _Nod(robot, [0, 1])
 
 @ActionMethod
 def NodNo(robot):
     """
     @param robot The robot being used to nod
     """
-    pause = 0.15
-    inc = 4
-
-    for i in xrange(inc):
-        robot.head.Servo([1, 0])
-        time.sleep(pause)
-    for i in xrange((inc*3)):
-        robot.head.Servo([-1, 0])
-        time.sleep(pause)
-    for i in xrange((inc*2)):
-        robot.head.Servo([1, 0])
-        time.sleep(pause)
+    _Nod(robot, [1, 0])
 
 @ActionMethod
 def HaltHand(robot, manip=None):
@@ -33,7 +33,6 @@ from prpy import util
 from prpy.base.endeffector import EndEffector
 from prpy.controllers import (
     PositionCommandController, TriggerController)
-from geometry_msgs.msg import WrenchStamped
 
 
 class BarrettHand(EndEffector):
@@ -84,9 +83,16 @@ class BarrettHand(EndEffector):
                                                      simulated=sim)
 
         self.ft_simulated = ft_sim
+
+        # Optional object with a GetForceTorque() method that replaces the
+        # sensor, e.g. a herbpy.recording.ReplayForceTorqueSource.
+        self.ft_source = None
         self.ft_tare_controller = TriggerController('', self.hand_side +
                                                     '_tare_controller',
                                                     ft_sim)
+        self.ft_subscriber = None
+        self.ft_guard = None
+        self.closing_simulator = None
 
         # TODO tactile sensors
 
@@ -135,10 +141,16 @@ class BarrettHand(EndEffector):
         preshape[2] = f3 if f3 is not None else curr_pos[2]
         preshape[3] = spread if spread is not None else curr_pos[3]
 
+        if not self.simulated:
+            robot = self.manipulator.GetRobot()
+            with robot.ControllerTransaction() as transaction:
+                transaction.RequestHand(self)
+                transaction.Commit()
+
         self.controller.SetDesired(preshape)
         util.WaitForControllers([self.controller], timeout=timeout)
 
-    def OpenHand(hand, spread=None, timeout=None):
+    def OpenHand(hand, spread=None, timeout=None, bodies=None):
         """Open the hand with a fixed spread.
         This function blocks until the hand has reached the desired
         configuration or a timeout occurs. Specifying a timeout of a finishes.
@@ -147,20 +159,20 @@ class BarrettHand(EndEffector):
         simulation and will stop if it collides with the environment.
         @param spread hand spread in radians; defaults to the current spread
         @param timeout blocking execution timeout, in seconds
+        @param bodies bodies the fingers are checked against in simulation;
+                      defaults to all other bodies in the environment
+        @return herbpy.fingersim.ClosingResult in simulation, otherwise None
         """
         if hand.simulated:
-            robot = hand.manipulator.GetRobot()
-            p = openravepy.KinBody.SaveParameters
-
-            with robot.CreateRobotStateSaver(p.ActiveDOF | p.ActiveManipulator):
-                hand.manipulator.SetActive()
-                robot.task_manipulation.ReleaseFingers()
-
+            result = hand.GetClosingSimulator().Open(bodies=bodies,
+                                                     spread=spread)
+            hand.controller.SetDesired(result.dof_values)
             util.WaitForControllers([hand.controller], timeout=timeout)
+            return result
         else:
             hand.MoveHand(f1=0.0, f2=0.0, f3=0.0, spread=spread, timeout=timeout)
 
-    def CloseHand(hand, spread=None, timeout=None):
+    def CloseHand(hand, spread=None, timeout=None, bodies=None):
         """Close the hand with a fixed spread.
         This function blocks until the hand has reached the desired
         configuration or a timeout occurs. Specifying a timeout of a finishes.
@@ -169,19 +181,29 @@ class BarrettHand(EndEffector):
         simulation and will stop if it collides with the environment.
         @param spread hand spread in radians; defaults to the current spread
         @param timeout blocking execution timeout, in seconds
+        @param bodies bodies the fingers are checked against in simulation,
+                      e.g. the object being grasped; defaults to all other
+                      bodies in the environment
+        @return herbpy.fingersim.ClosingResult in simulation, otherwise None
         """
         if hand.simulated:
-            robot = hand.manipulator.GetRobot()
-            p = openravepy.KinBody.SaveParameters
-
-            with robot.CreateRobotStateSaver(p.ActiveDOF | p.ActiveManipulator):
-                hand.manipulator.SetActive()
-                robot.task_manipulation.CloseFingers()
-
+            result = hand.GetClosingSimulator().Close(bodies=bodies,
+                                                      spread=spread)
+            hand.controller.SetDesired(result.dof_values)
             util.WaitForControllers([hand.controller], timeout=timeout)
+            return result
         else:
             hand.MoveHand(f1=3.2, f2=3.2, f3=3.2, spread=spread, timeout=timeout)
 
+    def GetClosingSimulator(hand):
+        """Get the simulator that computes where the fingers stop.
+        @return herbpy.fingersim.FingerClosingSimulator
+        """
+        if hand.closing_simulator is None:
+            from .fingersim import FingerClosingSimulator
+            hand.closing_simulator = FingerClosingSimulator(hand)
+        return hand.closing_simulator
+
     def ResetHand(hand):
         """Reset the hand.
         This calls a low-level service to drive the fingers open with constant
@@ -229,24 +251,112 @@ class BarrettHand(EndEffector):
         was tared using \ref TareForceTorqueSensor.
         @return force,torque force/torque in the hand frame
         """
-        if not hand.ft_simulated:
-            import rospy
-            sensor_data = rospy.wait_for_message(hand.bhd_namespace +
-                                                 '/ft_wrench',
-                                                 WrenchStamped)
-            return sensor_data.wrench.force, sensor_data.wrench.torque
+        if hand.ft_source is not None:
+            return hand.ft_source.GetForceTorque()
+        elif not hand.ft_simulated:
+            return hand.GetForceTorqueSubscriber().GetForceTorque()
         else:
             return numpy.zeros(3), numpy.zeros(3)
 
-    def TareForceTorqueSensor(hand):
+    def TareForceTorqueSensor(hand, soft=False):
         """Tare the force/torque sensor.
         This is necessary before using the force/torque sensor. It is generally
         wise to tare the sensor whenever the orientation of the end-effector
         has significantly changed. This function may take several seconds to
-        return as it blocks until the tare is complete.
-        complete.
+        return as it blocks until the tare is complete. Use
+        \ref TareForceTorqueSensorAsync to tare several sensors at once.
+        @param soft zero the readings in software with
+                    \ref SoftTareForceTorqueSensor instead
+        """
+        hand.TareForceTorqueSensorAsync(soft=soft).result()
+
+    def TareForceTorqueSensorAsync(hand, soft=False):
+        """Start taring the force/torque sensor without blocking.
+        @param soft zero the readings in software with
+                    \ref SoftTareForceTorqueSensor instead
+        @return herbpy.forcetorque.TareFuture that finishes with the tare
+        """
+        from .forcetorque import TareFuture
+
+        if soft:
+            return TareFuture(hand.SoftTareForceTorqueSensor,
+                              name=hand.GetName() + '_soft_tare')
+
+        if not hand.ft_simulated:
+            robot = hand.manipulator.GetRobot()
+            with robot.ControllerTransaction() as transaction:
+                transaction.RequestTare(hand)
+                transaction.Commit()
+
+        def Tare():
+            hand.ft_tare_controller.Trigger(timeout=10)
+            # The sensor is zeroed now, so the software bias is stale.
+            if hand.ft_subscriber is not None:
+                hand.ft_subscriber.ResetBias()
+
+        return TareFuture(Tare, name=hand.GetName() + '_tare')
+
+    def SoftTareForceTorqueSensor(hand, duration=0.1):
+        """Zero the force/torque readings in software.
+        The mean of the readings buffered during the last \p duration
+        seconds is subtracted from all later readings. This is much faster
+        than a hardware tare but does not re-zero the sensor itself.
+        @param duration length of the averaging window, in seconds
+        @return bias that is subtracted, [fx, fy, fz, tx, ty, tz]
+        """
+        if hand.ft_simulated:
+            return numpy.zeros(6)
+        return hand.GetForceTorqueSubscriber().SoftTare(duration)
+
+    def GetForceTorqueSubscriber(hand):
+        """Get the persistent subscription to the force/torque sensor.
+        The subscription is opened the first time it is requested and keeps
+        the newest reading and a short history of readings.
+        @return herbpy.forcetorque.ForceTorqueSubscriber
         """
-        hand.ft_tare_controller.Trigger(timeout=10)
+        if hand.ft_simulated:
+            raise ValueError('The force/torque sensor of hand "{:s}" is'
+                             ' simulated.'.format(hand.GetName()))
+
+        if hand.ft_subscriber is None:
+            from .forcetorque import ForceTorqueSubscriber
+            hand.ft_subscriber = ForceTorqueSubscriber(
+                hand.bhd_namespace + '/ft_wrench')
+        return hand.ft_subscriber
+
+    def CreateContactDetector(hand, callback=None, **kw_args):
+        """Detect contacts in the force/torque stream of this hand.
+        The detector processes every reading of the hand's persistent
+        subscription as it arrives. Call its Detach method when done.
+        @param callback optional function called with each ContactChange
+        @param **kw_args parameters of herbpy.contact.ContactDetector
+        @return herbpy.contact.ContactDetector
+        """
+        from .contact import ContactDetector
+
+        detector = ContactDetector(**kw_args)
+        if callback is not None:
+            detector.AddCallback(callback)
+        detector.Attach(hand.GetForceTorqueSubscriber())
+        return detector
+
+    def GetForceTorqueGuard(hand):
+        """Get the guard that cancels trajectories on contact.
+        The guard is created the first time it is requested, together with the
+        cancel publishers of the arm's trajectory controllers, and keeps them
+        open afterwards.
+        @return herbpy.ftguard.ForceTorqueGuard
+        """
+        if hand.ft_simulated:
+            raise ValueError('The force/torque sensor of hand "{:s}" is'
+                             ' simulated.'.format(hand.GetName()))
+
+        if hand.ft_guard is None:
+            from .ftguard import ForceTorqueGuard
+            hand.ft_guard = ForceTorqueGuard(hand, controllers=[
+                hand.hand_side + '_trajectory_controller',
+                'bimanual_trajectory_controller'])
+        return hand.ft_guard
 
     def _GetJointFromName(self, name):
         robot = self.manipulator.GetRobot()
@@ -0,0 +1,213 @@
+import logging
+import numpy
+import threading
+import time
+
+from .servo import PeriodicExecutor
+
+logger = logging.getLogger('herbpy')
+
+# Not affected by changes to the system clock. Python 2 does not have it.
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class GuardedMotionResult(object):
+    CONTACT = 'contact'
+    DISTANCE = 'distance'
+    TIMEOUT = 'timeout'
+    STALE_DATA = 'stale data'
+    STOPPED = 'stopped'
+
+    def __init__(self, reason, distance, duration, statistics, contact=None,
+                 reaction_latency=None, max_data_age=None):
+        """Outcome of a \ref GuardedBaseMotion.
+        @param reason why the motion ended: \ref CONTACT, \ref DISTANCE,
+                      \ref TIMEOUT, \ref STALE_DATA, or \ref STOPPED
+        @param distance distance traveled along the direction of motion, in
+                        meters
+        @param duration duration of the motion, in seconds
+        @param statistics TimingStatistics of the control loop
+        @param contact ForceTorqueSample or herbpy.contact.ContactChange that
+                       ended the motion, or None
+        @param reaction_latency time from the contact reading to the stop
+                                command, in seconds, or None
+        @param max_data_age largest age of the newest force/torque reading
+                            seen by the control loop, in seconds; bounds the
+                            reaction latency of a polling loop
+        """
+        self.reason = reason
+        self.distance = distance
+        self.duration = duration
+        self.statistics = statistics
+        self.contact = contact
+        self.reaction_latency = reaction_latency
+        self.max_data_age = max_data_age
+
+    @property
+    def felt_force(self):
+        return self.reason == self.CONTACT
+
+    @property
+    def loop_rate(self):
+        if self.duration <= 0.:
+            return 0.
+        return self.statistics.num_ticks / self.duration
+
+    def __str__(self):
+        text = '{:s} after {:.3f} m in {:.2f} s, loop at {:.1f} Hz'.format(
+            self.reason, self.distance, self.duration, self.loop_rate)
+        if self.reaction_latency is not None:
+            text += ', reacted in {:.1f} ms'.format(1e3 * self.reaction_latency)
+        if self.max_data_age is not None:
+            text += ', max data age {:.1f} ms'.format(1e3 * self.max_data_age)
+        return text
+
+
+class GuardedBaseMotion(object):
+    def __init__(self, buffers, force_threshold, rate=20., clock=time.time,
+                 detector_args=None, max_data_age=0.25):
+        """Drive the base at a fixed rate until a force/torque sensor is hit.
+        Every reading of every buffer is checked against \p force_threshold
+        in the thread that receives it, so a contact stops the motion right
+        away instead of at the next tick of the control loop. The loop itself
+        only streams velocity commands and checks the distance and timeout
+        at \p rate. Readings are expected to be tared, e.g. with
+        ForceTorqueBuffer.SoftTare. The motion also stops if a buffer has no
+        reading newer than \p max_data_age, so a sensor that stops publishing
+        does not leave the base driving blind.
+        @param buffers ForceTorqueBuffers or ForceTorqueSubscribers to watch
+        @param force_threshold force magnitude that counts as a contact, in
+                               Newtons
+        @param rate rate of the velocity commands, in Hz
+        @param clock function that returns the time in the clock of the
+                     readings' stamps, e.g. rospy.get_time
+        @param detector_args parameters of herbpy.contact.ContactDetector; if
+                             given, a contact found by a detector on any
+                             buffer also stops the motion
+        @param max_data_age maximum age of the newest reading of every buffer,
+                            in seconds; None disables the check
+        """
+        self.buffers = list(buffers)
+        self.force_threshold = force_threshold
+        self.rate = rate
+        self.clock = clock
+        self.detector_args = detector_args
+        self.max_data_age = max_data_age
+        self.executor = PeriodicExecutor(1. / rate)
+        self.contact = None
+        self._armed = False
+        self._lock = threading.Lock()
+
+    def Stop(self):
+        """Stop the motion at the next tick. Safe to call from any thread."""
+        self.executor.Stop()
+
+    def Run(self, send_velocity, get_distance, velocity, max_distance=None,
+            timeout=None):
+        """Drive until a contact, the maximum distance, the timeout, or stale
+        force/torque data.
+        A zero velocity is always sent before returning.
+        @param send_velocity function that commands a forward velocity, in
+                             meters per second
+        @param get_distance function that returns the distance traveled since
+                            the start, in meters
+        @param velocity forward velocity, in meters per second
+        @param max_distance maximum distance, in meters; None disables it
+        @param timeout maximum duration, in seconds; None disables it
+        @return GuardedMotionResult
+        """
+        from .contact import ContactChange, ContactDetector
+
+        detectors = []
+        with self._lock:
+            self.contact = None
+            self._armed = True
+
+        # Plain lists instead of nonlocal, so this also runs on Python 2.
+        reason = [GuardedMotionResult.STOPPED]
+        distance = [0.]
+        max_data_age = [0.]
+
+        def OnDetectorChange(change):
+            if change.kind == ContactChange.CONTACT:
+                self._Trigger(change)
+
+        def Step(elapsed):
+            if self.contact is not None:
+                reason[0] = GuardedMotionResult.CONTACT
+                return False
+
+            now = self.clock()
+            for buffer in self.buffers:
+                latest = buffer.GetLatest()
+                age = float('inf') if latest is None else now - latest.stamp
+                if latest is not None:
+                    max_data_age[0] = max(max_data_age[0], age)
+                if self.max_data_age is not None and age > self.max_data_age:
+                    logger.warning('Stopping the base: newest force/torque'
+                                   ' reading is %.1f ms old.', 1e3 * age)
+                    reason[0] = GuardedMotionResult.STALE_DATA
+                    return False
+
+            distance[0] = get_distance()
+            if max_distance is not None and distance[0] >= max_distance:
+                reason[0] = GuardedMotionResult.DISTANCE
+                return False
+            if timeout is not None and elapsed >= timeout:
+                reason[0] = GuardedMotionResult.TIMEOUT
+                return False
+
+            send_velocity(velocity)
+            return True
+
+        start_time = _monotonic()
+        for buffer in self.buffers:
+            buffer.AddCallback(self._OnSample)
+        try:
+            if self.detector_args is not None:
+                for buffer in self.buffers:
+                    detector = ContactDetector(**self.detector_args)
+                    detector.AddCallback(OnDetectorChange)
+                    detector.Attach(buffer)
+                    detectors.append(detector)
+
+            statistics = self.executor.Run(Step)
+        finally:
+            send_velocity(0.)
+            stop_time = self.clock()
+            duration = _monotonic() - start_time
+
+            with self._lock:
+                self._armed = False
+            for buffer in self.buffers:
+                buffer.RemoveCallback(self._OnSample)
+            for detector in detectors:
+                detector.Detach()
+
+        reaction_latency = None
+        if self.contact is not None:
+            reason[0] = GuardedMotionResult.CONTACT
+            reaction_latency = stop_time - self.contact.stamp
+            distance[0] = get_distance()
+
+        result = GuardedMotionResult(reason[0], distance[0], duration,
+                                     statistics, contact=self.contact,
+                                     reaction_latency=reaction_latency,
+                                     max_data_age=max_data_age[0])
+        logger.info('Guarded base motion: %s', result)
+        return result
+
+    def _Trigger(self, sample):
+        with self._lock:
+            if not self._armed or self.contact is not None:
+                return
+            self.contact = sample
+        # Wake up the control loop so it stops the base right away.
+        self.executor.Stop()
+
+    def _OnSample(self, sample):
+        # Unlocked fast path for the common case of no contact.
+        if not self._armed:
+            return
+        if numpy.linalg.norm(sample.force) > self.force_threshold:
+            self._Trigger(sample)
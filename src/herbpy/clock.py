@@ -0,0 +1,116 @@
+import logging
+import numpy
+import time
+
+logger = logging.getLogger('herbpy')
+
+
+class SimulationClock(object):
+    # Configuration groups whose values scale with the playback rate, mapped
+    # to the power of the speedup they are multiplied by.
+    _DERIVATIVE_GROUPS = {
+        'deltatime': -1,
+        'joint_velocities': 1,
+        'affine_velocities': 1,
+        'joint_accelerations': 2,
+        'affine_accelerations': 2,
+    }
+
+    def __init__(self, speedup=1., sleep=time.sleep):
+        """Clock that maps simulated time to wall-clock time.
+        Simulated components run \p speedup times faster than real time. A
+        speedup of 'instant' (or infinity) skips waiting entirely: simulated
+        trajectories jump to their final waypoint and sleeps return
+        immediately.
+        @param speedup ratio of simulated time to wall-clock time
+        @param sleep function that sleeps for a wall-clock duration
+        """
+        if speedup == 'instant':
+            speedup = float('inf')
+
+        speedup = float(speedup)
+        if not speedup > 0.:
+            raise ValueError('Speedup must be positive; got {}.'.format(speedup))
+
+        self.speedup = speedup
+        self._sleep = sleep
+
+    def IsRealTime(self):
+        """Check whether simulated time runs at wall-clock rate.
+        @return True if the speedup is one
+        """
+        return self.speedup == 1.
+
+    def IsInstant(self):
+        """Check whether simulated motions complete without waiting.
+        @return True if the clock is in instant mode
+        """
+        return numpy.isinf(self.speedup)
+
+    def ToWallTime(self, duration):
+        """Convert a simulated duration to wall-clock time.
+        @param duration duration in simulated seconds; None is preserved
+        @return duration in wall-clock seconds
+        """
+        if duration is None:
+            return None
+        return duration / self.speedup
+
+    def Sleep(self, duration):
+        """Sleep for a duration of simulated time.
+        @param duration duration in simulated seconds
+        """
+        wall_duration = self.ToWallTime(duration)
+        if wall_duration > 0.:
+            self._sleep(wall_duration)
+
+    def ScaleTrajectory(self, traj):
+        """Create a copy of a trajectory that plays back at the clock's rate.
+        Delta times are divided by the speedup and velocities and
+        accelerations are scaled to match, so the path is unchanged.
+        @param traj timed OpenRAVE trajectory
+        @return time-scaled copy of the trajectory
+        """
+        from openravepy import RaveCreateTrajectory
+        from .validation import GetWaypointMatrix
+
+        cspec = traj.GetConfigurationSpecification()
+        waypoints = self.ScaleWaypoints(cspec, GetWaypointMatrix(traj))
+
+        scaled_traj = RaveCreateTrajectory(traj.GetEnv(), traj.GetXMLId())
+        scaled_traj.Init(cspec)
+        scaled_traj.Insert(0, waypoints.ravel())
+        return scaled_traj
+
+    def ScaleWaypoints(self, cspec, waypoints):
+        """Scale the waypoints of a trajectory to play back at the clock's rate.
+        @param cspec configuration specification of the waypoints
+        @param waypoints (num_waypoints x cspec DOF) array of waypoints
+        @return scaled copy of \p waypoints
+        """
+        if self.IsInstant():
+            raise ValueError('Trajectories cannot be scaled to zero duration.')
+
+        waypoints = numpy.array(waypoints, dtype=float)
+        for group in cspec.GetGroups():
+            power = self._DERIVATIVE_GROUPS.get(group.name.split()[0])
+            if power is not None:
+                columns = slice(group.offset, group.offset + group.dof)
+                waypoints[:, columns] *= self.speedup ** power
+        return waypoints
+
+    def JumpToEnd(self, robot, traj):
+        """Set the robot to the final configuration of a trajectory.
+        This is how simulated trajectories are executed in instant mode.
+        @param robot robot to update
+        @param traj OpenRAVE trajectory over the robot's joints
+        """
+        from .validation import GetJointColumns
+
+        cspec = traj.GetConfigurationSpecification()
+        dof_indices, columns = GetJointColumns(cspec, robot)
+        final_waypoint = numpy.array(
+            traj.GetWaypoint(traj.GetNumWaypoints() - 1))
+
+        with robot.GetEnv():
+            robot.SetDOFValues(final_waypoint[columns], dof_indices)
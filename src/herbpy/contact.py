@@ -0,0 +1,203 @@
+import collections
+import logging
+import numpy
+import threading
+
+logger = logging.getLogger('herbpy')
+
+
+class ContactChange(object):
+    CONTACT = 'contact'
+    RELEASE = 'release'
+
+    def __init__(self, kind, stamp, wrench, statistic):
+        """Start or end of a contact found by a \ref ContactDetector.
+        @param kind \ref CONTACT or \ref RELEASE
+        @param stamp time of the reading that caused the change, in seconds
+        @param wrench [fx, fy, fz, tx, ty, tz] of that reading
+        @param statistic per-axis detection statistic of that reading
+        """
+        self.kind = kind
+        self.stamp = stamp
+        self.wrench = wrench
+        self.statistic = statistic
+
+    def __str__(self):
+        return '{:s} at {:.3f} s, wrench {}'.format(self.kind, self.stamp,
+                                                    self.wrench)
+
+
+class ContactDetector(object):
+    def __init__(self, method='cusum', window=50, threshold=8., drift=0.5,
+                 release_threshold=2., min_std=None, axes=None):
+        """Detect contacts in a stream of force/torque readings.
+        The detector keeps a baseline of the last \p window readings and
+        normalizes each new reading by the baseline's mean and standard
+        deviation, per axis. With method 'zscore', a contact starts when
+        any normalized axis exceeds \p threshold. With method 'cusum', the
+        normalized deviations are accumulated by a two-sided CUSUM with
+        \p drift, which also catches slow, steady loading. The baseline is
+        frozen during a contact, which ends when every normalized axis is
+        back below \p release_threshold. Memory and per-reading cost are
+        constant; only the last 100 changes are kept in \ref events.
+        @param method 'cusum' or 'zscore'
+        @param window number of readings in the baseline
+        @param threshold detection threshold, in standard deviations
+        @param drift CUSUM slack per reading, in standard deviations
+        @param release_threshold deviation below which a contact ends, in
+                                 standard deviations
+        @param min_std lower bound on the baseline standard deviation of
+                       each axis, so a very quiet sensor does not trigger on
+                       tiny changes; defaults to 0.1 N and 0.01 Nm
+        @param axes indices of the wrench axes to monitor; defaults to all
+        """
+        if method not in ('cusum', 'zscore'):
+            raise ValueError('Unknown method "{:s}".'.format(method))
+
+        self.method = method
+        self.window = window
+        self.threshold = threshold
+        self.drift = drift
+        self.release_threshold = release_threshold
+        if axes is None:
+            axes = numpy.arange(6)
+        self.axes = numpy.array(axes, dtype=int)
+        if min_std is None:
+            min_std = numpy.array([0.1, 0.1, 0.1, 0.01, 0.01, 0.01])[self.axes]
+        self.min_std = numpy.ones(self.axes.shape) * numpy.array(
+            min_std, dtype=float)
+
+        num_axes = len(self.axes)
+        self._history = numpy.zeros((window, num_axes))
+        self._sum = numpy.zeros(num_axes)
+        self._sum_squares = numpy.zeros(num_axes)
+        self._count = 0
+        self._cusum_high = numpy.zeros(num_axes)
+        self._cusum_low = numpy.zeros(num_axes)
+        self._z = numpy.zeros(num_axes)
+        self._std = numpy.zeros(num_axes)
+        self.in_contact = False
+        self.events = collections.deque(maxlen=100)
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._source = None
+
+    def AddCallback(self, callback):
+        """Call a function with every \ref ContactChange.
+        Callbacks run in the thread that feeds readings and must be fast.
+        @param callback function that takes a ContactChange
+        """
+        self._callbacks = self._callbacks + [callback]
+
+    def RemoveCallback(self, callback):
+        self._callbacks = [c for c in self._callbacks if c is not callback]
+
+    def Attach(self, buffer):
+        """Process every reading of a ForceTorqueBuffer as it arrives.
+        @param buffer ForceTorqueBuffer or ForceTorqueSubscriber
+        """
+        self.Detach()
+        self._source = buffer
+        buffer.AddCallback(self._OnSample)
+
+    def Detach(self):
+        """Stop processing readings from the attached buffer."""
+        if self._source is not None:
+            self._source.RemoveCallback(self._OnSample)
+            self._source = None
+
+    def Reset(self):
+        """Forget the baseline and any ongoing contact."""
+        with self._lock:
+            self._history.fill(0.)
+            self._sum.fill(0.)
+            self._sum_squares.fill(0.)
+            self._count = 0
+            self._cusum_high.fill(0.)
+            self._cusum_low.fill(0.)
+            self.in_contact = False
+
+    def Process(self, stamp, wrench):
+        """Process one reading.
+        @param stamp time of the reading, in seconds
+        @param wrench [fx, fy, fz, tx, ty, tz]
+        @return ContactChange if the reading starts or ends a contact,
+                otherwise None
+        """
+        wrench = numpy.asarray(wrench, dtype=float)
+        values = wrench[self.axes]
+
+        with self._lock:
+            event = None
+            num_samples = min(self._count, self.window)
+
+            if num_samples == self.window:
+                mean = self._sum / num_samples
+                numpy.subtract(self._sum_squares / num_samples, mean * mean,
+                               out=self._std)
+                numpy.maximum(self._std, 0., out=self._std)
+                numpy.sqrt(self._std, out=self._std)
+                numpy.maximum(self._std, self.min_std, out=self._std)
+                numpy.subtract(values, mean, out=self._z)
+                self._z /= self._std
+
+                if self.in_contact:
+                    if numpy.all(numpy.abs(self._z) < self.release_threshold):
+                        self.in_contact = False
+                        event = ContactChange(ContactChange.RELEASE, stamp,
+                                              wrench, self._z.copy())
+                else:
+                    statistic = self._UpdateStatistic()
+                    if numpy.any(statistic > self.threshold):
+                        self.in_contact = True
+                        self._cusum_high.fill(0.)
+                        self._cusum_low.fill(0.)
+                        event = ContactChange(ContactChange.CONTACT, stamp,
+                                              wrench, statistic.copy())
+
+            # Freeze the baseline while in contact.
+            if not self.in_contact:
+                index = self._count % self.window
+                if self._count >= self.window:
+                    old = self._history[index]
+                    self._sum -= old
+                    self._sum_squares -= old * old
+                self._history[index] = values
+                self._sum += values
+                self._sum_squares += values * values
+                self._count += 1
+
+            if event is not None:
+                self.events.append(event)
+
+        if event is not None:
+            logger.debug('Contact detector: %s', event)
+            for callback in self._callbacks:
+                callback(event)
+        return event
+
+    def ProcessArray(self, stamps, wrenches):
+        """Process a batch of readings, e.g. from a recorded log.
+        @param stamps array of N timestamps
+        @param wrenches (N, 6) array of readings
+        @return list of ContactChanges
+        """
+        events = []
+        for stamp, wrench in zip(stamps, wrenches):
+            event = self.Process(stamp, wrench)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _UpdateStatistic(self):
+        if self.method == 'zscore':
+            return numpy.abs(self._z)
+
+        self._cusum_high += self._z - self.drift
+        numpy.maximum(self._cusum_high, 0., out=self._cusum_high)
+        self._cusum_low -= self._z + self.drift
+        numpy.maximum(self._cusum_low, 0., out=self._cusum_low)
+        return numpy.maximum(self._cusum_high, self._cusum_low)
+
+    def _OnSample(self, sample):
+        self.Process(sample.stamp, sample.wrench)
@@ -0,0 +1,180 @@
+import logging
+import numbers
+
+logger = logging.getLogger('herbpy')
+
+
+class ControllerTransaction(object):
+    def __init__(self, robot, parent=None):
+        """Collect controller changes and apply them in one switch request.
+        Each controller claims one or more resources (e.g. 'left_arm'). The
+        transaction records the controller requested for each resource and,
+        when it is committed, asks the controller manager to switch to all
+        of the controllers that differ from the ones that are already
+        running. If the switch fails, the previous controllers are restored.
+
+        Transactions are normally created with \ref
+        HERBRobot.ControllerTransaction and used as context managers.
+        Transactions opened while another one is open join the outer
+        transaction, so their changes are applied when it commits. Calling
+        \ref Commit explicitly applies everything requested so far.
+        @param robot HERBRobot whose controllers are switched
+        @param parent outer transaction this transaction joins, if any
+        """
+        self.robot = robot
+        self.parent = parent
+        self._requests = {}
+
+    def __enter__(self):
+        if self.parent is None:
+            self.robot._controller_transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.parent is not None:
+            return
+
+        self.robot._controller_transaction = None
+        if exc_type is None:
+            self.Commit()
+
+    def Request(self, controller, resources):
+        """Request a controller for a set of resources.
+        @param controller name of the ros_control controller
+        @param resources list of resources the controller claims
+        """
+        if self.parent is not None:
+            self.parent.Request(controller, resources)
+            return
+
+        for resource in resources:
+            self._requests[resource] = controller
+
+    def SetStiffness(self, manip, stiffness):
+        """Request the controller for an arm's stiffness.
+        Stiffness False/0 is gravity compensation and stiffness True/(>0) is
+        position control. Simulated arms are ignored.
+        @param manip arm to set the stiffness of
+        @param stiffness boolean or numeric value 0.0 to 1.0
+        """
+        if (isinstance(stiffness, numbers.Number) and
+                not (0 <= stiffness and stiffness <= 1)):
+            raise Exception('Stiffness must be boolean or numeric in the range [0, 1];'
+                            'got {}.'.format(stiffness))
+
+        if manip.IsSimulated():
+            return
+
+        side = self.robot.GetArmSide(manip)
+        if stiffness:
+            controller = side + '_joint_group_position_controller'
+        else:
+            controller = side + '_gravity_compensation_controller'
+        self.Request(controller, [side + '_arm'])
+
+    def RequestTrajectoryController(self, controller):
+        """Request a trajectory controller.
+        @param controller one of 'left_trajectory_controller',
+                          'right_trajectory_controller', or
+                          'bimanual_trajectory_controller'
+        """
+        if controller == 'bimanual_trajectory_controller':
+            resources = ['left_arm', 'right_arm']
+        elif controller in ['left_trajectory_controller',
+                            'right_trajectory_controller']:
+            resources = [controller.split('_')[0] + '_arm']
+        else:
+            raise ValueError('Unknown trajectory controller "{:s}".'.format(
+                             controller))
+        self.Request(controller, resources)
+
+    def RequestController(self, controller):
+        """Request a controller that does not share resources with others.
+        @param controller name of the ros_control controller
+        """
+        self.Request(controller, [controller])
+
+    def RequestHand(self, hand):
+        """Request the position controller of a real hand.
+        @param hand BarrettHand to control
+        """
+        if not hand.simulated:
+            self.RequestController(hand.hand_side + '_hand_controller')
+
+    def RequestTare(self, hand):
+        """Request the force/torque sensor and tare controllers of a hand.
+        @param hand BarrettHand whose force/torque sensor is used
+        """
+        if not hand.ft_simulated:
+            self.RequestController('force_torque_sensor_controller')
+            self.RequestController(hand.hand_side + '_tare_controller')
+
+    def Commit(self, refresh=False):
+        """Switch to the requested controllers in one request.
+        Controllers that the cached controller state lists as running are not
+        switched again, so committing controllers that are already running
+        makes no service calls. If the switch fails, the previously running
+        controllers are restored, the cached controller state is cleared, and
+        the exception is re-raised.
+        @param refresh look up the running controllers with
+                       HERBRobot.GetRunningControllers before trusting the
+                       cache, e.g. if they may have been switched outside of
+                       herbpy
+        @return list of controllers that were switched on
+        """
+        if self.parent is not None:
+            return self.parent.Commit(refresh=refresh)
+
+        robot = self.robot
+        current = robot._controller_resources
+        requests = self._requests
+        self._requests = {}
+
+        if not requests or robot.controller_manager is None:
+            return []
+
+        if refresh and any(current.get(resource) == controller
+                           for resource, controller in requests.items()):
+            try:
+                running = robot.GetRunningControllers()
+            except Exception as e:
+                logger.warning('Failed listing running controllers: %s', e)
+                running = set()
+            if running is not None:
+                for resource, controller in list(current.items()):
+                    if controller not in running:
+                        del current[resource]
+
+        changes = dict((resource, controller)
+                       for resource, controller in requests.items()
+                       if current.get(resource) != controller)
+        if not changes:
+            return []
+
+        controllers = sorted(set(changes.values()))
+        try:
+            robot.controller_manager.request(controllers).switch()
+        except Exception:
+            previous = sorted(set(current[resource] for resource in changes
+                                  if resource in current))
+            logger.error('Failed switching to controllers %s. Restoring %s.',
+                         controllers, previous)
+            if previous:
+                try:
+                    robot.controller_manager.request(previous).switch()
+                except Exception as e:
+                    logger.error('Failed restoring controllers: %s', e)
+            # The running controllers are unknown now.
+            current.clear()
+            raise
+
+        # Starting a controller stops the controllers it conflicts with, which
+        # releases every resource those controllers held.
+        displaced = set(current[resource] for resource in changes
+                        if resource in current)
+        for resource, controller in list(current.items()):
+            if controller in displaced and resource not in changes:
+                del current[resource]
+
+        current.update(changes)
+        return controllers
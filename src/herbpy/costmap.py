@@ -0,0 +1,257 @@
+import logging
+import numpy
+
+from .footprint import CheckPrimitives
+
+logger = logging.getLogger('herbpy')
+
+FREE = 0
+# Within the robot's circumscribed radius of an obstacle: the robot collides
+# at some, but not necessarily all, headings.
+CIRCUMSCRIBED = 128
+LETHAL = 254
+
+
+def _GetDiskOffsets(radius, cellsize):
+    """Cell offsets whose centers are within a radius of the center cell."""
+    size = int(numpy.ceil(radius / cellsize))
+    i, j = numpy.meshgrid(numpy.arange(-size, size + 1),
+                          numpy.arange(-size, size + 1), indexing='ij')
+    inside = numpy.hypot(i, j) * cellsize <= radius
+    return numpy.column_stack((i[inside], j[inside]))
+
+
+class BaseCostmap(object):
+    def __init__(self, origin, shape, cellsize, inflation_radius=0.,
+                 min_height=0.02, max_height=2.):
+        """2D occupancy and cost grid of the obstacles around a mobile base.
+        Each body is rasterized from the bounding boxes of its links, so
+        cells are conservatively marked occupied. Bodies are added, moved, and
+        removed incrementally: only the cells of a body that changed are
+        updated, so keeping the map current in a mostly static environment is
+        cheap. Cells within \p inflation_radius of an obstacle, usually the
+        robot's circumscribed radius, are marked as possibly occupied: the
+        robot centered there may collide, depending on its heading. Use
+        \ref CheckPrimitives for an exact check of the footprint.
+        @param origin (x, y) position of the center of cell (0, 0), in meters
+        @param shape (rows, columns) number of cells along x and y
+        @param cellsize edge length of a cell, in meters
+        @param inflation_radius circumscribed radius of the robot, in meters
+        @param min_height links entirely below this height, e.g. the floor,
+                          are ignored
+        @param max_height links entirely above this height are ignored
+        """
+        self.origin = numpy.array(origin, dtype=float)
+        self.shape = tuple(int(n) for n in shape)
+        self.cellsize = float(cellsize)
+        self.inflation_radius = float(inflation_radius)
+        self.min_height = min_height
+        self.max_height = max_height
+
+        self._disk = _GetDiskOffsets(self.inflation_radius, self.cellsize)
+        self._counts = numpy.zeros(self.shape, dtype=numpy.int32)
+        self._inflated_counts = numpy.zeros(self.shape, dtype=numpy.int32)
+        self._bodies = dict()
+        self._body_names = dict()
+
+    @classmethod
+    def FromEnvironment(cls, env, cellsize, inflation_radius=0., padding=1.,
+                        ignore=None, **kw_args):
+        """Create a costmap that covers all bodies of an environment.
+        The grid is aligned to multiples of \p cellsize in the world frame.
+        @param env OpenRAVE environment
+        @param cellsize edge length of a cell, in meters
+        @param inflation_radius circumscribed radius of the robot, in meters
+        @param padding free space around the bodies, in meters
+        @param ignore bodies that are not obstacles, e.g. the robot; they
+                      are still covered by the grid
+        @param kw_args additional arguments of \ref BaseCostmap
+        @return BaseCostmap with all bodies added
+        """
+        with env:
+            aabbs = [body.ComputeAABB() for body in env.GetBodies()]
+        if aabbs:
+            lower = numpy.min([aabb.pos()[0:2] - aabb.extents()[0:2]
+                               for aabb in aabbs], axis=0)
+            upper = numpy.max([aabb.pos()[0:2] + aabb.extents()[0:2]
+                               for aabb in aabbs], axis=0)
+        else:
+            lower = upper = numpy.zeros(2)
+
+        lower = numpy.floor((lower - padding) / cellsize)
+        upper = numpy.ceil((upper + padding) / cellsize)
+        costmap = cls(lower * cellsize, upper - lower + 1, cellsize,
+                      inflation_radius=inflation_radius, **kw_args)
+        costmap.Update(env, ignore=ignore)
+        return costmap
+
+    @property
+    def occupancy(self):
+        """Boolean grid, True for cells that contain an obstacle."""
+        return self._counts > 0
+
+    @property
+    def inflated(self):
+        """Boolean grid, True for cells within the inflation radius."""
+        return self._inflated_counts > 0
+
+    def GetCostGrid(self):
+        """Get the cost of every cell.
+        @return grid of \ref LETHAL, \ref CIRCUMSCRIBED, and \ref FREE costs
+        """
+        costs = numpy.full(self.shape, FREE, dtype=numpy.uint8)
+        costs[self._inflated_counts > 0] = CIRCUMSCRIBED
+        costs[self._counts > 0] = LETHAL
+        return costs
+
+    def GetCells(self, positions):
+        """Get the cells that contain positions.
+        @param positions (N, 2) array of (x, y) positions, in meters
+        @return (N, 2) array of cells; they may lie outside of the grid
+        """
+        positions = numpy.asarray(positions, dtype=float).reshape(-1, 2)
+        return numpy.floor((positions - self.origin) / self.cellsize
+                           + 0.5).astype(numpy.int32)
+
+    def GetPositions(self, cells):
+        """Get the centers of cells.
+        @param cells (N, 2) array of cells
+        @return (N, 2) array of (x, y) positions, in meters
+        """
+        return self.origin + numpy.asarray(cells).reshape(-1, 2) * self.cellsize
+
+    def IsOccupied(self, positions, inflated=False):
+        """Check positions against the grid.
+        Positions outside of the grid count as occupied.
+        @param positions (N, 2) array of (x, y) positions, in meters
+        @param inflated also count cells within the inflation radius
+        @return (N,) boolean array
+        """
+        cells = self.GetCells(positions)
+        grid = self.inflated if inflated else self.occupancy
+        inside = numpy.all((cells >= 0) & (cells < self.shape), axis=1)
+        occupied = numpy.ones(len(cells), dtype=bool)
+        occupied[inside] = grid[cells[inside, 0], cells[inside, 1]]
+        return occupied
+
+    def CheckPrimitives(self, primitives, pose):
+        """Check the primitives that start at a base pose.
+        @param primitives PrimitiveSet with swept cells on the grid of this
+                          costmap, e.g. from
+                          herbpy.footprint.FootprintTable.AddSweptCells
+        @param pose (x, y, theta) start pose, in meters and radians
+        @return array of the indices of the primitives and boolean array, True
+                for primitives that are collision-free
+        """
+        if not numpy.isclose(primitives.cellsize, self.cellsize):
+            raise ValueError('Primitives with cellsize {:f} do not match the'
+                             ' costmap with cellsize {:f}.'.format(
+                             primitives.cellsize, self.cellsize))
+        cell = self.GetCells(pose[0:2])[0]
+        heading_step = 2. * numpy.pi / primitives.numangles
+        angle = int(numpy.round(pose[2] / heading_step)) % primitives.numangles
+        return CheckPrimitives(self.occupancy, primitives, cell, angle)
+
+    def SetBody(self, key, aabbs):
+        """Add or move an obstacle.
+        Cells of the obstacle outside of the grid are dropped.
+        @param key hashable identifier of the obstacle
+        @param aabbs (K, 2, 3) array of the lower and upper corners of the
+                     obstacle's bounding boxes in the world frame
+        """
+        self.RemoveBody(key)
+
+        cells = self._Rasterize(numpy.asarray(aabbs, dtype=float).reshape(-1, 2, 3))
+        inflated = cells
+        if len(cells) and len(self._disk) > 1:
+            inflated = (cells[:, numpy.newaxis, :]
+                        + self._disk[numpy.newaxis, :, :]).reshape(-1, 2)
+
+        cells = self._ToFlatIndices(cells)
+        inflated = self._ToFlatIndices(inflated)
+        self._counts.flat[cells] += 1
+        self._inflated_counts.flat[inflated] += 1
+        self._bodies[key] = (None, cells, inflated)
+
+    def RemoveBody(self, key):
+        """Remove an obstacle, if it exists.
+        @param key identifier passed to \ref SetBody
+        """
+        entry = self._bodies.pop(key, None)
+        if entry is not None:
+            _, cells, inflated = entry
+            self._counts.flat[cells] -= 1
+            self._inflated_counts.flat[inflated] -= 1
+
+    def Update(self, env, ignore=None):
+        """Bring the grid up to date with an environment.
+        Only bodies that were added, removed, enabled, disabled, moved, or
+        whose DOF values changed are rasterized again.
+        @param env OpenRAVE environment
+        @param ignore bodies that are not obstacles, e.g. the robot and the
+                      objects it holds
+        @return list of the names of the bodies that were updated
+        """
+        ignore = set(body.GetEnvironmentId() for body in (ignore or []))
+        changed = []
+
+        with env:
+            seen = set()
+            for body in env.GetBodies():
+                key = body.GetEnvironmentId()
+                if key in ignore or not body.IsEnabled():
+                    continue
+                seen.add(key)
+
+                state = (body.GetTransform(), body.GetDOFValues())
+                entry = self._bodies.get(key)
+                if entry is not None and entry[0] is not None and all(
+                        numpy.array_equal(a, b)
+                        for a, b in zip(entry[0], state)):
+                    continue
+
+                self.SetBody(key, self._GetLinkAABBs(body))
+                _, cells, inflated = self._bodies[key]
+                self._bodies[key] = (state, cells, inflated)
+                self._body_names[key] = body.GetName()
+                changed.append(body.GetName())
+
+            for key in list(self._bodies):
+                if key not in seen:
+                    self.RemoveBody(key)
+                    changed.append(self._body_names.pop(key, key))
+
+        if changed:
+            logger.debug('Updated %d bodies in the base costmap.', len(changed))
+        return changed
+
+    def _GetLinkAABBs(self, body):
+        aabbs = []
+        for link in body.GetLinks():
+            if not link.GetGeometries():
+                continue
+            aabb = link.ComputeAABB()
+            aabbs.append([aabb.pos() - aabb.extents(),
+                          aabb.pos() + aabb.extents()])
+        return numpy.array(aabbs).reshape(-1, 2, 3)
+
+    def _Rasterize(self, aabbs):
+        # Drop links outside of the height band, e.g. the floor.
+        aabbs = aabbs[(aabbs[:, 1, 2] >= self.min_height)
+                      & (aabbs[:, 0, 2] <= self.max_height)]
+        cells = []
+        for lower, upper in zip(self.GetCells(aabbs[:, 0, 0:2]),
+                                self.GetCells(aabbs[:, 1, 0:2])):
+            i, j = numpy.meshgrid(numpy.arange(lower[0], upper[0] + 1),
+                                  numpy.arange(lower[1], upper[1] + 1),
+                                  indexing='ij')
+            cells.append(numpy.column_stack((i.ravel(), j.ravel())))
+        if not cells:
+            return numpy.zeros((0, 2), dtype=int)
+        return numpy.concatenate(cells)
+
+    def _ToFlatIndices(self, cells):
+        inside = numpy.all((cells >= 0) & (cells < self.shape), axis=1)
+        cells = cells[inside]
+        return numpy.unique(numpy.ravel_multi_index((cells[:, 0], cells[:, 1]),
+                                                    self.shape))
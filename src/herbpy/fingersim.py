@@ -0,0 +1,240 @@
+import logging
+import numpy
+
+logger = logging.getLogger('herbpy')
+
+
+class ClosingResult(object):
+    def __init__(self, dof_values, contacts, contact_points=None):
+        """Outcome of a simulated closing or opening of a hand.
+        @param dof_values final hand DOF values, in the order of
+                          BarrettHand.GetIndices
+        @param contacts list of the names of the links of each finger that
+                        touch an object; empty for fingers that moved freely
+        @param contact_points list of (K, 6) arrays of the contact positions
+                              and normals of each finger, in the world
+                              frame; None if they were not computed
+        """
+        self.dof_values = dof_values
+        self.contacts = contacts
+        self.contact_points = contact_points
+
+    @property
+    def in_contact(self):
+        return [len(links) > 0 for links in self.contacts]
+
+    def __str__(self):
+        return 'hand at {}, contacts {}'.format(self.dof_values, self.contacts)
+
+
+class FingerClosingSimulator(object):
+    def __init__(self, hand, step=0.1, tolerance=1e-3):
+        """Simulate closing the fingers of a BarrettHand around objects.
+        Each finger is swept from its current angle towards a target in
+        coarse steps of \p step radians and the first step that touches an
+        object is refined by bisection to \p tolerance. Only the links that
+        move with a finger are checked, and only against the given objects,
+        so a closing costs a few dozen link-body collision checks instead of
+        full-environment checks at every small step. All three fingers are
+        swept together because they cannot touch each other's links.
+        @param hand BarrettHand to simulate
+        @param step size of the coarse sweep, in radians; objects thinner
+                    than a finger moves in one step may be missed
+        @param tolerance accuracy of the contact angles, in radians
+        """
+        self.hand = hand
+        self.step = step
+        self.tolerance = tolerance
+        self.robot = hand.manipulator.GetRobot()
+
+        with self.robot.GetEnv():
+            self.finger_indices = hand.GetFingerIndices()
+            self.spread_index = hand.GetSpreadIndex()
+            self.lower, self.upper = [numpy.array(limits) for limits in
+                self.robot.GetDOFLimits(self.finger_indices)]
+
+            # Links that move with each finger, e.g. its proximal and distal
+            # links, but not the palm.
+            hand_links = hand.manipulator.GetChildLinks()
+            self.finger_links = []
+            for dof_index in self.finger_indices:
+                joint_index = self.robot.GetJointFromDOFIndex(dof_index).GetJointIndex()
+                self.finger_links.append([
+                    link for link in hand_links
+                    if self.robot.DoesAffect(joint_index, link.GetIndex())])
+            self.hand_link_indices = set(link.GetIndex() for link in hand_links)
+
+    def GetDefaultBodies(self):
+        """Get the bodies the fingers are checked against by default.
+        Like a real hand, the fingers stop on the robot itself, e.g. on the
+        other arm, so the robot's links outside of this hand are included.
+        @return all enabled bodies in the environment other than the robot,
+                followed by the enabled links of the robot that have geometry
+                and do not belong to this hand
+        """
+        env = self.robot.GetEnv()
+        bodies = [body for body in env.GetBodies()
+                  if body != self.robot and body.IsEnabled()]
+        bodies.extend(link for link in self.robot.GetLinks()
+                      if link.GetIndex() not in self.hand_link_indices
+                      and link.IsEnabled() and link.GetGeometries())
+        return bodies
+
+    def Close(self, bodies=None, spread=None, contact_points=False):
+        """Compute where the fingers stop when the hand is closed.
+        The robot is left unchanged.
+        @param bodies KinBody or list of KinBodies and links the fingers can
+                      touch; defaults to \ref GetDefaultBodies
+        @param spread spread angle, in radians; defaults to the current spread
+        @param contact_points also compute contact positions and normals
+        @return ClosingResult
+        """
+        return self.Move(self.upper, bodies=bodies, spread=spread,
+                         contact_points=contact_points)
+
+    def Open(self, bodies=None, spread=None):
+        """Compute where the fingers stop when the hand is opened.
+        @param bodies KinBody or list of KinBodies and links the fingers can
+                      touch; defaults to \ref GetDefaultBodies
+        @param spread spread angle, in radians; defaults to the current spread
+        @return ClosingResult
+        """
+        return self.Move(self.lower, bodies=bodies, spread=spread)
+
+    def Move(self, targets, bodies=None, spread=None, contact_points=False):
+        """Compute where the fingers stop when moved towards target angles.
+        A finger that already touches an object does not move. Contact
+        points are taken at the first colliding angle found by the
+        bisection, i.e. within the tolerance of the final angle.
+        @param targets target angle of each finger, in radians
+        @param bodies KinBody or list of KinBodies and links the fingers can
+                      touch; defaults to \ref GetDefaultBodies
+        @param spread spread angle, in radians; defaults to the current spread
+        @param contact_points also compute contact positions and normals
+        @return ClosingResult
+        """
+        from openravepy import KinBody
+
+        robot = self.robot
+        env = robot.GetEnv()
+
+        with env:
+            if bodies is None:
+                bodies = self.GetDefaultBodies()
+            elif isinstance(bodies, KinBody):
+                bodies = [bodies]
+
+            with robot.CreateRobotStateSaver(KinBody.SaveParameters.LinkTransformation):
+                if spread is not None:
+                    robot.SetDOFValues([spread], [self.spread_index])
+                else:
+                    spread = robot.GetDOFValues([self.spread_index])[0]
+
+                start = robot.GetDOFValues(self.finger_indices)
+                targets = numpy.clip(targets, self.lower, self.upper)
+                final, contacts, points = self._Sweep(start, targets, bodies,
+                                                      contact_points)
+
+        dof_values = numpy.append(final, spread)
+        return ClosingResult(dof_values, contacts, contact_points=points)
+
+    def _GetContacts(self, finger, bodies):
+        env = self.robot.GetEnv()
+        return [link.GetName() for link in self.finger_links[finger]
+                if any(env.CheckCollision(link, body) for body in bodies)]
+
+    def _GetContactPoints(self, finger, bodies):
+        from openravepy import CollisionOptions, CollisionReport
+
+        env = self.robot.GetEnv()
+        checker = env.GetCollisionChecker()
+        options = checker.GetCollisionOptions()
+        checker.SetCollisionOptions(options | CollisionOptions.Contacts)
+        try:
+            points = []
+            report = CollisionReport()
+            for link in self.finger_links[finger]:
+                for body in bodies:
+                    if env.CheckCollision(link, body, report):
+                        points.extend(numpy.concatenate((c.pos, c.norm))
+                                      for c in report.contacts)
+        finally:
+            checker.SetCollisionOptions(options)
+        return numpy.array(points).reshape(-1, 6)
+
+    def _SetFingers(self, values):
+        self.robot.SetDOFValues(values, self.finger_indices)
+
+    def _Sweep(self, start, targets, bodies, contact_points):
+        num_fingers = len(self.finger_indices)
+        final = numpy.array(targets, dtype=float)
+        contacts = [[] for _ in range(num_fingers)]
+        points = None
+        if contact_points:
+            points = [numpy.zeros((0, 6)) for _ in range(num_fingers)]
+
+        if not bodies:
+            return final, contacts, points
+
+        # Fingers that start in contact stay where they are.
+        self._SetFingers(start)
+        active = numpy.ones(num_fingers, dtype=bool)
+        for finger in range(num_fingers):
+            contacts[finger] = self._GetContacts(finger, bodies)
+            if contacts[finger]:
+                final[finger] = start[finger]
+                active[finger] = False
+                if contact_points:
+                    points[finger] = self._GetContactPoints(finger, bodies)
+
+        # Coarse sweep: find the first step at which each finger collides.
+        # The bracket [free, hit] of a bracketed finger contains its contact
+        # angle.
+        distances = numpy.abs(targets - start)
+        directions = numpy.sign(targets - start)
+        num_steps = int(numpy.ceil(distances.max() / self.step))
+        free = start.copy()
+        hit = start.copy()
+        bracketed = numpy.zeros(num_fingers, dtype=bool)
+        values = start.copy()
+
+        for i in range(1, num_steps + 1):
+            if not numpy.any(active):
+                break
+
+            values[active] = start[active] + directions[active] * numpy.minimum(
+                i * self.step, distances[active])
+            self._SetFingers(values)
+
+            for finger in numpy.flatnonzero(active):
+                if self._GetContacts(finger, bodies):
+                    hit[finger] = values[finger]
+                    bracketed[finger] = True
+                    active[finger] = False
+                else:
+                    free[finger] = values[finger]
+
+        # Refine the brackets by bisection, again moving all fingers at once.
+        refining = bracketed & (numpy.abs(hit - free) > self.tolerance)
+        while numpy.any(refining):
+            middle = numpy.where(refining, 0.5 * (free + hit), free)
+            self._SetFingers(numpy.where(bracketed, middle, final))
+
+            for finger in numpy.flatnonzero(refining):
+                if self._GetContacts(finger, bodies):
+                    hit[finger] = middle[finger]
+                else:
+                    free[finger] = middle[finger]
+            refining = bracketed & (numpy.abs(hit - free) > self.tolerance)
+
+        # Stop each finger at its last collision-free angle and report the
+        # links that touch at the bracketing collision.
+        if numpy.any(bracketed):
+            self._SetFingers(numpy.where(bracketed, hit, final))
+            for finger in numpy.flatnonzero(bracketed):
+                final[finger] = free[finger]
+                contacts[finger] = self._GetContacts(finger, bodies)
+                if contact_points:
+                    points[finger] = self._GetContactPoints(finger, bodies)
+
+        return final, contacts, points
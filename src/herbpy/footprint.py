@@ -0,0 +1,254 @@
+import logging
+import numpy
+
+from .primitivegen import GetFootprintCells
+from .primitives import PrimitiveSet
+
+logger = logging.getLogger('herbpy')
+
+
+def _ConvexHull(points):
+    """Andrew's monotone chain; returns the hull counter-clockwise."""
+    points = sorted(set(map(tuple, points)))
+    if len(points) < 3:
+        return numpy.array(points, dtype=float).reshape(-1, 2)
+
+    def Cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for point in points:
+        while len(lower) >= 2 and Cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    for point in reversed(points):
+        while len(upper) >= 2 and Cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+    return numpy.array(lower[:-1] + upper[:-1], dtype=float)
+
+
+def GetRobotFootprint(robot, configuration='relaxed_home', padding=0.):
+    """Compute the footprint of a robot by projecting its links on the floor.
+    The footprint is the convex hull of the links' bounding boxes with the
+    arms in a named configuration, e.g. the stowed configuration used while
+    driving. The robot is left unchanged.
+    @param robot robot with a \p configurations library
+    @param configuration name of the configuration; None uses the current one
+    @param padding distance added on every side of the bounding boxes, in
+                   meters
+    @return (K, 2) array of the footprint's vertices in the robot frame
+    """
+    from openravepy import KinBody
+
+    env = robot.GetEnv()
+    with env:
+        with robot.CreateRobotStateSaver(
+                KinBody.SaveParameters.LinkTransformation):
+            robot.SetTransform(numpy.eye(4))
+            if configuration is not None:
+                dof_indices, dof_values = \
+                    robot.configurations.get_configuration(configuration)
+                robot.SetDOFValues(dof_values, dof_indices)
+
+            corners = []
+            for link in robot.GetLinks():
+                if not link.GetGeometries():
+                    continue
+                aabb = link.ComputeAABB()
+                lower = aabb.pos()[0:2] - aabb.extents()[0:2] - padding
+                upper = aabb.pos()[0:2] + aabb.extents()[0:2] + padding
+                corners.extend([lower, upper, [lower[0], upper[1]],
+                                [upper[0], lower[1]]])
+
+    if not corners:
+        raise ValueError('Robot "{:s}" has no geometry.'.format(
+                         robot.GetName()))
+    return _ConvexHull(numpy.array(corners))
+
+
+class FootprintTable(object):
+    def __init__(self, cellsize, numangles, offsets, cells):
+        """Grid cells covered by a robot's footprint at each discrete heading.
+        The cells at heading a are cells[offsets[a]:offsets[a + 1]], as
+        offsets from the robot's cell. With these masks, collision checking a
+        pose against an occupancy grid is a lookup of a few cells instead of
+        a geometric collision check.
+        @param cellsize edge length of a grid cell, in meters
+        @param numangles number of discrete headings
+        @param offsets numangles + 1 offsets of each heading's cells
+        @param cells (M, 2) array of cell offsets
+        """
+        self.cellsize = float(cellsize)
+        self.numangles = int(numangles)
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        self.cells = numpy.asarray(cells, dtype=numpy.int32).reshape(-1, 2)
+
+    @classmethod
+    def Generate(cls, footprint, cellsize, numangles):
+        """Rasterize a footprint at every discrete heading.
+        @param footprint (K, 2) array of the vertices of the footprint polygon
+                         in the robot frame, in meters
+        @param cellsize edge length of a grid cell, in meters
+        @param numangles number of discrete headings
+        @return FootprintTable
+        """
+        offsets, cells = [0], []
+        for angle in range(numangles):
+            theta = 2. * numpy.pi * angle / numangles
+            heading_cells = GetFootprintCells(footprint, [[0., 0., theta]],
+                                              cellsize)
+            cells.append(heading_cells)
+            offsets.append(offsets[-1] + len(heading_cells))
+        return cls(cellsize, numangles, offsets, numpy.concatenate(cells))
+
+    @classmethod
+    def FromPrimitives(cls, footprint, primitives):
+        """Rasterize a footprint on the grid of a set of motion primitives.
+        @param footprint (K, 2) array of footprint vertices
+        @param primitives PrimitiveSet that defines the cellsize and headings
+        @return FootprintTable
+        """
+        return cls.Generate(footprint, primitives.cellsize,
+                            primitives.numangles)
+
+    def GetCells(self, angle):
+        """Get the cells covered at a heading.
+        @param angle heading index
+        @return (K, 2) array of cell offsets from the robot's cell
+        """
+        return self.cells[self.offsets[angle]:self.offsets[angle + 1]]
+
+    def DiscretizePoses(self, poses):
+        """Get the grid cell and heading index of continuous poses.
+        @param poses (N, 3) array of [x, y, theta] poses, in grid coordinates
+                     scaled to meters, i.e. cell (i, j) is centered at
+                     (i * cellsize, j * cellsize)
+        @return (N, 2) array of cells and (N,) array of heading indices
+        """
+        poses = numpy.asarray(poses, dtype=float).reshape(-1, 3)
+        cells = numpy.round(poses[:, 0:2] / self.cellsize).astype(numpy.int32)
+        heading_step = 2. * numpy.pi / self.numangles
+        angles = numpy.round(poses[:, 2] / heading_step).astype(int) \
+            % self.numangles
+        return cells, angles
+
+    def GetPoseCells(self, cells, angles):
+        """Get the cells covered at several discrete poses.
+        @param cells (N, 2) array of the robot's cells
+        @param angles (N,) array of heading indices
+        @return (M, 2) array of covered cells and (M,) array of the index of
+                the pose that covers each
+        """
+        cells = numpy.asarray(cells, dtype=numpy.int32).reshape(-1, 2)
+        angles = numpy.asarray(angles, dtype=int).reshape(-1)
+
+        # Concatenate the masks of all poses without a Python loop.
+        counts = (self.offsets[1:] - self.offsets[:-1])[angles]
+        pose_indices = numpy.repeat(numpy.arange(len(angles)), counts)
+        starts = numpy.repeat(self.offsets[angles] - numpy.cumsum(counts)
+                              + counts, counts)
+        mask_indices = starts + numpy.arange(len(pose_indices))
+        return self.cells[mask_indices] + cells[pose_indices], pose_indices
+
+    def IsValid(self, occupancy, cells, angles):
+        """Check several discrete poses against an occupancy grid.
+        Cells outside of the grid count as occupied.
+        @param occupancy 2D boolean array, indexed by cell
+        @param cells (N, 2) array of the robot's cells
+        @param angles (N,) array of heading indices
+        @return (N,) boolean array, True for poses that are collision-free
+        """
+        covered, pose_indices = self.GetPoseCells(cells, angles)
+        blocked = _IsOccupied(occupancy, covered)
+        num_poses = len(numpy.asarray(angles).reshape(-1))
+        return numpy.bincount(pose_indices, weights=blocked,
+                              minlength=num_poses) == 0
+
+    def GetSweptCells(self, poses):
+        """Get the cells covered by the footprint along a path.
+        Each pose is snapped to the nearest cell and heading, like the base
+        planner does.
+        @param poses (N, 3) array of [x, y, theta] poses relative to the start
+                     cell, in meters and radians
+        @return (M, 2) array of unique cell offsets from the start cell
+        """
+        cells, angles = self.DiscretizePoses(poses)
+        covered, _ = self.GetPoseCells(cells, angles)
+        return _UniqueRows(covered)
+
+    def AddSweptCells(self, primitives):
+        """Compute the cells swept by every primitive of a set.
+        @param primitives PrimitiveSet on the grid of this table
+        @return copy of \p primitives with swept cells, which can be checked
+                with \ref CheckPrimitives and saved to a binary file
+        """
+        if (not numpy.isclose(primitives.cellsize, self.cellsize)
+                or primitives.numangles != self.numangles):
+            raise ValueError('Footprint table does not match the primitives:'
+                             ' cellsize {:f} != {:f} or {:d} != {:d} angles.'
+                             .format(self.cellsize, primitives.cellsize,
+                                     self.numangles, primitives.numangles))
+
+        swept_offsets, swept_cells = [0], []
+        for index in range(primitives.num_primitives):
+            cells = self.GetSweptCells(primitives.GetPoses(index))
+            swept_cells.append(cells)
+            swept_offsets.append(swept_offsets[-1] + len(cells))
+
+        return PrimitiveSet(
+            primitives.cellsize, primitives.numangles,
+            primitives.linear_weight, primitives.theta_weight,
+            primitives.angles, primitives.weights, primitives.offsets,
+            primitives.poses, swept_offsets=swept_offsets,
+            swept_cells=numpy.concatenate(swept_cells))
+
+
+def _UniqueRows(cells):
+    if not len(cells):
+        return cells.reshape(0, 2)
+    cells = cells[numpy.lexsort((cells[:, 1], cells[:, 0]))]
+    keep = numpy.ones(len(cells), dtype=bool)
+    keep[1:] = numpy.any(cells[1:] != cells[:-1], axis=1)
+    return cells[keep]
+
+
+def _IsOccupied(occupancy, cells):
+    occupancy = numpy.asarray(occupancy)
+    inside = numpy.all((cells >= 0) & (cells < occupancy.shape), axis=1)
+    blocked = numpy.ones(len(cells), dtype=bool)
+    blocked[inside] = occupancy[cells[inside, 0], cells[inside, 1]]
+    return blocked
+
+
+def CheckPrimitives(occupancy, primitives, cell, angle):
+    """Check all primitives that start at a state against an occupancy grid.
+    This only looks up the cells swept by each primitive, which are computed
+    once by \ref FootprintTable.AddSweptCells or by
+    herbpy.primitivegen.GeneratePrimitives. Cells outside of the grid count
+    as occupied.
+    @param occupancy 2D boolean array, indexed by cell
+    @param primitives PrimitiveSet with swept cells
+    @param cell (i, j) start cell
+    @param angle start heading index
+    @return array of the indices of the primitives and boolean array, True
+            for primitives that are collision-free
+    """
+    if primitives.swept_cells is None:
+        raise ValueError('These primitives have no swept cells.')
+
+    indices = primitives.GetPrimitiveIndices(angle)
+    if not len(indices):
+        return indices, numpy.zeros(0, dtype=bool)
+
+    # The primitives of a heading are contiguous, so their cells are too.
+    starts = primitives.swept_offsets[indices]
+    ends = primitives.swept_offsets[indices + 1]
+    cells = primitives.swept_cells[starts[0]:ends[-1]] \
+        + numpy.asarray(cell, dtype=numpy.int32)
+    blocked = _IsOccupied(occupancy, cells)
+
+    # Sum per primitive; primitives without cells are always valid.
+    counts = numpy.concatenate(([0], numpy.cumsum(blocked)))
+    num_blocked = counts[ends - starts[0]] - counts[starts - starts[0]]
+    return indices, num_blocked == 0
@@ -0,0 +1,279 @@
+import logging
+import math
+import numpy
+import threading
+import time
+
+logger = logging.getLogger('herbpy')
+
+
+class ForceTorqueSample(object):
+    def __init__(self, stamp, wrench, filtered):
+        """Force/torque reading.
+        @param stamp time the reading was taken, in seconds
+        @param wrench unfiltered [fx, fy, fz, tx, ty, tz] in the hand frame
+        @param filtered low-pass filtered wrench; equal to \p wrench if the
+                        buffer does not filter
+        """
+        self.stamp = stamp
+        self.wrench = wrench
+        self.filtered = filtered
+
+    @property
+    def force(self):
+        return self.wrench[0:3]
+
+    @property
+    def torque(self):
+        return self.wrench[3:6]
+
+
+class ForceTorqueBuffer(object):
+    def __init__(self, capacity=1000, cutoff_frequency=None):
+        """Latest force/torque reading plus a history of recent readings.
+        The latest reading is published by swapping a single reference, so
+        \ref GetLatest does not take a lock. The history is a ring buffer of
+        timestamped wrenches. Readings can optionally be low-pass filtered by
+        a first-order filter with \p cutoff_frequency. The \ref bias set by
+        \ref SoftTare is subtracted from readings as they are appended.
+        @param capacity number of readings kept in the history
+        @param cutoff_frequency cutoff of the low-pass filter, in Hz; None
+                                disables filtering
+        """
+        self.capacity = capacity
+        self.cutoff_frequency = cutoff_frequency
+        self.bias = numpy.zeros(6)
+        self._stamps = numpy.zeros(capacity)
+        self._wrenches = numpy.zeros((capacity, 6))
+        # Bias subtracted from each stored wrench, to recover the raw reading.
+        self._biases = numpy.zeros((capacity, 6))
+        self._count = 0
+        self._latest = None
+        self._callbacks = []
+        self._condition = threading.Condition()
+
+    def AddCallback(self, callback):
+        """Call a function with every new \ref ForceTorqueSample.
+        Callbacks run in the thread that appends readings and must be fast.
+        @param callback function that takes a ForceTorqueSample
+        """
+        with self._condition:
+            self._callbacks = self._callbacks + [callback]
+
+    def RemoveCallback(self, callback):
+        with self._condition:
+            self._callbacks = [c for c in self._callbacks if c is not callback]
+
+    def Append(self, stamp, wrench):
+        """Add a reading. Readings must be appended in chronological order.
+        @param stamp time the reading was taken, in seconds
+        @param wrench [fx, fy, fz, tx, ty, tz] in the hand frame
+        """
+        bias = self.bias
+        wrench = numpy.array(wrench, dtype=float) - bias
+
+        latest = self._latest
+        if self.cutoff_frequency is None:
+            filtered = wrench
+        elif latest is None:
+            filtered = wrench.copy()
+        else:
+            dt = max(stamp - latest.stamp, 0.)
+            rc = 1. / (2. * math.pi * self.cutoff_frequency)
+            alpha = dt / (rc + dt)
+            filtered = latest.filtered + alpha * (wrench - latest.filtered)
+
+        sample = ForceTorqueSample(stamp, wrench, filtered)
+        with self._condition:
+            index = self._count % self.capacity
+            self._stamps[index] = stamp
+            self._wrenches[index] = wrench
+            self._biases[index] = bias
+            self._count += 1
+            self._latest = sample
+            callbacks = self._callbacks
+            self._condition.notify_all()
+
+        for callback in callbacks:
+            callback(sample)
+
+    def GetLatest(self):
+        """Get the newest reading without blocking.
+        @return ForceTorqueSample, or None if nothing has been received
+        """
+        return self._latest
+
+    def WaitForNewer(self, stamp=None, timeout=None):
+        """Block until a reading newer than \p stamp arrives.
+        @param stamp time of the last reading the caller has seen; None waits
+                     for the first reading if none has been received yet
+        @param timeout maximum time to wait, in seconds
+        @return ForceTorqueSample, or None if the timeout expired
+        """
+        def IsNewer():
+            latest = self._latest
+            return latest is not None and (stamp is None or latest.stamp > stamp)
+
+        with self._condition:
+            if not IsNewer():
+                if timeout is None:
+                    while not IsNewer():
+                        self._condition.wait()
+                else:
+                    self._condition.wait(timeout)
+                    if not IsNewer():
+                        return None
+            return self._latest
+
+    def GetHistory(self, since=None):
+        """Get the stored readings in chronological order.
+        @param since only return readings taken after this time, in seconds
+        @return stamps,wrenches arrays of timestamps and unfiltered wrenches
+        """
+        stamps, wrenches, _ = self._GetHistory(since)
+        return stamps, wrenches
+
+    def _GetHistory(self, since):
+        with self._condition:
+            count = min(self._count, self.capacity)
+            order = numpy.arange(self._count - count, self._count) % self.capacity
+            stamps = self._stamps[order]
+            wrenches = self._wrenches[order]
+            biases = self._biases[order]
+
+        if since is not None:
+            mask = stamps > since
+            stamps, wrenches, biases = stamps[mask], wrenches[mask], biases[mask]
+        return stamps, wrenches, biases
+
+    def SoftTare(self, duration=0.1, timeout=1.):
+        """Zero the readings in software.
+        The mean of the raw buffered readings from the last \p duration
+        seconds becomes the bias that is subtracted from new readings, so
+        taring again replaces the previous bias instead of adding to it. This
+        returns immediately if readings are already buffered, but does not
+        re-zero the sensor's electronics like a hardware tare does.
+        @param duration length of the averaging window, in seconds
+        @param timeout maximum time to wait for a reading, in seconds
+        @return new bias, [fx, fy, fz, tx, ty, tz]
+        """
+        latest = self.GetLatest()
+        if latest is None:
+            latest = self.WaitForNewer(timeout=timeout)
+            if latest is None:
+                raise RuntimeError('No force/torque readings to tare with.')
+
+        _, wrenches, biases = self._GetHistory(since=latest.stamp - duration)
+        if len(wrenches) == 0:
+            _, wrenches, biases = self._GetHistory(since=None)
+            wrenches, biases = wrenches[-1:], biases[-1:]
+
+        with self._condition:
+            self.bias = (wrenches + biases).mean(axis=0)
+            return self.bias.copy()
+
+    def ResetBias(self):
+        """Clear the software bias, e.g. after a hardware tare."""
+        with self._condition:
+            self.bias = numpy.zeros(6)
+
+
+class TareFuture(object):
+    def __init__(self, function, name=None):
+        """Run a blocking tare in a background thread.
+        @param function function that performs the tare; its return value
+                        is the result of the future
+        @param name name of the background thread
+        """
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+
+        thread = threading.Thread(target=self._Run, args=(function,),
+                                  name=name)
+        thread.daemon = True
+        thread.start()
+
+    def _Run(self, function):
+        try:
+            self._result = function()
+        except Exception as e:
+            self._exception = e
+        finally:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the tare to finish.
+        @param timeout maximum time to wait, in seconds
+        @return result of the tare function
+        """
+        if not self._done.wait(timeout):
+            raise RuntimeError('Tare did not finish within {} seconds.'.format(
+                               timeout))
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+def WaitForTares(futures, timeout=None):
+    """Wait for several tares that run concurrently.
+    @param futures TareFutures to wait for
+    @param timeout maximum total time to wait, in seconds
+    @return list of results
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    results = []
+    for future in futures:
+        remaining = None if deadline is None else max(deadline - time.time(), 0.)
+        results.append(future.result(remaining))
+    return results
+
+
+class ForceTorqueSubscriber(ForceTorqueBuffer):
+    def __init__(self, topic, capacity=1000, cutoff_frequency=None):
+        """Persistent subscription to a geometry_msgs/WrenchStamped topic.
+        Every message is added to the \ref ForceTorqueBuffer as it arrives.
+        @param topic WrenchStamped topic, e.g. '/left/ft_wrench'
+        @param capacity number of readings kept in the history
+        @param cutoff_frequency cutoff of the low-pass filter, in Hz; None
+                                disables filtering
+        """
+        import rospy
+        from geometry_msgs.msg import WrenchStamped
+
+        ForceTorqueBuffer.__init__(self, capacity=capacity,
+                                   cutoff_frequency=cutoff_frequency)
+        self.topic = topic
+        self._subscriber = rospy.Subscriber(
+            topic, WrenchStamped, self._Callback, queue_size=1,
+            tcp_nodelay=True)
+
+    def GetForceTorque(self, timeout=None, filtered=False):
+        """Get the newest force/torque reading.
+        Blocks only if no reading has been received yet.
+        @param timeout maximum time to wait for the first reading, in seconds
+        @param filtered return the low-pass filtered reading
+        @return force,torque force/torque in the hand frame
+        """
+        sample = self.GetLatest()
+        if sample is None:
+            sample = self.WaitForNewer(timeout=timeout)
+            if sample is None:
+                raise RuntimeError('No force/torque reading received on "{:s}"'
+                                   ' within {} seconds.'.format(self.topic,
+                                                                timeout))
+
+        wrench = sample.filtered if filtered else sample.wrench
+        return numpy.array(wrench[0:3]), numpy.array(wrench[3:6])
+
+    def Shutdown(self):
+        """Unsubscribe from the topic."""
+        self._subscriber.unregister()
+
+    def _Callback(self, msg):
+        f, t = msg.wrench.force, msg.wrench.torque
+        self.Append(msg.header.stamp.to_sec(),
+                    [f.x, f.y, f.z, t.x, t.y, t.z])
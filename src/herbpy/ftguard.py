@@ -0,0 +1,185 @@
+import logging
+import numpy
+import threading
+import time
+
+logger = logging.getLogger('herbpy')
+
+
+class ContactEvent(object):
+    def __init__(self, stamp, detection_time, force, torque):
+        """Force/torque reading that tripped a \ref ForceTorqueGuard.
+        @param stamp time the reading was taken by the sensor, in seconds
+        @param detection_time time the trajectory was cancelled, in seconds
+        @param force force in the hand frame, in Newtons
+        @param torque torque in the hand frame, in Newton-meters
+        """
+        self.stamp = stamp
+        self.detection_time = detection_time
+        self.latency = detection_time - stamp
+        self.force = force
+        self.torque = torque
+
+    def __str__(self):
+        return ('contact at {:.3f} s, cancelled after {:.1f} ms, force {},'
+                ' torque {}').format(self.stamp, 1e3 * self.latency,
+                                     self.force, self.torque)
+
+
+class ForceTorqueGuard(object):
+    def __init__(self, hand, controllers=None):
+        """Cancel trajectories as soon as a hand feels a force.
+        The guard listens to the hand's persistent force/torque subscription
+        and keeps publishers to the cancel topics of the trajectory
+        controllers open for its lifetime. Publishers are created when the
+        guard is, because a new publisher drops messages until its
+        subscribers have connected. While armed, every reading is checked
+        against the thresholds as it arrives and the first one that exceeds
+        them cancels all goals of the guarded controllers.
+        @param hand BarrettHand whose force/torque sensor is monitored
+        @param controllers names of the trajectory controllers whose cancel
+                           publishers are created right away
+        """
+        self.hand = hand
+        self.contact = None
+        self._lock = threading.Lock()
+        self._triggered = threading.Event()
+        self._publishers = {}
+        self._armed = False
+        self._force_direction = None
+        self._max_force = None
+        self._max_torque = None
+        self._cancel_publishers = []
+        self._cancel_message = None
+
+        for controller in controllers or []:
+            self.GetCancelPublisher(controller)
+
+        self._subscriber = hand.GetForceTorqueSubscriber()
+        self._subscriber.AddCallback(self._OnSample)
+
+    def GetCancelPublisher(self, controller):
+        """Get the persistent cancel publisher of a trajectory controller.
+        @param controller name of the trajectory controller
+        @return rospy.Publisher of actionlib_msgs/GoalID
+        """
+        publisher = self._publishers.get(controller)
+        if publisher is None:
+            import rospy
+            from actionlib_msgs.msg import GoalID
+
+            publisher = rospy.Publisher(
+                '/{:s}/follow_joint_trajectory/cancel'.format(controller),
+                GoalID, queue_size=1)
+            self._publishers[controller] = publisher
+        return publisher
+
+    def Arm(self, controllers, max_force, max_torque, force_direction=None,
+            connection_timeout=1.):
+        """Start checking readings against thresholds.
+        @param controllers names of the trajectory controllers to cancel
+        @param max_force maximum force in Newtons
+        @param max_torque maximum torque about each axis in Newton-meters
+        @param force_direction expected direction of the contact force in the
+                               hand frame; only the component of the force
+                               along it is checked. None checks the force
+                               magnitude.
+        @param connection_timeout maximum time to wait for the controllers to
+                                  connect to their cancel topics, in seconds
+        """
+        publishers = [self.GetCancelPublisher(c) for c in controllers]
+        cancel_message = self._CreateCancelMessage()
+        self._WaitForConnections(controllers, publishers, connection_timeout)
+
+        if force_direction is not None:
+            force_direction = numpy.array(force_direction, dtype=float)
+            force_direction /= numpy.linalg.norm(force_direction)
+
+        with self._lock:
+            self.contact = None
+            self._triggered.clear()
+            self._cancel_publishers = publishers
+            self._cancel_message = cancel_message
+            self._force_direction = force_direction
+            self._max_force = max_force
+            self._max_torque = numpy.array(max_torque, dtype=float)
+            self._armed = True
+
+    def Disarm(self):
+        """Stop checking readings.
+        @return ContactEvent that tripped the guard, or None
+        """
+        with self._lock:
+            self._armed = False
+            return self.contact
+
+    def IsTriggered(self):
+        return self._triggered.is_set()
+
+    def WaitForContact(self, timeout=None):
+        """Block until the guard trips.
+        @param timeout maximum time to wait, in seconds
+        @return ContactEvent, or None if the timeout expired
+        """
+        self._triggered.wait(timeout)
+        return self.contact
+
+    def Shutdown(self):
+        """Stop listening to the sensor and unregister all publishers."""
+        self._subscriber.RemoveCallback(self._OnSample)
+        for publisher in self._publishers.values():
+            publisher.unregister()
+        self._publishers = {}
+
+    def _WaitForConnections(self, controllers, publishers, timeout):
+        # A cancel published before the controller connected would be lost.
+        deadline = time.time() + timeout
+        while True:
+            unconnected = [controller for controller, publisher
+                           in zip(controllers, publishers)
+                           if publisher.get_num_connections() == 0]
+            if not unconnected or time.time() >= deadline:
+                break
+            time.sleep(0.01)
+
+        if unconnected:
+            logger.warning('Controllers %s are not subscribed to their cancel'
+                           ' topics; contact may not stop them.', unconnected)
+
+    def _CreateCancelMessage(self):
+        # An empty GoalID cancels every goal of the action server.
+        from actionlib_msgs.msg import GoalID
+        return GoalID()
+
+    def _GetTime(self):
+        import rospy
+        return rospy.get_time()
+
+    def _IsExceeded(self, force, torque):
+        if self._force_direction is not None:
+            force_exceeded = numpy.dot(force, self._force_direction) >= self._max_force
+        else:
+            force_exceeded = numpy.linalg.norm(force) >= self._max_force
+        return force_exceeded or numpy.any(numpy.abs(torque) >= self._max_torque)
+
+    def _OnSample(self, sample):
+        # Unlocked fast path for the common case of a disarmed guard.
+        if not self._armed:
+            return
+
+        with self._lock:
+            if not self._armed or not self._IsExceeded(sample.force,
+                                                       sample.torque):
+                return
+
+            for publisher in self._cancel_publishers:
+                publisher.publish(self._cancel_message)
+
+            self._armed = False
+            self.contact = ContactEvent(sample.stamp, self._GetTime(),
+                                        numpy.array(sample.force),
+                                        numpy.array(sample.torque))
+            self._triggered.set()
+
+        logger.info('Force/torque guard of "%s" tripped: %s',
+                    self.hand.GetName(), self.contact)
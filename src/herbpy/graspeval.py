@@ -0,0 +1,393 @@
+import collections
+import logging
+import numpy
+import os
+
+logger = logging.getLogger('herbpy')
+
+
+def GetDefaultPath(obj):
+    """Get the default location of an object's grasp table.
+    The directory is read from the HERBPY_GRASP_DIR environment variable and
+    defaults to ~/.herbpy/grasps. Tables are keyed by the object's name and
+    geometry hash.
+    @param obj OpenRAVE KinBody
+    @return path of the .npz file
+    """
+    directory = os.environ.get('HERBPY_GRASP_DIR',
+        os.path.join(os.path.expanduser('~'), '.herbpy', 'grasps'))
+    return os.path.join(directory, '{:s}.{:s}.npz'.format(
+        obj.GetName(), obj.GetKinematicsGeometryHash()))
+
+
+def LoadPreshapes(path=None, names=None):
+    """Load named hand preshapes.
+    @param path YAML file in the format of config/barrett_preshapes.yaml;
+                defaults to the one shipped with herbpy
+    @param names names of the preshapes to load; defaults to all of them
+    @return OrderedDict of preshape names to [f1, f2, f3, spread], sorted by
+            name
+    """
+    import yaml
+
+    if path is None:
+        from prpy.util import FindCatkinResource
+        path = FindCatkinResource('herbpy', 'config/barrett_preshapes.yaml')
+
+    with open(path, 'r') as preshapes_file:
+        configurations = yaml.safe_load(preshapes_file)['configurations']
+
+    if names is None:
+        names = sorted(configurations.keys())
+
+    preshapes = collections.OrderedDict()
+    for name in names:
+        if name not in configurations:
+            raise ValueError('There is no preshape named "{:s}" in "{:s}".'
+                             .format(name, path))
+        preshapes[name] = numpy.array(configurations[name]['hand'], dtype=float)
+    return preshapes
+
+
+def ComputeGraspQuality(points, center, length, friction=0.5):
+    """Compute the quality of a grasp from its contacts.
+    The quality is the smallest singular value of the grasp matrix, which
+    maps contact forces to object wrenches. Each contact is a point contact
+    with friction, approximated by its normal and two tangents scaled by
+    \p friction. Torques are divided by \p length so forces and torques have
+    the same units. The quality is zero if the contacts cannot resist some
+    wrench, e.g. if there are fewer than two contacts.
+    @param points (K, 6) array of contact positions and normals
+    @param center reference point of the object, e.g. its center
+    @param length characteristic length of the object, in meters
+    @param friction friction coefficient
+    @return grasp quality; larger is better
+    """
+    points = numpy.asarray(points, dtype=float).reshape(-1, 6)
+    if 3 * len(points) < 6:
+        return 0.
+
+    positions = points[:, 0:3] - center
+    normals = points[:, 3:6]
+    normals = normals / numpy.linalg.norm(normals, axis=1)[:, numpy.newaxis]
+
+    # Any vector that is not parallel to a normal gives its tangents.
+    helpers = numpy.zeros_like(normals)
+    parallel_to_x = numpy.abs(normals[:, 0]) > 0.9
+    helpers[parallel_to_x, 1] = 1.
+    helpers[~parallel_to_x, 0] = 1.
+    tangents1 = numpy.cross(normals, helpers)
+    tangents1 /= numpy.linalg.norm(tangents1, axis=1)[:, numpy.newaxis]
+    tangents2 = numpy.cross(normals, tangents1)
+
+    directions = numpy.concatenate((normals, friction * tangents1,
+                                    friction * tangents2))
+    arms = numpy.tile(positions, (3, 1))
+    grasp_matrix = numpy.vstack((directions.T,
+                                 numpy.cross(arms, directions).T / length))
+    return numpy.linalg.svd(grasp_matrix, compute_uv=False)[-1]
+
+
+class GraspTable(object):
+    def __init__(self, poses, preshape_names, preshapes, dof_values,
+                 in_contact, quality, collision, metadata=None):
+        """Results of evaluating hand poses and preshapes on an object.
+        Entry [i, j] of the arrays is the result of closing the hand from
+        preshape j at pose i. Tables are built offline with
+        \ref EvaluateGrasps and queried by TSR factories with
+        \ref GetHandPoses or \ref GetTSRChains.
+        @param poses (N, 4, 4) array of end-effector poses in the object frame
+        @param preshape_names list of P preshape names
+        @param preshapes (P, 4) array of preshapes
+        @param dof_values (N, P, 4) array of hand DOF values after closing
+        @param in_contact (N, P, 3) boolean array; True for fingers that
+                          touch the object after closing
+        @param quality (N, P) array of grasp qualities, see
+                       \ref ComputeGraspQuality
+        @param collision (N, P) boolean array; True if the hand penetrates
+                         the object in the preshape
+        @param metadata optional dict describing how the table was built
+        """
+        self.poses = numpy.array(poses, dtype=float)
+        self.preshape_names = [str(name) for name in preshape_names]
+        self.preshapes = numpy.array(preshapes, dtype=float)
+        self.dof_values = numpy.array(dof_values, dtype=numpy.float32)
+        self.in_contact = numpy.array(in_contact, dtype=bool)
+        self.quality = numpy.array(quality, dtype=numpy.float32)
+        self.collision = numpy.array(collision, dtype=bool)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def Load(cls, path):
+        """Load a table saved with \ref Save.
+        @param path path of the .npz file
+        @return GraspTable
+        """
+        data = numpy.load(path)
+        metadata = dict((key[len('metadata_'):], data[key].item())
+                        for key in data.files if key.startswith('metadata_'))
+        return cls(data['poses'], list(data['preshape_names']),
+                   data['preshapes'], data['dof_values'], data['in_contact'],
+                   data['quality'], data['collision'], metadata=metadata)
+
+    def Save(self, path):
+        """Save the table to a compressed .npz file.
+        @param path path of the .npz file
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        metadata = dict(('metadata_' + key, value)
+                        for key, value in self.metadata.items())
+        with open(path, 'wb') as table_file:
+            numpy.savez_compressed(
+                table_file, poses=self.poses,
+                preshape_names=numpy.array(self.preshape_names),
+                preshapes=self.preshapes, dof_values=self.dof_values,
+                in_contact=self.in_contact, quality=self.quality,
+                collision=self.collision, **metadata)
+
+    def GetPreshapeIndex(self, name):
+        try:
+            return self.preshape_names.index(name)
+        except ValueError:
+            raise ValueError('The grasp table has no preshape named "{:s}".'
+                             ' Expected one of: {:s}.'.format(
+                             name, ', '.join(self.preshape_names)))
+
+    def GetGrasps(self, preshape=None, min_quality=0., min_contacts=2,
+                  max_count=None):
+        """Find the best collision-free grasps.
+        @param preshape name of the preshape to consider; None considers all
+        @param min_quality minimum grasp quality
+        @param min_contacts minimum number of fingers touching the object
+        @param max_count maximum number of grasps to return
+        @return pose_indices,preshape_indices arrays of table entries, sorted
+                by decreasing quality
+        """
+        valid = ~self.collision
+        valid &= self.quality >= min_quality
+        valid &= self.in_contact.sum(axis=2) >= min_contacts
+        if preshape is not None:
+            mask = numpy.zeros(len(self.preshape_names), dtype=bool)
+            mask[self.GetPreshapeIndex(preshape)] = True
+            valid &= mask[numpy.newaxis, :]
+
+        pose_indices, preshape_indices = numpy.nonzero(valid)
+        order = numpy.argsort(-self.quality[pose_indices, preshape_indices],
+                              kind='mergesort')
+        if max_count is not None:
+            order = order[:max_count]
+        return pose_indices[order], preshape_indices[order]
+
+    def GetHandPoses(self, obj_pose, **kw_args):
+        """Get the best grasps of an object at a pose.
+        @param obj_pose pose of the object in the world frame
+        @param **kw_args filters of \ref GetGrasps
+        @return poses,preshapes (M, 4, 4) end-effector poses in the world
+                frame and (M, 4) preshapes, best first
+        """
+        pose_indices, preshape_indices = self.GetGrasps(**kw_args)
+        poses = numpy.einsum('ij,njk->nik', obj_pose, self.poses[pose_indices])
+        return poses, self.preshapes[preshape_indices]
+
+    def GetTSRChains(self, robot, obj, manip=None, **kw_args):
+        """Create goal TSR chains for the best grasps of an object.
+        Each chain is a single pose with no freedom, so planners try the
+        grasps in the order of the returned list.
+        @param robot robot performing the grasp
+        @param obj object to grasp
+        @param manip manipulator performing the grasp; defaults to the active
+                     manipulator
+        @param **kw_args filters of \ref GetGrasps
+        @return list of TSRChains, best first
+        """
+        from openravepy import KinBody
+        from tsr.tsr import TSR, TSRChain
+
+        p = KinBody.SaveParameters
+        with robot.GetEnv():
+            with robot.CreateRobotStateSaver(p.ActiveManipulator):
+                if manip is not None:
+                    manip.SetActive()
+                manip_idx = robot.GetActiveManipulatorIndex()
+            obj_pose = obj.GetTransform()
+
+        pose_indices, _ = self.GetGrasps(**kw_args)
+        chains = []
+        for pose in self.poses[pose_indices]:
+            grasp_tsr = TSR(T0_w=obj_pose, Tw_e=pose, Bw=numpy.zeros((6, 2)),
+                            manip=manip_idx)
+            chains.append(TSRChain(sample_start=False, sample_goal=True,
+                                   constrain=False, TSR=grasp_tsr))
+        return chains
+
+
+class GraspEvaluator(object):
+    def __init__(self, manip, obj, friction=0.5):
+        """Evaluate grasps of an object with a BarrettHand.
+        The object is moved to the origin and the robot is moved so its
+        end-effector is at each hand pose, so no inverse kinematics are
+        needed. Only the hand is checked against the object.
+        @param manip WAM whose hand is evaluated
+        @param obj object to grasp
+        @param friction friction coefficient of the contacts
+        """
+        self.manip = manip
+        self.obj = obj
+        self.friction = friction
+        self.robot = manip.GetRobot()
+        self.hand = manip.hand
+
+        with self.robot.GetEnv():
+            self.hand_links = manip.GetChildLinks()
+            self.ee_in_robot = numpy.dot(
+                numpy.linalg.inv(self.robot.GetTransform()),
+                manip.GetEndEffectorTransform())
+
+    def Evaluate(self, poses, preshapes):
+        """Close the hand from every preshape at every pose.
+        The robot and the object are left unchanged.
+        @param poses (N, 4, 4) array of end-effector poses in the object frame
+        @param preshapes (P, 4) array of preshapes
+        @return dof_values,in_contact,quality,collision arrays of
+                \ref GraspTable
+        """
+        from openravepy import KinBody
+
+        robot, obj = self.robot, self.obj
+        env = robot.GetEnv()
+        simulator = self.hand.GetClosingSimulator()
+        hand_indices = self.hand.GetIndices()
+        robot_poses = numpy.einsum('nij,jk->nik', poses,
+                                   numpy.linalg.inv(self.ee_in_robot))
+
+        num_poses, num_preshapes = len(poses), len(preshapes)
+        dof_values = numpy.zeros((num_poses, num_preshapes, 4))
+        in_contact = numpy.zeros((num_poses, num_preshapes, 3), dtype=bool)
+        quality = numpy.zeros((num_poses, num_preshapes))
+        collision = numpy.zeros((num_poses, num_preshapes), dtype=bool)
+
+        with env:
+            with robot.CreateRobotStateSaver(), \
+                 obj.CreateKinBodyStateSaver():
+                obj.SetTransform(numpy.eye(4))
+                aabb = obj.ComputeAABB()
+                center = aabb.pos()
+                length = max(numpy.linalg.norm(aabb.extents()), 1e-3)
+
+                for i, robot_pose in enumerate(robot_poses):
+                    robot.SetTransform(robot_pose)
+                    for j, preshape in enumerate(preshapes):
+                        robot.SetDOFValues(preshape, hand_indices)
+                        collision[i, j] = any(env.CheckCollision(link, obj)
+                                              for link in self.hand_links)
+                        if collision[i, j]:
+                            dof_values[i, j] = preshape
+                            continue
+
+                        result = simulator.Close(bodies=[obj],
+                                                 spread=preshape[3],
+                                                 contact_points=True)
+                        dof_values[i, j] = result.dof_values
+                        in_contact[i, j] = result.in_contact
+                        quality[i, j] = ComputeGraspQuality(
+                            numpy.concatenate(result.contact_points),
+                            center, length, friction=self.friction)
+
+        return dof_values, in_contact, quality, collision
+
+
+# Per-process state of the pool workers of EvaluateGrasps.
+_worker_evaluator = None
+
+
+def _InitializeWorker(manip_name, obj_uri, friction):
+    global _worker_evaluator
+    import herbpy
+
+    env, robot = herbpy.initialize(sim=True)
+    with env:
+        obj = env.ReadKinBodyURI(obj_uri)
+        if obj is None:
+            raise ValueError('Failed loading object from "{:s}".'.format(
+                             obj_uri))
+        env.Add(obj)
+    manip = robot.GetManipulator(manip_name)
+    _worker_evaluator = GraspEvaluator(manip, obj, friction=friction)
+
+
+def _EvaluateChunk(args):
+    poses, preshapes = args
+    return _worker_evaluator.Evaluate(poses, preshapes)
+
+
+def EvaluateGrasps(manip, obj, poses, preshapes=None, processes=None,
+                   chunk_size=32, friction=0.5):
+    """Evaluate many hand poses and preshapes on an object.
+    Every pose is combined with every preshape. With more than one process,
+    the poses are split into chunks that are evaluated by a pool of worker
+    processes, each with its own simulated HERB and a copy of the object
+    loaded from the file it was loaded from. This is meant to be run offline,
+    e.g. with scripts/evaluate_grasps_herb.py.
+    @param manip WAM whose hand is evaluated
+    @param obj object to grasp; must have been loaded from a file to be
+               evaluated by more than one process
+    @param poses (N, 4, 4) array of end-effector poses in the object frame
+    @param preshapes OrderedDict of preshape names to preshapes; defaults to
+                     \ref LoadPreshapes
+    @param processes number of worker processes; defaults to the number of
+                     CPUs. 1 evaluates in the calling process.
+    @param chunk_size number of poses evaluated per task
+    @param friction friction coefficient of the contacts
+    @return GraspTable
+    """
+    import multiprocessing
+
+    poses = numpy.array(poses, dtype=float).reshape(-1, 4, 4)
+    if preshapes is None:
+        preshapes = LoadPreshapes()
+    preshape_array = numpy.array(list(preshapes.values()), dtype=float)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    chunks = [(poses[start:start + chunk_size], preshape_array)
+              for start in range(0, len(poses), chunk_size)]
+    logger.info('Evaluating %d poses with %d preshapes on "%s" in %d'
+                ' process(es).', len(poses), len(preshape_array),
+                obj.GetName(), processes)
+
+    if processes == 1:
+        evaluator = GraspEvaluator(manip, obj, friction=friction)
+        results = [evaluator.Evaluate(*chunk) for chunk in chunks]
+    else:
+        obj_uri = obj.GetURI()
+        if not obj_uri:
+            raise ValueError('Object "{:s}" was not loaded from a file, so it'
+                             ' cannot be evaluated in worker processes.'
+                             .format(obj.GetName()))
+
+        pool = multiprocessing.Pool(
+            processes, initializer=_InitializeWorker,
+            initargs=(manip.GetName(), obj_uri, friction))
+        try:
+            results = pool.map(_EvaluateChunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+    if results:
+        dof_values, in_contact, quality, collision = [
+            numpy.concatenate(arrays) for arrays in zip(*results)]
+    else:
+        dof_values = numpy.zeros((0, len(preshape_array), 4))
+        in_contact = numpy.zeros((0, len(preshape_array), 3), dtype=bool)
+        quality = numpy.zeros((0, len(preshape_array)))
+        collision = numpy.zeros((0, len(preshape_array)), dtype=bool)
+
+    return GraspTable(poses, list(preshapes.keys()), preshape_array,
+                      dof_values, in_contact, quality, collision,
+                      metadata={'object': obj.GetName(),
+                                'manipulator': manip.GetName(),
+                                'friction': friction})
@@ -41,9 +41,79 @@ class HerbBase(MobileBase):
                               dof_indices=[],
                               affine_dofs=openravepy.DOFAffine.Transform,
                               simulated=sim)
+        self.last_guarded_motion = None
+        self.footprint = None
+        self.footprint_table = None
+        self.swept_primitives = None
+        self.costmap = None
 
     def CloneBindings(self, parent):
         MobileBase.CloneBindings(self, parent)
+        self.last_guarded_motion = None
+        self.footprint = parent.footprint
+        self.footprint_table = parent.footprint_table
+        self.swept_primitives = parent.swept_primitives
+        # The costmap describes the bodies of the parent's environment.
+        self.costmap = None
+
+    def GetFootprint(self):
+        """Get the robot's footprint with the arms in the stowed
+        'relaxed_home' configuration. It is computed once.
+        @return (K, 2) array of the footprint's vertices in the robot frame
+        """
+        if self.footprint is None:
+            from .footprint import GetRobotFootprint
+            self.footprint = GetRobotFootprint(self.robot, 'relaxed_home')
+        return self.footprint
+
+    def GetFootprintTable(self):
+        """Get the robot's footprint rasterized at every heading of the base
+        planner's primitives. See \ref GetFootprint.
+        @return herbpy.footprint.FootprintTable
+        """
+        if self.footprint_table is None:
+            from .footprint import FootprintTable
+            self.footprint_table = FootprintTable.FromPrimitives(
+                self.GetFootprint(), self.robot.base_primitives)
+        return self.footprint_table
+
+    def GetSweptPrimitives(self):
+        """Get the base planner's primitives with the cells swept by the
+        robot's footprint, which HERBRobot.base_primitives does not have.
+        They are computed once. Check them against the costmap from
+        \ref GetCostmap with herbpy.costmap.BaseCostmap.CheckPrimitives.
+        @return herbpy.primitives.PrimitiveSet with swept cells
+        """
+        if self.swept_primitives is None:
+            self.swept_primitives = self.GetFootprintTable().AddSweptCells(
+                self.robot.base_primitives)
+        return self.swept_primitives
+
+    def GetCostmap(self, update=True):
+        """Get the 2D costmap of the obstacles around the base.
+        The costmap is created on the first call with the cellsize of the
+        base planner's primitives, covers all bodies in the environment at
+        that time, and is inflated by the circumscribed radius of the robot's
+        footprint. The robot and the objects it holds are not obstacles.
+        Check the primitives from \ref GetSweptPrimitives against it.
+        @param update bring the costmap up to date with the environment;
+                      only bodies that changed are rasterized again
+        @return herbpy.costmap.BaseCostmap
+        """
+        env = self.robot.GetEnv()
+        with env:
+            ignore = [self.robot] + list(self.robot.GetGrabbed())
+
+            if self.costmap is None:
+                from .costmap import BaseCostmap
+                footprint = self.GetFootprint()
+                radius = numpy.max(numpy.hypot(footprint[:, 0], footprint[:, 1]))
+                self.costmap = BaseCostmap.FromEnvironment(
+                    env, self.robot.base_primitives.cellsize,
+                    inflation_radius=radius, ignore=ignore)
+            elif update:
+                self.costmap.Update(env, ignore=ignore)
+        return self.costmap
 
     def Forward(self, meters, execute=True, timeout=None, **kwargs):
         """Drive forward for the desired distance.
@@ -75,13 +145,21 @@ class HerbBase(MobileBase):
                 is_done = prpy.util.WaitForControllers(running_controllers, timeout=timeout)
 
     def DriveStraightUntilForce(self, direction, velocity=0.1, force_threshold=3.0,
-                                max_distance=None, timeout=None, left_arm=True, right_arm=True):
+                                max_distance=None, timeout=None, left_arm=True, right_arm=True,
+                                rate=20., detector_args=None, max_data_age=0.25):
         """
         Drive the base in a direction until a force/torque sensor feels a force. The
         base first turns to face the desired direction, then drives forward at the
         specified velocity. The action terminates when max_distance is reached, the
-        timeout is exceeded, or if a force is felt. The maximum distance and timeout
-        can be disabled by setting the corresponding parameters to None.
+        timeout is exceeded, if a force is felt, or if a force/torque sensor stops
+        publishing. The maximum distance and timeout can be disabled by setting the
+        corresponding parameters to None.
+
+        The sensors are soft-tared and every reading is checked as it arrives, so
+        the reaction to a contact does not depend on the command rate. See
+        herbpy.basemotion.GuardedBaseMotion for details. The loop rate, reaction
+        latency, and distance traveled are logged and stored in
+        \ref last_guarded_motion.
         @param direction forward direction of motion in the world frame
         @param velocity desired forward velocity
         @param force_threshold threshold force in Newtons
@@ -89,25 +167,34 @@ class HerbBase(MobileBase):
         @param timeout maximum duration in seconds
         @param left_arm flag to use the left force/torque sensor
         @param right_arm flag to use the right force/torque sensor
+        @param rate rate of the velocity commands, in Hz
+        @param detector_args optional parameters of herbpy.contact.ContactDetector
+                             to also stop on contacts it detects
+        @param max_data_age maximum age of the newest force/torque reading in
+                            seconds; None disables the check
         @return flag indicating whether the action felt a force
         """
         if self.simulated:
             raise NotImplementedError('DriveStraightUntilForce does not work in simulation.')
         else:
-            if (self.robot.left_ft_sim and left_arm) or (self.robot.right_ft_sim and right_arm):
+            import rospy
+            from .basemotion import GuardedBaseMotion
+
+            hands = list()
+            if left_arm:
+                hands.append(self.robot.left_arm.hand)
+            if right_arm:
+                hands.append(self.robot.right_arm.hand)
+
+            if any(hand.ft_simulated for hand in hands):
                 raise Exception('DriveStraightUntilForce does not work with simulated force/torque sensors.')
 
             with prpy.util.Timer("Drive segway until force"):
                 env = self.robot.GetEnv()
                 direction = numpy.array(direction, dtype='float')
                 direction /= numpy.linalg.norm(direction)
-                manipulators = list()
-                if left_arm:
-                    manipulators.append(self.robot.left_arm)
-                if right_arm:
-                    manipulators.append(self.robot.right_arm)
 
-                if not manipulators:
+                if not hands:
                     logger.warning('Executing DriveStraightUntilForce with no force/torque sensor for feedback.')
 
                 # Rotate to face the right direction.
@@ -117,41 +204,29 @@ class HerbBase(MobileBase):
                 desired_angle = numpy.arctan2(direction[1], direction[0])
                 self.Rotate(desired_angle - robot_angle)
 
-
                 # Soft-tare the force/torque sensors. Tare is too slow.
-                initial_force = dict()
-                for manipulator in manipulators:
-                    force, torque = manipulator.hand.GetForceTorque()
-                    initial_force[manipulator] = force
-
-                try:
-                    felt_force = False
-                    start_time = time.time()
-                    start_pos = robot_pose[0:3, 3]
-                    while True:
-                        # Check if we felt a force on any of the force/torque sensors.
-                        for manipulator in manipulators:
-                            force, torque = manipulator.hand.GetForceTorque()
-                            if numpy.linalg.norm(initial_force[manipulator] - force) > force_threshold:
-                                return True
-
-                        # Check if we've exceeded the maximum distance.
-                        with env:
-                            current_pos = self.robot.GetTransform()[0:3, 3]
-                        distance = numpy.dot(current_pos - start_pos, direction)
-                        if max_distance is not None and distance >= max_distance:
-                            return False
-
-                        # Check for a timeout.
-                        time_now = time.time()
-                        if timeout is not None and time_now - start_time > timeout:
-                            return False
-
-                        # Continuously stream forward velocities.
-                        self.controller.SendCommand('DriveInstantaneous {0:f} 0 0'.format(velocity))
-                finally:
-                    # Stop the Segway before returning.
-                    self.controller.SendCommand('DriveInstantaneous 0 0 0')
+                self.robot.TareForceTorqueSensors(hands, soft=True)
+
+                with env:
+                    start_pos = self.robot.GetTransform()[0:3, 3]
+
+                def GetDistance():
+                    with env:
+                        current_pos = self.robot.GetTransform()[0:3, 3]
+                    return numpy.dot(current_pos - start_pos, direction)
+
+                def SendVelocity(forward_velocity):
+                    self.controller.SendCommand(
+                        'DriveInstantaneous {0:f} 0 0'.format(forward_velocity))
+
+                motion = GuardedBaseMotion(
+                    [hand.GetForceTorqueSubscriber() for hand in hands],
+                    force_threshold, rate=rate, clock=rospy.get_time,
+                    detector_args=detector_args, max_data_age=max_data_age)
+                self.last_guarded_motion = motion.Run(
+                    SendVelocity, GetDistance, velocity,
+                    max_distance=max_distance, timeout=timeout)
+                return self.last_guarded_motion.felt_force
 
     def DriveAlongVector(self, direction, goal_pos):
         """
@@ -1,14 +1,18 @@
 PACKAGE = 'herbpy'
 import logging
-import numbers
 import prpy
 import prpy.rave
 import prpy.util
-import yaml
 import subprocess
 from .barretthand import BarrettHand
+from .clock import SimulationClock
+from .controller_transaction import ControllerTransaction
+from .forcetorque import WaitForTares
 from .herbbase import HerbBase
 from .herbpantilt import HERBPantilt
+from .limits import UseLimitProfiles
+from .primitives import LoadPrimitives
+from .validation import ValidateTrajectory
 from .wam import WAM
 from prpy import Cloned
 from prpy.action import ActionLibrary
@@ -47,13 +51,23 @@ class HERBRobot(Robot):
     def __init__(self, left_arm_sim, right_arm_sim, right_ft_sim,
                        left_hand_sim, right_hand_sim, left_ft_sim,
                        head_sim, talker_sim, segway_sim, perception_sim,
-                       robot_checker_factory):
+                       robot_checker_factory, sim_speedup=1.):
         Robot.__init__(self, robot_name='herb')
         self.robot_checker_factory = robot_checker_factory
 
+        # Set to a herbpy.tracking.TrackingMonitor to record the tracking
+        # error of every executed trajectory.
+        self.tracking_monitor = None
+
+        # Set to a herbpy.recording.StreamRecorder to log every commanded
+        # trajectory.
+        self.stream_recorder = None
+
         # Controller setup
         self.controller_manager = None
         self.controllers_always_on = []
+        self._controller_resources = {}
+        self._controller_transaction = None
 
         self.full_controller_sim = (left_arm_sim and right_arm_sim and
                                     left_ft_sim and right_ft_sim and
@@ -62,22 +76,28 @@ class HERBRobot(Robot):
         if not self.full_controller_sim:
             # any non-simulation requires ros and the ros_control stack
             import rospy
-            from ros_control_client_py import (
-                ControllerManagerClient,
-                JointStateClient,
-            )
+            from ros_control_client_py import ControllerManagerClient
+            from .jointstate import BufferedJointStateClient
 
             if not rospy.core.is_initialized():
                 raise RuntimeError('rospy not initialized. '
                                    'Must call rospy.init_node()')
 
             # update openrave state from /joint_states
-            self._jointstate_client = JointStateClient(
+            self._jointstate_client = BufferedJointStateClient(
                 self, topic_name='/joint_states')
 
             self.controller_manager = ControllerManagerClient()
             self.controllers_always_on.append('joint_state_controller')
 
+        # Simulated time only runs faster than wall-clock time if every arm
+        # and hand controller is simulated.
+        if sim_speedup != 1. and not self.full_controller_sim:
+            logger.warning('Ignoring sim_speedup because not all controllers'
+                           ' are simulated.')
+            sim_speedup = 1.
+        self.clock = SimulationClock(speedup=sim_speedup)
+
         # Convenience attributes for accessing self components.
         self.left_arm = self.GetManipulator('left')
         self.right_arm = self.GetManipulator('right')
@@ -98,6 +118,10 @@ class HERBRobot(Robot):
                            bhd_namespace='/right', ft_sim=right_ft_sim)
         self.base = HerbBase(sim=segway_sim, robot=self)
 
+        # The arms load their IK databases in parallel.
+        for arm in [self.left_arm, self.right_arm]:
+            arm.WaitForIKLoad()
+
         # Set HERB's acceleration limits. These are not specified in URDF.
         accel_limits = self.GetDOFAccelerationLimits()
         accel_limits[self.head.GetArmIndices()] = [2.] * self.head.GetArmDOF()
@@ -105,25 +129,12 @@ class HERBRobot(Robot):
         accel_limits[self.right_arm.GetArmIndices()] = [2.] * self.right_arm.GetArmDOF()
         self.SetDOFAccelerationLimits(accel_limits)
 
+        # Limit profiles scale these limits, not the ones loaded from URDF.
+        for arm in [self.left_arm, self.right_arm]:
+            arm.SetNominalLimits()
 
-        # Determine always-on controllers
-
-        # hand controllers
-        if not left_hand_sim:
-            self.controllers_always_on.append('left_hand_controller')
-
-        if not right_hand_sim:
-            self.controllers_always_on.append('right_hand_controller')
-
-        # force/torque controllers
-        if not left_ft_sim or not right_ft_sim:
-            self.controllers_always_on.append('force_torque_sensor_controller')
-
-        if not left_ft_sim:
-            self.controllers_always_on.append('left_tare_controller')
-
-        if not right_ft_sim:
-            self.controllers_always_on.append('right_tare_controller')
+        # Hand and force/torque controllers are requested together with the
+        # always-on controllers below.
 
         # Set default manipulator controllers in sim only
         # NOTE: head is ignored until TODO new Schunk head integrated
@@ -143,8 +154,12 @@ class HERBRobot(Robot):
 
         # load and activate initial controllers
         if self.controller_manager is not None:
-            self.controller_manager.request(
-                self.controllers_always_on).switch()
+            with self.ControllerTransaction() as transaction:
+                for controller in self.controllers_always_on:
+                    transaction.RequestController(controller)
+                for hand in [self.left_hand, self.right_hand]:
+                    transaction.RequestHand(hand)
+                    transaction.RequestTare(hand)
 
         # Support for named configurations.
         import os.path
@@ -221,10 +236,11 @@ class HERBRobot(Robot):
 
         self.sbpl_planner = SBPLPlanner()
         try:
-            with open(planner_parameters_path, 'rb') as config_file:
-                params_yaml = yaml.load(config_file)
-            self.sbpl_planner.SetPlannerParameters(params_yaml)
-        except IOError as e:
+            # Uses a binary copy of the YAML file, which is much faster to load.
+            self.base_primitives = LoadPrimitives(planner_parameters_path)
+            self.sbpl_planner.SetPlannerParameters(
+                self.base_primitives.ToParameters())
+        except (IOError, OSError) as e:
             raise ValueError('Failed loading base planner parameters from "{:s}".'.format(
                 planner_parameters_path))
 
@@ -288,6 +304,12 @@ class HERBRobot(Robot):
         self.manipulators = [self.left_arm, self.right_arm, self.head]
         self.planner = parent.planner
         self.base_planner = parent.base_planner
+        self.base_primitives = parent.base_primitives
+        self.clock = parent.clock
+        self.tracking_monitor = None
+        self.stream_recorder = None
+        self._controller_resources = {}
+        self._controller_transaction = None
 
     def _ExecuteTrajectory(self, traj, defer=False, timeout=None, period=0.01,
                            **kwargs):
@@ -298,35 +320,41 @@ class HERBRobot(Robot):
         if traj.GetNumWaypoints() <= 0:
             raise ValueError('Trajectory must contain at least one waypoint.')
 
+        # Extract the waypoints once and validate the whole trajectory
+        # against the robot's current state and limits.
+        report = ValidateTrajectory(self, traj)
+
         # Check if this trajectory contains both affine and joint DOFs
-        cspec = traj.GetConfigurationSpecification()
-        needs_base = prpy.util.HasAffineDOFs(cspec)
-        needs_joints = prpy.util.HasJointDOFs(cspec)
+        needs_base = report.has_affine
+        needs_joints = report.has_joints
         if needs_base and needs_joints:
             raise ValueError('Trajectories with affine and joint DOFs are not supported')
 
         # Check that the current configuration of the robot matches the
         # initial configuration specified by the trajectory.
-        if not prpy.util.IsAtTrajectoryStart(self, traj):
+        if not report.is_at_start:
             raise TrajectoryNotExecutable(
                 'Trajectory started from different configuration than robot.')
 
         # If there was only one waypoint, at this point we are done!
-        if traj.GetNumWaypoints() == 1:
+        if report.num_waypoints == 1:
             return traj
 
         # Verify that the trajectory is timed by checking whether the first
         # waypoint has a valid deltatime value.
-        if not prpy.util.IsTimedTrajectory(traj):
+        if not report.is_timed:
             raise ValueError('Trajectory cannot be executed, it is not timed.')
 
         # Verify that the trajectory has non-zero duration.
-        if traj.GetDuration() <= 0.0:
+        if report.duration <= 0.0:
             logger.warning('Executing zero-length trajectory. Please update the'
                           ' function that produced this trajectory to return a'
-                          ' single-waypoint trajectory.', FutureWarning)
+                          ' single-waypoint trajectory.')
+
+        for violation in report.GetViolations():
+            logger.warning('Trajectory exceeds limits: %s', violation)
 
-        traj_manipulators = self.GetTrajectoryManipulators(traj)
+        traj_manipulators = report.manipulators
         controllers_manip = []
         active_controllers = []
         if self.head in traj_manipulators:
@@ -355,9 +383,20 @@ class HERBRobot(Robot):
                 else:
                     active_controllers.append(self.left_arm.sim_controller)
 
-        # load and activate controllers
+        # Simulated trajectories follow the simulation clock. In instant mode
+        # the robot jumps to the end of the trajectory.
+        is_sim_only = not controllers_manip and not needs_base
+        if is_sim_only and self.clock.IsInstant():
+            self.clock.JumpToEnd(self, traj)
+            return traj
+
+        # load and activate controllers, together with any changes batched
+        # in an open controller transaction
         if not self.full_controller_sim:
-            self.controller_manager.request(controllers_manip).switch()
+            with self.ControllerTransaction() as transaction:
+                for controller in controllers_manip:
+                    transaction.RequestTrajectoryController(controller)
+                transaction.Commit()
 
         # repeat logic and actually construct controller clients
         # now that we've activated them on the robot
@@ -391,10 +430,27 @@ class HERBRobot(Robot):
                     'Trajectory includes the base, but no base controller is'
                     ' available. Is self.base.controller set?')
 
-        for controller in active_controllers:
-            controller.SetPath(traj)
+        executed_traj = traj
+        if is_sim_only and not self.clock.IsRealTime():
+            executed_traj = self.clock.ScaleTrajectory(traj)
+            timeout = self.clock.ToWallTime(timeout)
+
+        if self.stream_recorder is not None:
+            self.stream_recorder.RecordTrajectory(executed_traj)
+
+        monitor = self.tracking_monitor
+        if monitor is not None and needs_joints:
+            monitor.Start(executed_traj)
+
+        try:
+            for controller in active_controllers:
+                controller.SetPath(executed_traj)
+
+            prpy.util.WaitForControllers(active_controllers, timeout=timeout)
+        finally:
+            if monitor is not None:
+                monitor.Stop(tag_traj=traj)
 
-        prpy.util.WaitForControllers(active_controllers, timeout=timeout)
         return traj
 
     def ExecuteTrajectory(self, traj, *args, **kwargs):
@@ -415,37 +471,107 @@ class HERBRobot(Robot):
     # Inherit docstring from the parent class.
     ExecuteTrajectory.__doc__ = Robot.ExecuteTrajectory.__doc__
 
+    def UseLimitProfile(self, profile, manipulators=None):
+        """Switch arms to a velocity and acceleration limit profile for the
+        duration of a with block. Trajectories post-processed inside the
+        block are retimed with the profile's limits.
+
+            with robot.UseLimitProfile('careful'):
+                robot.PlanToNamedConfiguration('home', execute=True)
+
+        @param profile profile name, e.g. 'fast', 'careful', or 'pour', or a
+                       herbpy.limits.LimitProfile
+        @param manipulators arms to switch; defaults to both arms
+        @return context manager that restores the previous limits
+        """
+        if manipulators is None:
+            manipulators = [self.left_arm, self.right_arm]
+        return UseLimitProfiles(manipulators, profile)
+
+    def ControllerTransaction(self):
+        """Batch controller switches into a single request.
+        Controller changes requested inside the transaction, including those
+        made by \ref SetStiffness and \ref ExecuteTrajectory, are applied in
+        one controller_manager switch when the outermost transaction exits.
+        If the switch fails, the previous controllers are restored.
+
+            with robot.ControllerTransaction():
+                robot.left_arm.SetStiffness(1)
+                robot.right_arm.SetStiffness(1)
+
+        @return herbpy.controller_transaction.ControllerTransaction
+        """
+        return ControllerTransaction(self, parent=self._controller_transaction)
+
+    def GetRunningControllers(self):
+        """Ask the controller manager which controllers are running.
+        @return set of controller names, or None if there is no controller
+                manager
+        """
+        if self.controller_manager is None:
+            return None
+
+        import rospy
+        from controller_manager_msgs.srv import ListControllers
+
+        list_controllers = rospy.ServiceProxy(
+            '/controller_manager/list_controllers', ListControllers)
+        return set(controller.name
+                   for controller in list_controllers().controller
+                   if controller.state == 'running')
+
+    def TareForceTorqueSensors(self, hands=None, soft=False, wait=True,
+                               timeout=None):
+        """Tare several force/torque sensors at the same time.
+        @param hands BarrettHands to tare; defaults to both hands
+        @param soft zero the readings in software instead of re-zeroing the
+                    sensors; see \ref BarrettHand.SoftTareForceTorqueSensor
+        @param wait block until all tares are complete
+        @param timeout maximum time to wait, in seconds
+        @return list of TareFutures, one per hand
+        """
+        if hands is None:
+            hands = [self.left_hand, self.right_hand]
+
+        # Switch on the tare controllers of all hands in one request.
+        with self.ControllerTransaction() as transaction:
+            if not soft:
+                for hand in hands:
+                    transaction.RequestTare(hand)
+            transaction.Commit()
+            futures = [hand.TareForceTorqueSensorAsync(soft=soft)
+                       for hand in hands]
+        if wait:
+            WaitForTares(futures, timeout=timeout)
+        return futures
+
     def SetStiffness(self, stiffness, manip=None):
         """Set the stiffness of HERB's arms and head.
         Stiffness False/0 is gravity compensation and stiffness True/(>0) is position
         control.
         @param stiffness boolean or numeric value 0.0 to 1.0
         """
-        if (isinstance(stiffness, numbers.Number) and
-                not (0 <= stiffness and stiffness <= 1)):
-            raise Exception('Stiffness must be boolean or numeric in the range [0, 1];'
-                            'got {}.'.format(stiffness))
-
         # TODO head after Schunk integration
         if manip is self.head:
             raise NotImplementedError('Head immobilized under ros_control, SetStiffness not available.')
 
-        new_manip_controllers = []
-        if stiffness:
-            if not self.left_arm.IsSimulated() and (manip is None or manip is self.left_arm):
-                new_manip_controllers.append('left_joint_group_position_controller')
-            if not self.right_arm.IsSimulated() and (manip is None or manip is self.right_arm):
-                new_manip_controllers.append('right_joint_group_position_controller')
-        else:
-            if not self.left_arm.IsSimulated() and (manip is None or manip is self.left_arm):
-                new_manip_controllers.append(
-                    'left_gravity_compensation_controller')
-            if not self.right_arm.IsSimulated() and (manip is None or manip is self.right_arm):
-                new_manip_controllers.append(
-                    'right_gravity_compensation_controller')
+        with self.ControllerTransaction() as transaction:
+            for arm in [self.left_arm, self.right_arm]:
+                if manip is None or manip is arm:
+                    transaction.SetStiffness(arm, stiffness)
 
-        if not self.full_controller_sim:
-            self.controller_manager.request(new_manip_controllers).switch()
+    def GetArmSide(self, manip):
+        """Get the side of an arm, which prefixes its controller names.
+        @param manip left_arm or right_arm
+        @return 'left' or 'right'
+        """
+        if manip is self.left_arm:
+            return 'left'
+        elif manip is self.right_arm:
+            return 'right'
+        else:
+            raise ValueError('Manipulator "{:s}" is not an arm.'.format(
+                             manip.GetName()))
 
     def Say(self, words, block=True):
         """Speak 'words' using talker action service or espeak locally in simulation"""
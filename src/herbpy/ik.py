@@ -0,0 +1,89 @@
+import collections
+import hashlib
+import numpy
+import threading
+
+# ndarray.tobytes was added in numpy 1.9; tostring was removed in 2.0.
+_tobytes = getattr(numpy.ndarray, 'tobytes', None) or numpy.ndarray.tostring
+
+
+def QuantizePose(pose, position_resolution=0.001, rotation_resolution=0.001):
+    """Quantize an end-effector pose into a hashable key.
+    @param pose 4x4 homogeneous transform
+    @param position_resolution translation resolution, in meters
+    @param rotation_resolution resolution of the rotation matrix entries
+    @return tuple of integers
+    """
+    pose = numpy.asarray(pose)
+    rotation = numpy.round(pose[0:3, 0:3] / rotation_resolution)
+    translation = numpy.round(pose[0:3, 3] / position_resolution)
+    return tuple(numpy.concatenate((rotation.ravel(), translation))
+                 .astype(int).tolist())
+
+
+def GetSceneRevision(robot, ignore_indices=()):
+    """Compute a digest of everything that affects a robot's IK solutions.
+    This includes the robot's pose, its DOF values other than \p
+    ignore_indices, and the pose and enabled state of every other body in
+    the environment. The caller must hold the environment lock.
+    @param robot robot to compute the digest for
+    @param ignore_indices DOF indices that do not affect the solutions,
+                          e.g. the arm being solved for
+    @return hex digest string
+    """
+    digest = hashlib.sha1()
+    dof_values = numpy.array(robot.GetDOFValues())
+    dof_values[list(ignore_indices)] = 0.
+    digest.update(_tobytes(numpy.round(dof_values, 6)))
+
+    for body in robot.GetEnv().GetBodies():
+        digest.update(body.GetName().encode('utf-8'))
+        digest.update(b'1' if body.IsEnabled() else b'0')
+        digest.update(_tobytes(numpy.round(body.GetTransform(), 6)))
+
+    for body in robot.GetGrabbed():
+        digest.update(b'grabbed:' + body.GetName().encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+class IkSolutionCache(object):
+    def __init__(self, capacity=4096):
+        """Least-recently-used cache of IK solutions.
+        @param capacity maximum number of entries
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def Get(self, key):
+        """Look up an entry and mark it as recently used.
+        @param key hashable key
+        @return cached value, or None if missing
+        """
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def Put(self, key, value):
+        """Add an entry, evicting the least recently used one if full.
+        @param key hashable key
+        @param value value to store
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def Clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,136 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger('herbpy')
+
+
+class IkDatabaseCache(object):
+    def __init__(self, directory=None):
+        """Share compiled ikfast databases through a directory.
+        Databases are stored under a key made of the manipulator's
+        kinematics hash, the IK type, and the free joint, so any robot with
+        the same kinematics can reuse them. Databases that are not available
+        are generated in a background thread; concurrent requests for the
+        same key share one generation.
+        @param directory shared directory; None disables sharing, so only
+                         OpenRAVE's local database directory is used
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def GetKey(self, manip, iktype, free_indices):
+        """Build the cache key of an IK database.
+        @param manip OpenRAVE manipulator
+        @param iktype IK parameterization type
+        @param free_indices DOF indices of the free joints
+        @return relative path of the database in the shared directory
+        """
+        free_names = '_'.join(str(i) for i in free_indices) or 'none'
+        return os.path.join(manip.GetKinematicsStructureHash(),
+                            '{:s}.free_{:s}.so'.format(str(iktype), free_names))
+
+    def Fetch(self, ikmodel, key):
+        """Copy a database from the shared directory to OpenRAVE's database
+        directory, if it is not there already.
+        @param ikmodel InverseKinematicsModel to fetch the database for
+        @param key cache key from \ref GetKey
+        @return True if the database was copied
+        """
+        if self.directory is None:
+            return False
+
+        shared_path = os.path.join(self.directory, key)
+        if not os.path.exists(shared_path):
+            return False
+
+        local_path = ikmodel.getfilename(False)
+        _AtomicCopy(shared_path, local_path)
+        logger.info('Fetched IK database "%s" from the shared cache.', key)
+        return True
+
+    def Store(self, ikmodel, key):
+        """Copy a generated database into the shared directory.
+        @param ikmodel InverseKinematicsModel that was generated
+        @param key cache key from \ref GetKey
+        """
+        if self.directory is None:
+            return
+
+        local_path = ikmodel.getfilename(True)
+        try:
+            _AtomicCopy(local_path, os.path.join(self.directory, key))
+        except (IOError, OSError) as e:
+            logger.warning('Failed storing IK database "%s" in the shared'
+                           ' cache: %s', key, e)
+
+    def GenerateAsync(self, key, generate, callback):
+        """Generate a database in a background thread.
+        If the same key is already being generated, \p callback is queued
+        to run when that generation finishes instead.
+        @param key cache key from \ref GetKey
+        @param generate function that generates and saves the database
+        @param callback function called with True on success and False on
+                        failure once the database is available
+        """
+        with self._lock:
+            callbacks = self._pending.get(key)
+            if callbacks is not None:
+                callbacks.append(callback)
+                return
+            self._pending[key] = [callback]
+
+        def run():
+            try:
+                generate()
+                success = True
+            except Exception as e:
+                logger.error('Failed generating IK database "%s": %s', key, e)
+                success = False
+
+            with self._lock:
+                callbacks = self._pending.pop(key)
+
+            for queued_callback in callbacks:
+                queued_callback(success)
+
+        thread = threading.Thread(target=run, name='ik-' + key)
+        thread.daemon = True
+        thread.start()
+
+
+def _AtomicCopy(source, destination):
+    directory = os.path.dirname(destination)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    handle, temporary_path = tempfile.mkstemp(dir=directory)
+    os.close(handle)
+    try:
+        shutil.copyfile(source, temporary_path)
+        os.rename(temporary_path, destination)
+    except Exception:
+        os.remove(temporary_path)
+        raise
+
+
+_default_cache = None
+
+
+def GetDefaultCache():
+    """Get the process-wide IK database cache.
+    The shared directory is read from the HERBPY_IK_CACHE environment
+    variable. Sharing is disabled if it is not set.
+    @return IkDatabaseCache
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IkDatabaseCache(os.environ.get('HERBPY_IK_CACHE'))
+    return _default_cache
@@ -0,0 +1,171 @@
+import logging
+import numpy
+import threading
+
+logger = logging.getLogger('herbpy')
+
+
+def GetJointIndexMap(robot, names):
+    """Map the entries of a JointState message to DOF indices.
+    Names that do not correspond to a joint with a DOF are skipped.
+    @param robot robot that owns the joints
+    @param names joint names in the message
+    @return columns,dof_indices parallel arrays of message entries and the
+            DOF index each of them belongs to
+    """
+    columns = []
+    dof_indices = []
+    with robot.GetEnv():
+        for column, name in enumerate(names):
+            joint = robot.GetJoint(name)
+            if joint is None or joint.GetDOF() == 0:
+                logger.debug('Ignoring unknown joint "%s".', name)
+                continue
+            columns.append(column)
+            dof_indices.append(joint.GetDOFIndex())
+
+    return numpy.array(columns, dtype=int), numpy.array(dof_indices, dtype=int)
+
+
+class JointStateHistory(object):
+    def __init__(self, num_dofs, capacity=1000):
+        """Ring buffer of timestamped joint states.
+        @param num_dofs number of DOFs stored in each state
+        @param capacity maximum number of states kept
+        """
+        self.capacity = capacity
+        self._stamps = numpy.zeros(capacity)
+        self._values = numpy.zeros((capacity, num_dofs))
+        self._count = 0
+
+    def Append(self, stamp, values):
+        """Add a state. States must be appended in chronological order.
+        @param stamp timestamp of the state, in seconds
+        @param values joint values of all DOFs
+        """
+        index = self._count % self.capacity
+        self._stamps[index] = stamp
+        self._values[index] = values
+        self._count += 1
+
+    def GetStamps(self):
+        """Get the timestamps of the stored states in chronological order.
+        @return array of timestamps, in seconds
+        """
+        return self._stamps[self._GetOrder()]
+
+    def GetStateAt(self, stamp, dof_indices=None):
+        """Estimate the joint values at a past time.
+        The state is linearly interpolated between the two stored states
+        that bracket \p stamp. Times outside of the stored window are
+        clamped to the oldest or newest state.
+        @param stamp time to query, in seconds
+        @param dof_indices optional subset of DOFs to return
+        @return joint values at the requested time
+        """
+        if self._count == 0:
+            raise ValueError('No joint states have been received.')
+
+        order = self._GetOrder()
+        stamps = self._stamps[order]
+        i = numpy.searchsorted(stamps, stamp)
+
+        if i == 0:
+            values = self._values[order[0]]
+        elif i == len(stamps):
+            values = self._values[order[-1]]
+        else:
+            t0, t1 = stamps[i - 1], stamps[i]
+            v0, v1 = self._values[order[i - 1]], self._values[order[i]]
+            alpha = (stamp - t0) / (t1 - t0) if t1 > t0 else 1.
+            values = v0 + alpha * (v1 - v0)
+
+        if dof_indices is not None:
+            values = values[dof_indices]
+        return numpy.array(values)
+
+    def _GetOrder(self):
+        count = min(self._count, self.capacity)
+        order = numpy.arange(self._count - count, self._count)
+        return order % self.capacity
+
+
+class BufferedJointStateClient(object):
+    def __init__(self, robot, topic_name='/joint_states', rate=50.,
+                 history_capacity=1000):
+        """Update OpenRAVE from a sensor_msgs/JointState topic.
+        The mapping from joint names to DOF indices is computed once for
+        each distinct list of names and messages are applied with vectorized
+        array writes. Messages that arrive faster than \p rate are coalesced,
+        so the environment lock is taken at most \p rate times per second.
+        Every message is also stored in a \ref JointStateHistory so callers
+        can query the state at a past time with \ref GetStateAt.
+        @param robot robot to update
+        @param topic_name JointState topic to subscribe to
+        @param rate maximum rate at which OpenRAVE is updated, in Hz
+        @param history_capacity number of messages kept in the history
+        """
+        import rospy
+        from sensor_msgs.msg import JointState
+
+        self.robot = robot
+        self.history = JointStateHistory(robot.GetDOF(),
+                                         capacity=history_capacity)
+
+        with robot.GetEnv():
+            self._values = numpy.array(robot.GetDOFValues())
+        self._received = numpy.zeros(len(self._values), dtype=bool)
+        self._received_indices = numpy.zeros(0, dtype=int)
+        self._index_maps = {}
+        self._is_dirty = False
+        self._lock = threading.Lock()
+
+        self._subscriber = rospy.Subscriber(
+            topic_name, JointState, self._Callback, queue_size=10)
+        self._timer = rospy.Timer(rospy.Duration(1. / rate), self._Flush)
+
+    def GetStateAt(self, stamp, dof_indices=None):
+        """Estimate the robot's joint values at a past time.
+        @param stamp time to query, in seconds since the epoch
+        @param dof_indices optional subset of DOFs to return
+        @return joint values at the requested time
+        """
+        with self._lock:
+            return self.history.GetStateAt(stamp, dof_indices)
+
+    def Shutdown(self):
+        """Stop updating OpenRAVE."""
+        self._subscriber.unregister()
+        self._timer.shutdown()
+
+    def _GetIndexMap(self, names):
+        index_map = self._index_maps.get(names)
+        if index_map is None:
+            index_map = GetJointIndexMap(self.robot, names)
+            self._index_maps[names] = index_map
+        return index_map
+
+    def _Callback(self, msg):
+        columns, dof_indices = self._GetIndexMap(tuple(msg.name))
+        if len(columns) == 0 or len(msg.position) != len(msg.name):
+            return
+
+        positions = numpy.asarray(msg.position)[columns]
+        with self._lock:
+            self._values[dof_indices] = positions
+            if not self._received[dof_indices].all():
+                self._received[dof_indices] = True
+                self._received_indices = numpy.flatnonzero(self._received)
+            self._is_dirty = True
+            self.history.Append(msg.header.stamp.to_sec(), self._values)
+
+    def _Flush(self, event=None):
+        with self._lock:
+            if not self._is_dirty:
+                return
+            dof_indices = self._received_indices
+            values = self._values[dof_indices]
+            self._is_dirty = False
+
+        with self.robot.GetEnv():
+            self.robot.SetDOFValues(values, dof_indices)
@@ -0,0 +1,131 @@
+import contextlib
+import numpy
+
+
+class LimitProfile(object):
+    def __init__(self, velocity_scale=1., acceleration_scale=None,
+                 velocities=None, min_accel_time=None):
+        """Joint velocity and acceleration limits of an arm.
+        Limits are derived from the arm's nominal limits, i.e. the limits
+        loaded with the robot model.
+        @param velocity_scale multiplier of the nominal velocity limits
+        @param acceleration_scale multiplier of the nominal acceleration
+                                  limits; defaults to \p velocity_scale, which
+                                  keeps the nominal time to reach full speed
+        @param velocities absolute velocity limits, in radians per second;
+                          scaled by \p velocity_scale if given
+        @param min_accel_time time to reach the velocity limits, in seconds;
+                              overrides \p acceleration_scale if given
+        """
+        self.velocity_scale = velocity_scale
+        self.acceleration_scale = acceleration_scale
+        self.velocities = velocities
+        self.min_accel_time = min_accel_time
+
+    def GetLimits(self, nominal_velocities, nominal_accelerations):
+        """Compute the limits of this profile.
+        @param nominal_velocities nominal velocity limits of the arm
+        @param nominal_accelerations nominal acceleration limits of the arm
+        @return velocities,accelerations limits of this profile
+        """
+        if self.velocities is not None:
+            velocities = self.velocity_scale * numpy.array(self.velocities,
+                                                            dtype=float)
+        else:
+            velocities = self.velocity_scale * numpy.array(nominal_velocities)
+
+        if self.min_accel_time is not None:
+            accelerations = velocities / self.min_accel_time
+        else:
+            acceleration_scale = self.acceleration_scale
+            if acceleration_scale is None:
+                acceleration_scale = self.velocity_scale
+            accelerations = acceleration_scale * numpy.array(nominal_accelerations)
+
+        return velocities, accelerations
+
+
+# 'fast' is the nominal limits every trajectory used before profiles existed.
+PROFILES = {
+    'fast': LimitProfile(),
+    'careful': LimitProfile(velocity_scale=0.25),
+    'pour': LimitProfile(velocity_scale=0.5,
+                         velocities=[0.75, 0.75, 2., 2., 2.5, 2.5, 2.5],
+                         min_accel_time=0.3),
+}
+
+DEFAULT_PROFILE = 'fast'
+
+
+def GetProfile(profile):
+    """Look up a limit profile.
+    @param profile name of a profile in \ref PROFILES or a LimitProfile
+    @return LimitProfile
+    """
+    if isinstance(profile, LimitProfile):
+        return profile
+
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('Unknown limit profile "{}". Expected one of: {}.'
+                         .format(profile, ', '.join(sorted(PROFILES))))
+
+
+def SetArmLimits(robot, dof_indices, velocities, accelerations):
+    """Set the limits of a subset of DOFs, skipping limits that are unchanged.
+    Changing a robot's limits invalidates state that depends on them, e.g.
+    cached post-processing results, so limits that already match are not
+    written again. The caller must hold the environment lock.
+    @param robot robot to change
+    @param dof_indices DOFs to change
+    @param velocities velocity limits of \p dof_indices
+    @param accelerations acceleration limits of \p dof_indices
+    @return whether any limits were changed
+    """
+    changed = False
+
+    all_velocities = numpy.array(robot.GetDOFVelocityLimits())
+    if not numpy.allclose(all_velocities[dof_indices], velocities):
+        all_velocities[dof_indices] = velocities
+        robot.SetDOFVelocityLimits(all_velocities)
+        changed = True
+
+    all_accelerations = numpy.array(robot.GetDOFAccelerationLimits())
+    if not numpy.allclose(all_accelerations[dof_indices], accelerations):
+        all_accelerations[dof_indices] = accelerations
+        robot.SetDOFAccelerationLimits(all_accelerations)
+        changed = True
+
+    return changed
+
+
+@contextlib.contextmanager
+def UseLimitProfiles(manipulators, profile):
+    """Switch several arms to a limit profile for the duration of a block.
+    The limits each arm had before the block are restored afterwards, even
+    if they were set without a profile.
+    @param manipulators WAMs to switch
+    @param profile name of a profile in \ref PROFILES or a LimitProfile
+    """
+    saved = []
+    for manip in manipulators:
+        robot = manip.GetRobot()
+        dof_indices = manip.GetArmIndices()
+        with robot.GetEnv():
+            saved.append((manip.GetLimitProfile(),
+                          robot.GetDOFVelocityLimits(dof_indices),
+                          robot.GetDOFAccelerationLimits(dof_indices)))
+
+    try:
+        for manip in manipulators:
+            manip.SetLimitProfile(profile)
+        yield
+    finally:
+        for manip, (previous, velocities, accelerations) in zip(manipulators,
+                                                                saved):
+            robot = manip.GetRobot()
+            with robot.GetEnv():
+                SetArmLimits(robot, manip.GetArmIndices(), velocities,
+                             accelerations)
+            manip._limit_profile = previous
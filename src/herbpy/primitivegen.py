@@ -0,0 +1,309 @@
+import logging
+import numpy
+
+from .primitives import PrimitiveSet
+
+logger = logging.getLogger('herbpy')
+
+# Hand-tuned primitives of the 16-heading lattice, as (dx, dy, dtheta,
+# weight) in grid cells and heading steps, for the headings in the first
+# quadrant. The other quadrants are rotated copies.
+_PRIMITIVES_16 = {
+    0.: [(1, 0, 0, 1.), (8, 0, 0, 1.), (-1, 0, 0, 100.),
+         (8, 1, 1, 1.), (8, -1, -1, 1.),
+         (0, 0, 1, 3.), (0, 0, -1, 3.)],
+    22.5: [(2, 1, 0, 1.), (6, 3, 0, 1.), (-2, -1, 0, 100.),
+           (5, 4, 1, 1.), (7, 2, -1, 1.),
+           (0, 0, 1, 3.), (0, 0, -1, 3.)],
+    45.: [(1, 1, 0, 1.), (6, 6, 0, 1.), (-1, -1, 0, 100.),
+          (5, 7, 1, 1.), (7, 5, -1, 1.),
+          (0, 0, 1, 3.), (0, 0, -1, 3.)],
+    67.5: [(1, 2, 0, 1.), (3, 6, 0, 1.), (-1, -2, 0, 100.),
+           (4, 5, -1, 1.), (2, 7, 1, 1.),
+           (0, 0, -1, 3.), (0, 0, 1, 3.)],
+}
+
+
+def _GetLatticeVectors(max_length):
+    """All non-zero integer vectors no longer than max_length cells."""
+    r = int(numpy.ceil(max_length))
+    dx, dy = numpy.meshgrid(numpy.arange(-r, r + 1), numpy.arange(-r, r + 1),
+                            indexing='ij')
+    vectors = numpy.column_stack((dx.ravel(), dy.ravel()))
+    lengths = numpy.hypot(vectors[:, 0], vectors[:, 1])
+    mask = (lengths > 0) & (lengths <= max_length)
+    return vectors[mask], lengths[mask]
+
+
+def _InvertArc(start_angle, end_angle, ends):
+    """Fit a straight segment followed by an arc to each end position.
+    @return (N, 2) array of [straight length, signed arc radius]
+    """
+    R = numpy.array([
+        [numpy.cos(start_angle), numpy.sin(end_angle) - numpy.sin(start_angle)],
+        [numpy.sin(start_angle), -numpy.cos(end_angle) + numpy.cos(start_angle)]])
+    return numpy.dot(ends, numpy.linalg.pinv(R).T)
+
+
+def _ChooseTurn(start_angle, dtheta, angular_resolution, turn_length):
+    """Choose the end cell of a turn to a neighboring heading.
+    Picks a forward end cell about turn_length cells away whose
+    straight-then-arc fit is mostly arc. Fine lattices need a short negative
+    straight segment, which the interpolation corrects, or longer turns, so
+    the length grows until a fit is found.
+    """
+    heading = numpy.array([numpy.cos(start_angle), numpy.sin(start_angle)])
+    end_angle = start_angle + dtheta * angular_resolution
+
+    for _ in range(8):
+        vectors, lengths = _GetLatticeVectors(turn_length + 2.)
+        fits = _InvertArc(start_angle, end_angle, vectors.astype(float))
+        valid = numpy.dot(vectors, heading) > 0.
+        valid &= fits[:, 1] * dtheta > 0.
+        valid &= numpy.abs(fits[:, 0]) <= 0.5 * lengths
+        if numpy.any(valid):
+            scores = numpy.abs(lengths - turn_length) + numpy.abs(fits[:, 0])
+            scores[~valid] = numpy.inf
+            return vectors[numpy.argmin(scores)]
+        turn_length *= 1.5
+
+    raise ValueError('Found no turn from heading {:.3f} rad.'.format(
+                     start_angle))
+
+
+def GetPrimitiveTemplates(numangles, straight_length=8., turn_length=8.):
+    """Choose the end cells of the primitives of each heading.
+    For 16 headings this returns the hand-tuned primitives that HERB has
+    always used. For other lattices, each heading gets the shortest lattice
+    vector within half a heading step of it as its short straight move, a
+    multiple of that close to \p straight_length as its long move, a short
+    backward move, two turns to the neighboring headings that end about
+    \p turn_length cells away, or farther if the heading steps are too
+    small for that, and two turns in place.
+    @param numangles number of discrete headings
+    @param straight_length length of the long straight move, in cells
+    @param turn_length length of the turns, in cells
+    @return list of numangles lists of (dx, dy, dtheta, weight) tuples in
+            cells and heading steps
+    """
+    angular_resolution = 2. * numpy.pi / numangles
+
+    if numangles == 16:
+        templates = []
+        for angleind in range(numangles):
+            start_angle = angleind * angular_resolution
+            quadrant_start = angleind // 4 * numpy.pi / 2.
+            base_degrees = round(numpy.degrees(start_angle - quadrant_start) * 100.) / 100.
+            angle = quadrant_start
+            primitives = []
+            for dx, dy, dtheta, weight in _PRIMITIVES_16[base_degrees]:
+                # Rotate the first-quadrant primitive into this quadrant.
+                final_x = round(dx * numpy.cos(angle) - dy * numpy.sin(angle))
+                final_y = round(dx * numpy.sin(angle) + dy * numpy.cos(angle))
+                primitives.append((int(final_x), int(final_y), dtheta, weight))
+            templates.append(primitives)
+        return templates
+
+    vectors, lengths = _GetLatticeVectors(straight_length + 2.)
+    vector_angles = numpy.arctan2(vectors[:, 1], vectors[:, 0])
+
+    templates = []
+    for angleind in range(numangles):
+        start_angle = angleind * angular_resolution
+        errors = numpy.abs((vector_angles - start_angle + numpy.pi)
+                           % (2. * numpy.pi) - numpy.pi)
+
+        # Short straight move: the shortest vector close to the heading.
+        candidates = numpy.flatnonzero(errors <= 0.5 * angular_resolution + 1e-9)
+        short = vectors[candidates[numpy.lexsort(
+            (errors[candidates], lengths[candidates]))[0]]]
+        multiple = max(int(round(straight_length / numpy.hypot(*short))), 1)
+        long_move = multiple * short
+
+        primitives = [(int(short[0]), int(short[1]), 0, 1.),
+                      (int(long_move[0]), int(long_move[1]), 0, 1.),
+                      (-int(short[0]), -int(short[1]), 0, 100.)]
+
+        for dtheta in [1, -1]:
+            best = _ChooseTurn(start_angle, dtheta, angular_resolution,
+                               turn_length)
+            primitives.append((int(best[0]), int(best[1]), dtheta, 1.))
+
+        primitives.extend([(0, 0, 1, 3.), (0, 0, -1, 3.)])
+        templates.append(primitives)
+    return templates
+
+
+def InterpolatePrimitive(start_angle, end_position, dtheta, cellsize,
+                         numangles, linear_resolution=0.05,
+                         angular_resolution=0.1):
+    """Compute the intermediate poses of a primitive.
+    Straight moves and turns in place are interpolated linearly. Other
+    moves are a straight segment followed by a circular arc, which is
+    corrected to end exactly at \p end_position.
+    @param start_angle start heading, in radians
+    @param end_position end position relative to the start, in cells
+    @param dtheta change of heading, in heading steps
+    @param cellsize edge length of a grid cell, in meters
+    @param numangles number of discrete headings
+    @param linear_resolution maximum translation between poses, in meters
+    @param angular_resolution maximum rotation between poses, in radians
+    @return (K, 3) array of [x, y, theta] poses
+    """
+    heading_step = 2. * numpy.pi / numangles
+    rotation = dtheta * heading_step
+    end = numpy.array(end_position, dtype=float) * cellsize
+    distance = numpy.linalg.norm(end)
+    is_turn_in_place = end[0] == 0. and end[1] == 0.
+
+    if is_turn_in_place or dtheta == 0:
+        if is_turn_in_place:
+            num_samples = int(numpy.ceil(abs(rotation / angular_resolution)) + 0.5)
+        else:
+            num_samples = int(numpy.ceil(distance / linear_resolution) + 0.5)
+
+        t = numpy.arange(num_samples + 1) / float(num_samples)
+        poses = numpy.empty((num_samples + 1, 3))
+        poses[:, 0:2] = t[:, numpy.newaxis] * end
+        poses[:, 2] = (start_angle + rotation * t) % (2. * numpy.pi)
+        return poses
+
+    start_index = int(round(start_angle / heading_step))
+    end_angle = ((start_index + dtheta) % numangles) * heading_step
+    straight, radius = _InvertArc(start_angle, end_angle, end[numpy.newaxis])[0]
+    rv = rotation + straight / radius
+    tv = radius * rv
+    if straight < 0.:
+        logger.warning('Primitive to %s has a negative straight segment of'
+                       ' %.3f m.', end_position, straight)
+
+    num_samples = max(int(0.5 + numpy.ceil(abs(rotation / angular_resolution))),
+                      int(0.5 + numpy.ceil(distance / linear_resolution)))
+    t = numpy.arange(num_samples + 1) / float(num_samples)
+
+    on_arc = t * tv >= straight
+    s = numpy.where(on_arc, straight, t * tv)
+    theta = numpy.where(on_arc, rv * (t - straight / tv) + start_angle,
+                        start_angle)
+    poses = numpy.empty((num_samples + 1, 3))
+    poses[:, 0] = s * numpy.cos(start_angle) + numpy.where(
+        on_arc, radius * (numpy.sin(theta) - numpy.sin(start_angle)), 0.)
+    poses[:, 1] = s * numpy.sin(start_angle) - numpy.where(
+        on_arc, radius * (numpy.cos(theta) - numpy.cos(start_angle)), 0.)
+    poses[:, 2] = theta
+
+    # Spread the remaining error of the arc over the primitive.
+    error = end - poses[-1, 0:2]
+    if numpy.linalg.norm(error) > 0.0001:
+        poses[:, 0:2] += t[:, numpy.newaxis] * error
+    return poses
+
+
+def _PointsInPolygon(points, polygon):
+    """Crossing-number test of (..., 2) points against a (K, 2) polygon."""
+    x, y = points[..., 0, numpy.newaxis], points[..., 1, numpy.newaxis]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = numpy.roll(x1, -1), numpy.roll(y1, -1)
+    crosses = (y1 > y) != (y2 > y)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        x_intersect = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return numpy.sum(crosses & (x < x_intersect), axis=-1) % 2 == 1
+
+
+def GetFootprintCells(footprint, poses, cellsize):
+    """Find the grid cells covered by a footprint at any of several poses.
+    A cell is covered if its center is inside the footprint. Cell (i, j) is
+    centered at (i * cellsize, j * cellsize).
+    @param footprint (K, 2) array of the vertices of the footprint polygon
+                     in the robot frame, in meters
+    @param poses (N, 3) array of [x, y, theta] robot poses, in meters and
+                 radians
+    @param cellsize edge length of a grid cell, in meters
+    @return (M, 2) array of covered cells, sorted
+    """
+    footprint = numpy.asarray(footprint, dtype=float)
+    poses = numpy.asarray(poses, dtype=float).reshape(-1, 3)
+
+    reach = numpy.max(numpy.hypot(footprint[:, 0], footprint[:, 1]))
+    lower = numpy.floor((poses[:, 0:2].min(axis=0) - reach) / cellsize)
+    upper = numpy.ceil((poses[:, 0:2].max(axis=0) + reach) / cellsize)
+    i, j = numpy.meshgrid(numpy.arange(lower[0], upper[0] + 1),
+                          numpy.arange(lower[1], upper[1] + 1), indexing='ij')
+    cells = numpy.column_stack((i.ravel(), j.ravel())).astype(int)
+    centers = cells * cellsize
+
+    # Cell centers in the robot frame of every pose: (N, M, 2).
+    offsets = centers[numpy.newaxis, :, :] - poses[:, numpy.newaxis, 0:2]
+    cos, sin = numpy.cos(poses[:, 2]), numpy.sin(poses[:, 2])
+    local = numpy.empty_like(offsets)
+    local[..., 0] = cos[:, numpy.newaxis] * offsets[..., 0] + sin[:, numpy.newaxis] * offsets[..., 1]
+    local[..., 1] = -sin[:, numpy.newaxis] * offsets[..., 0] + cos[:, numpy.newaxis] * offsets[..., 1]
+
+    covered = _PointsInPolygon(local, footprint).any(axis=0)
+    return cells[covered]
+
+
+def GetCircleFootprint(radius, num_vertices=32):
+    """Approximate a round robot by a polygon that contains the circle.
+    @param radius radius of the robot, in meters
+    @param num_vertices number of vertices of the polygon
+    @return (num_vertices, 2) array of vertices
+    """
+    angles = 2. * numpy.pi * numpy.arange(num_vertices) / num_vertices
+    outer_radius = radius / numpy.cos(numpy.pi / num_vertices)
+    return outer_radius * numpy.column_stack((numpy.cos(angles),
+                                              numpy.sin(angles)))
+
+
+def GeneratePrimitives(numangles=16, cellsize=0.1, linear_weight=100.,
+                       theta_weight=10., num_actions=7,
+                       linear_collision_resolution=0.05,
+                       angular_collision_resolution=0.1, footprint=None,
+                       templates=None):
+    """Generate motion primitives for the SBPL base planner.
+    @param numangles number of discrete headings
+    @param cellsize edge length of a grid cell, in meters
+    @param linear_weight cost weight of translation
+    @param theta_weight cost weight of rotation
+    @param num_actions number of primitives per heading
+    @param linear_collision_resolution maximum translation between
+                                       intermediate poses, in meters
+    @param angular_collision_resolution maximum rotation between
+                                        intermediate poses, in radians
+    @param footprint optional (K, 2) footprint polygon of the robot; if
+                     given, the cells swept by each primitive are computed
+    @param templates primitives of each heading; defaults to
+                     \ref GetPrimitiveTemplates
+    @return PrimitiveSet
+    """
+    if templates is None:
+        templates = GetPrimitiveTemplates(numangles)
+    heading_step = 2. * numpy.pi / numangles
+
+    angles, weights, offsets, poses = [], [], [0], []
+    swept_offsets, swept_cells = [0], []
+    for angleind in range(numangles):
+        start_angle = angleind * heading_step
+        for dx, dy, dtheta, weight in templates[angleind][:num_actions]:
+            primitive_poses = InterpolatePrimitive(
+                start_angle, (dx, dy), dtheta, cellsize, numangles,
+                linear_resolution=linear_collision_resolution,
+                angular_resolution=angular_collision_resolution)
+            angles.append(angleind)
+            weights.append(weight)
+            poses.append(primitive_poses)
+            offsets.append(offsets[-1] + len(primitive_poses))
+
+            if footprint is not None:
+                cells = GetFootprintCells(footprint, primitive_poses, cellsize)
+                swept_cells.append(cells)
+                swept_offsets.append(swept_offsets[-1] + len(cells))
+
+    if footprint is None:
+        swept_offsets, swept_cells = None, None
+    else:
+        swept_cells = numpy.concatenate(swept_cells)
+
+    return PrimitiveSet(cellsize, numangles, linear_weight, theta_weight,
+                        angles, weights, offsets, numpy.concatenate(poses),
+                        swept_offsets=swept_offsets, swept_cells=swept_cells)
@@ -0,0 +1,277 @@
+import hashlib
+import logging
+import numpy
+import os
+import struct
+
+# ndarray.tobytes was added in numpy 1.9; tostring was removed in 2.0.
+_tobytes = getattr(numpy.ndarray, 'tobytes', None) or numpy.ndarray.tostring
+
+logger = logging.getLogger('herbpy')
+
+# Binary primitive files start with this header, followed by the arrays of
+# a PrimitiveSet in the order of _ARRAYS. Every array starts at a multiple
+# of 8 bytes, so the file can be memory-mapped and used without parsing.
+# The swept cell arrays are only present if _HAS_SWEPT_CELLS is set.
+_MAGIC = b'HERBPRIM'
+_VERSION = 2
+_HEADER = struct.Struct('<8sIIIIIIddd')
+_HAS_SWEPT_CELLS = 1
+_ARRAYS = [
+    ('angles', '<i4'),
+    ('weights', '<f8'),
+    ('offsets', '<i8'),
+    ('poses', '<f8'),
+    ('swept_offsets', '<i8'),
+    ('swept_cells', '<i4'),
+]
+
+
+def _Align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def GetCachePath(yaml_path):
+    """Get the default location of the binary version of a primitives file.
+    The directory is read from the HERBPY_PRIMITIVE_DIR environment variable
+    and defaults to ~/.herbpy/primitives. The file name includes a hash of
+    the YAML file's absolute path, so different files with the same name do
+    not collide.
+    @param yaml_path path of the YAML primitives file
+    @return path of the binary file
+    """
+    directory = os.environ.get('HERBPY_PRIMITIVE_DIR',
+        os.path.join(os.path.expanduser('~'), '.herbpy', 'primitives'))
+    path_hash = hashlib.sha1(
+        os.path.abspath(yaml_path).encode('utf-8')).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(yaml_path))[0]
+    return os.path.join(directory, '{:s}.{:s}.prim'.format(name, path_hash))
+
+
+class PrimitiveSet(object):
+    def __init__(self, cellsize, numangles, linear_weight, theta_weight,
+                 angles, weights, offsets, poses, swept_offsets=None,
+                 swept_cells=None):
+        """Motion primitives of the SBPL base planner, stored in flat arrays.
+        The poses of primitive i are poses[offsets[i]:offsets[i + 1]].
+        Primitives are grouped by start heading in the order of the YAML
+        file's actions.
+        @param cellsize edge length of a grid cell, in meters
+        @param numangles number of discrete headings
+        @param linear_weight cost weight of translation
+        @param theta_weight cost weight of rotation
+        @param angles start heading index of each of the P primitives
+        @param weights cost multiplier of each primitive
+        @param offsets P + 1 offsets of each primitive's poses in \p poses
+        @param poses (N, 3) array of [x, y, theta] poses relative to the
+                     start cell, in meters and radians
+        @param swept_offsets optional P + 1 offsets of each primitive's cells
+                             in \p swept_cells
+        @param swept_cells optional (M, 2) array of the grid cells covered by
+                           the robot's footprint during each primitive,
+                           relative to the start cell
+        """
+        self.cellsize = float(cellsize)
+        self.numangles = int(numangles)
+        self.linear_weight = float(linear_weight)
+        self.theta_weight = float(theta_weight)
+        self.angles = numpy.asarray(angles, dtype=numpy.int32)
+        self.weights = numpy.asarray(weights, dtype=numpy.float64)
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        self.poses = numpy.asarray(poses, dtype=numpy.float64).reshape(-1, 3)
+        self.swept_offsets = None
+        self.swept_cells = None
+        if swept_offsets is not None:
+            self.swept_offsets = numpy.asarray(swept_offsets, dtype=numpy.int64)
+            self.swept_cells = numpy.asarray(
+                swept_cells, dtype=numpy.int32).reshape(-1, 2)
+
+    @property
+    def num_primitives(self):
+        return len(self.angles)
+
+    def GetPoses(self, index):
+        """Get the poses of a primitive.
+        @param index index of the primitive
+        @return (K, 3) array of [x, y, theta] poses
+        """
+        return self.poses[self.offsets[index]:self.offsets[index + 1]]
+
+    def GetSweptCells(self, index):
+        """Get the grid cells covered by the footprint during a primitive.
+        @param index index of the primitive
+        @return (K, 2) array of cell offsets from the start cell
+        """
+        if self.swept_cells is None:
+            raise ValueError('These primitives have no swept cells.')
+        return self.swept_cells[
+            self.swept_offsets[index]:self.swept_offsets[index + 1]]
+
+    def GetPrimitiveIndices(self, angle):
+        """Get the primitives that start at a heading.
+        @param angle heading index
+        @return array of primitive indices
+        """
+        return numpy.flatnonzero(self.angles == angle)
+
+    @classmethod
+    def FromParameters(cls, params):
+        """Convert parameters in the format of base_planner_parameters.yaml.
+        @param params dict loaded from the YAML file
+        @return PrimitiveSet
+        """
+        angles, weights, offsets, poses = [], [], [0], []
+        for action in params['actions']:
+            for primitive in action['primitives']:
+                angles.append(action['angle'])
+                weights.append(primitive['weight'])
+                poses.extend(primitive['poses'])
+                offsets.append(len(poses))
+
+        return cls(params['cellsize'], params['numangles'],
+                   params['linear_weight'], params['theta_weight'],
+                   angles, weights, offsets, poses)
+
+    def ToParameters(self):
+        """Convert to the format of base_planner_parameters.yaml.
+        This is the format expected by SBPLPlanner.SetPlannerParameters.
+        @return dict of parameters
+        """
+        poses = self.poses.tolist()
+        offsets = self.offsets.tolist()
+        weights = self.weights.tolist()
+
+        actions = []
+        for i, angle in enumerate(self.angles.tolist()):
+            if not actions or actions[-1]['angle'] != angle:
+                actions.append({'angle': angle, 'primitives': []})
+            actions[-1]['primitives'].append({
+                'poses': poses[offsets[i]:offsets[i + 1]],
+                'weight': weights[i]})
+
+        return {'cellsize': self.cellsize, 'numangles': self.numangles,
+                'linear_weight': self.linear_weight,
+                'theta_weight': self.theta_weight, 'actions': actions}
+
+    @classmethod
+    def LoadYaml(cls, path):
+        """Load a YAML primitives file.
+        @param path path of the YAML file
+        @return PrimitiveSet
+        """
+        import yaml
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with open(path, 'rb') as yaml_file:
+            return cls.FromParameters(yaml.load(yaml_file, Loader=loader))
+
+    def SaveYaml(self, path):
+        """Save to a YAML primitives file.
+        @param path path of the YAML file
+        """
+        import yaml
+        with open(path, 'w') as yaml_file:
+            yaml.dump(self.ToParameters(), yaml_file, default_flow_style=False)
+
+    @classmethod
+    def Load(cls, path, mmap=True):
+        """Load a binary primitives file written by \ref Save.
+        @param path path of the binary file
+        @param mmap memory-map the arrays instead of reading them
+        @return PrimitiveSet
+        """
+        if mmap:
+            data = numpy.memmap(path, dtype=numpy.uint8, mode='r')
+        else:
+            data = numpy.fromfile(path, dtype=numpy.uint8)
+
+        if len(data) < _HEADER.size:
+            raise ValueError('"{:s}" is not a primitives file.'.format(path))
+        (magic, version, flags, num_angles, num_primitives, num_poses,
+         num_swept_cells, cellsize, linear_weight, theta_weight) = \
+            _HEADER.unpack(_tobytes(data[:_HEADER.size]))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('"{:s}" is not a version {:d} primitives file.'
+                             .format(path, _VERSION))
+
+        counts = {'angles': num_primitives, 'weights': num_primitives,
+                  'offsets': num_primitives + 1, 'poses': 3 * num_poses,
+                  'swept_offsets': num_primitives + 1,
+                  'swept_cells': 2 * num_swept_cells}
+        arrays = dict.fromkeys(counts)
+        offset = _Align(_HEADER.size)
+        for name, dtype in _ARRAYS:
+            if name.startswith('swept') and not flags & _HAS_SWEPT_CELLS:
+                continue
+            num_bytes = counts[name] * numpy.dtype(dtype).itemsize
+            if offset + num_bytes > len(data):
+                raise ValueError('Primitives file "{:s}" is truncated.'.format(
+                                 path))
+            arrays[name] = data[offset:offset + num_bytes].view(dtype)
+            offset = _Align(offset + num_bytes)
+
+        return cls(cellsize, num_angles, linear_weight, theta_weight,
+                   arrays['angles'], arrays['weights'], arrays['offsets'],
+                   arrays['poses'].reshape(-1, 3),
+                   swept_offsets=arrays['swept_offsets'],
+                   swept_cells=arrays['swept_cells'])
+
+    def Save(self, path):
+        """Save to a binary primitives file.
+        The file is written to a temporary file first and then renamed, so
+        concurrent readers never see a partial file.
+        @param path path of the binary file
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        has_swept_cells = self.swept_cells is not None
+        flags = _HAS_SWEPT_CELLS if has_swept_cells else 0
+        num_swept_cells = len(self.swept_cells) if has_swept_cells else 0
+
+        temp_path = '{:s}.{:d}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as prim_file:
+            prim_file.write(_HEADER.pack(
+                _MAGIC, _VERSION, flags, self.numangles, self.num_primitives,
+                len(self.poses), num_swept_cells, self.cellsize,
+                self.linear_weight, self.theta_weight))
+            for name, dtype in _ARRAYS:
+                if name.startswith('swept') and not has_swept_cells:
+                    continue
+                prim_file.write(b'\0' * (_Align(prim_file.tell()) -
+                                         prim_file.tell()))
+                array = numpy.ascontiguousarray(getattr(self, name),
+                                                dtype=dtype)
+                prim_file.write(_tobytes(array))
+        os.rename(temp_path, path)
+
+
+def LoadPrimitives(yaml_path, binary_path=None):
+    """Load motion primitives, preferring a binary copy of the YAML file.
+    The binary file is used if it is at least as new as the YAML file.
+    Otherwise the YAML file is parsed and the binary file is rewritten, so
+    only the first load after the YAML file changes is slow.
+    @param yaml_path path of the YAML primitives file
+    @param binary_path path of the binary copy; defaults to
+                       \ref GetCachePath
+    @return PrimitiveSet
+    """
+    if binary_path is None:
+        binary_path = GetCachePath(yaml_path)
+
+    yaml_mtime = os.path.getmtime(yaml_path)
+    if (os.path.exists(binary_path)
+            and os.path.getmtime(binary_path) >= yaml_mtime):
+        try:
+            return PrimitiveSet.Load(binary_path)
+        except (IOError, OSError, ValueError) as e:
+            logger.warning('Failed loading binary primitives from "%s": %s',
+                           binary_path, e)
+
+    primitives = PrimitiveSet.LoadYaml(yaml_path)
+    try:
+        primitives.Save(binary_path)
+    except (IOError, OSError) as e:
+        logger.warning('Failed saving binary primitives to "%s": %s',
+                       binary_path, e)
+    return primitives
@@ -0,0 +1,345 @@
+import logging
+import numpy
+import os
+
+logger = logging.getLogger('herbpy')
+
+BASE_LINK_NAME = '/herb_base'
+
+
+def GetDefaultPath(manip):
+    """Get the default location of a manipulator's reachability map.
+    The directory is read from the HERBPY_REACHABILITY_DIR environment
+    variable and defaults to ~/.herbpy/reachability. Maps are keyed by the
+    manipulator's kinematics hash, so they are shared by robots with the same
+    kinematics.
+    @param manip OpenRAVE manipulator
+    @return path of the .npz file
+    """
+    directory = os.environ.get('HERBPY_REACHABILITY_DIR',
+        os.path.join(os.path.expanduser('~'), '.herbpy', 'reachability'))
+    return os.path.join(directory, '{:s}.{:s}.npz'.format(
+        manip.GetName(), manip.GetKinematicsStructureHash()))
+
+
+def GetOrientationBins(num_directions=24, num_rolls=4):
+    """Discretize SO(3) into approach directions and rolls about them.
+    Approach directions are spread uniformly over the sphere with a
+    Fibonacci lattice. The z-axis of each rotation is its approach direction.
+    @param num_directions number of approach directions
+    @param num_rolls number of rolls about each approach direction
+    @return (num_directions * num_rolls, 3, 3) array of rotation matrices
+    """
+    i = numpy.arange(num_directions) + 0.5
+    polar = numpy.arccos(1. - 2. * i / num_directions)
+    azimuth = numpy.pi * (1. + 5. ** 0.5) * i
+    z_axes = numpy.column_stack((numpy.cos(azimuth) * numpy.sin(polar),
+                                 numpy.sin(azimuth) * numpy.sin(polar),
+                                 numpy.cos(polar)))
+
+    rotations = []
+    for z_axis in z_axes:
+        # Any vector that is not parallel to the approach direction.
+        helper = numpy.array([1., 0., 0.])
+        if abs(z_axis[0]) > 0.9:
+            helper = numpy.array([0., 1., 0.])
+        x0 = numpy.cross(helper, z_axis)
+        x0 /= numpy.linalg.norm(x0)
+        y0 = numpy.cross(z_axis, x0)
+
+        for roll in numpy.arange(num_rolls) * 2. * numpy.pi / num_rolls:
+            x_axis = numpy.cos(roll) * x0 + numpy.sin(roll) * y0
+            y_axis = numpy.cross(z_axis, x_axis)
+            rotations.append(numpy.column_stack((x_axis, y_axis, z_axis)))
+
+    return numpy.array(rotations)
+
+
+def _InvertTransforms(transforms):
+    rotations = numpy.swapaxes(transforms[:, 0:3, 0:3], 1, 2)
+    inverses = numpy.zeros_like(transforms)
+    inverses[:, 0:3, 0:3] = rotations
+    inverses[:, 0:3, 3] = -numpy.einsum('nij,nj->ni', rotations,
+                                        transforms[:, 0:3, 3])
+    inverses[:, 3, 3] = 1.
+    return inverses
+
+
+class ReachabilityMap(object):
+    def __init__(self, origin, resolution, shape, rotations, reachable,
+                 metadata=None):
+        """Discretized map of the end-effector poses an arm can reach.
+        Positions are binned on a regular grid in the \ref BASE_LINK_NAME
+        frame and orientations are binned with \ref GetOrientationBins. Maps
+        are built offline with \ref Generate and loaded with \ref Load.
+        @param origin position of the corner of the grid in the base frame
+        @param resolution edge length of a grid cell, in meters
+        @param shape number of cells along x, y, and z
+        @param rotations (M, 3, 3) array of orientation bins
+        @param reachable (num_cells, M) boolean array; True if the arm has an
+                         IK solution at the center of the cell and bin
+        @param metadata optional dict describing how the map was built
+        """
+        self.origin = numpy.array(origin, dtype=float)
+        self.resolution = float(resolution)
+        self.shape = tuple(int(n) for n in shape)
+        self.rotations = numpy.array(rotations, dtype=float)
+        self.reachable = numpy.array(reachable, dtype=bool)
+        self.metadata = metadata or {}
+        self.cell_scores = self.reachable.mean(axis=1)
+
+    @classmethod
+    def Generate(cls, manip, resolution=0.05, max_reach=1.3,
+                 num_directions=24, num_rolls=4, num_free_samples=4,
+                 chunk_size=1024):
+        """Build the reachability map of an arm.
+        Every grid cell within \p max_reach of the arm's base link is tested
+        with every orientation bin using \ref WAM.FindIKSolutionsBatch.
+        Collisions are ignored, since they depend on the scene. This takes
+        minutes and is meant to be run offline, e.g. with
+        scripts/build_reachability_herb.py.
+        @param manip WAM to build the map for
+        @param resolution edge length of a grid cell, in meters
+        @param max_reach cells farther than this from the arm's base link
+                         are assumed to be unreachable, in meters
+        @param num_directions number of approach directions
+        @param num_rolls number of rolls about each approach direction
+        @param num_free_samples number of free joint values to sample
+        @param chunk_size number of poses solved per batch
+        @return ReachabilityMap
+        """
+        robot = manip.GetRobot()
+        rotations = GetOrientationBins(num_directions, num_rolls)
+
+        with robot.GetEnv():
+            base_pose = robot.GetLink(BASE_LINK_NAME).GetTransform()
+            shoulder_pose = manip.GetBase().GetTransform()
+        shoulder = numpy.dot(numpy.linalg.inv(base_pose), shoulder_pose)[0:3, 3]
+
+        origin = resolution * numpy.floor((shoulder - max_reach) / resolution)
+        shape = numpy.ceil(2. * max_reach / resolution).astype(int) + 1
+        reachability = cls(origin, resolution, shape, rotations,
+                           numpy.zeros((numpy.prod(shape), len(rotations)),
+                                       dtype=bool),
+                           metadata={'manipulator': manip.GetName(),
+                                     'max_reach': max_reach,
+                                     'num_directions': num_directions,
+                                     'num_rolls': num_rolls})
+
+        centers = reachability.GetCellCenters()
+        cells = numpy.flatnonzero(
+            numpy.linalg.norm(centers - shoulder, axis=1) <= max_reach)
+        logger.info('Building the reachability map of "%s": %d cells, %d'
+                    ' orientations.', manip.GetName(), len(cells),
+                    len(rotations))
+
+        cell_indices = numpy.repeat(cells, len(rotations))
+        rotation_indices = numpy.tile(numpy.arange(len(rotations)), len(cells))
+        for start in range(0, len(cell_indices), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            poses = numpy.tile(numpy.eye(4), (len(cell_indices[chunk]), 1, 1))
+            poses[:, 0:3, 0:3] = rotations[rotation_indices[chunk]]
+            poses[:, 0:3, 3] = centers[cell_indices[chunk]]
+            poses = numpy.einsum('ij,njk->nik', base_pose, poses)
+
+            solutions = manip.FindIKSolutionsBatch(
+                poses, num_free_samples=num_free_samples,
+                check_collisions=False, use_cache=False)
+            reachability.reachable[cell_indices[chunk],
+                                   rotation_indices[chunk]] = [
+                len(s) > 0 for s in solutions]
+
+            if start // chunk_size % 100 == 0:
+                logger.info('Reachability: %d/%d poses tested.',
+                            min(start + chunk_size, len(cell_indices)),
+                            len(cell_indices))
+
+        reachability.cell_scores = reachability.reachable.mean(axis=1)
+        return reachability
+
+    @classmethod
+    def Load(cls, path):
+        """Load a map saved with \ref Save.
+        @param path path of the .npz file
+        @return ReachabilityMap
+        """
+        data = numpy.load(path)
+        reachable = numpy.unpackbits(data['reachable'], axis=1)
+        reachable = reachable[:, :len(data['rotations'])]
+        metadata = dict((key[len('metadata_'):], data[key].item())
+                        for key in data.files if key.startswith('metadata_'))
+        return cls(data['origin'], data['resolution'], data['shape'],
+                   data['rotations'], reachable, metadata=metadata)
+
+    def Save(self, path):
+        """Save the map to a compressed .npz file.
+        @param path path of the .npz file
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        metadata = dict(('metadata_' + key, value)
+                        for key, value in self.metadata.items())
+        with open(path, 'wb') as map_file:
+            numpy.savez_compressed(
+                map_file, origin=self.origin, resolution=self.resolution,
+                shape=self.shape, rotations=self.rotations,
+                reachable=numpy.packbits(self.reachable, axis=1), **metadata)
+
+    def GetCellCenters(self):
+        """Get the center of every grid cell.
+        @return (num_cells, 3) array of positions in the base frame
+        """
+        indices = numpy.indices(self.shape).reshape(3, -1).T
+        return self.origin + (indices + 0.5) * self.resolution
+
+    def GetCellIndices(self, positions):
+        """Find the grid cells that contain positions.
+        @param positions (N, 3) array of positions in the base frame
+        @return array of N flat cell indices; -1 for positions outside the grid
+        """
+        positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+        indices = numpy.floor(
+            (positions - self.origin) / self.resolution).astype(int)
+        inside = numpy.all((indices >= 0) & (indices < self.shape), axis=1)
+        cells = numpy.repeat(-1, len(positions))
+        cells[inside] = numpy.ravel_multi_index(indices[inside].T, self.shape)
+        return cells
+
+    def GetOrientationIndices(self, rotations):
+        """Find the closest orientation bin of rotations.
+        @param rotations (N, 3, 3) array of rotation matrices
+        @return array of N bin indices
+        """
+        rotations = numpy.asarray(rotations, dtype=float).reshape(-1, 3, 3)
+        # trace(A^T B) is largest for the bin with the smallest angle.
+        traces = numpy.einsum('mij,nij->nm', self.rotations, rotations)
+        return numpy.argmax(traces, axis=1)
+
+    def IsReachable(self, poses):
+        """Check whether poses fall into reachable cells and bins.
+        @param poses (N, 4, 4) array of end-effector poses in the base frame
+        @return boolean array of length N
+        """
+        poses = numpy.asarray(poses, dtype=float).reshape(-1, 4, 4)
+        cells = self.GetCellIndices(poses[:, 0:3, 3])
+        bins = self.GetOrientationIndices(poses[:, 0:3, 0:3])
+        reachable = numpy.zeros(len(poses), dtype=bool)
+        inside = cells >= 0
+        reachable[inside] = self.reachable[cells[inside], bins[inside]]
+        return reachable
+
+    def GetPositionScores(self, positions):
+        """Get the fraction of orientations reachable at positions.
+        @param positions (N, 3) array of positions in the base frame
+        @return array of N scores between 0 and 1
+        """
+        cells = self.GetCellIndices(positions)
+        scores = numpy.zeros(len(cells))
+        scores[cells >= 0] = self.cell_scores[cells[cells >= 0]]
+        return scores
+
+    def FilterPoses(self, robot, poses):
+        """Check whether world-frame poses are reachable from the robot's
+        current base pose.
+        @param robot robot the map belongs to
+        @param poses (N, 4, 4) array of end-effector poses in the world frame
+        @return boolean array of length N
+        """
+        with robot.GetEnv():
+            base_pose = robot.GetLink(BASE_LINK_NAME).GetTransform()
+        poses = numpy.asarray(poses, dtype=float).reshape(-1, 4, 4)
+        poses = numpy.einsum('ij,njk->nik', numpy.linalg.inv(base_pose), poses)
+        return self.IsReachable(poses)
+
+    def SampleTSR(self, robot, tsr_chain, num_samples=1, max_attempts=1000):
+        """Sample poses from a TSR chain, rejecting unreachable ones.
+        Use this before calling PlanToTSR to discard goals the arm cannot
+        reach without running IK or a planner.
+        @param robot robot the map belongs to
+        @param tsr_chain TSR or TSRChain with a sample() method
+        @param num_samples number of reachable poses to return
+        @param max_attempts maximum number of samples drawn
+        @return (K, 4, 4) array of reachable poses in the world frame, with
+                K <= num_samples
+        """
+        samples = numpy.array([tsr_chain.sample() for _ in range(max_attempts)])
+        reachable = self.FilterPoses(robot, samples)
+        return samples[reachable][:num_samples]
+
+
+class InverseReachabilityMap(object):
+    def __init__(self, reachability):
+        """Map from end-effector poses to the base poses that reach them.
+        Every reachable cell and orientation bin of \p reachability is
+        inverted into a base pose relative to the end-effector.
+        @param reachability ReachabilityMap of the arm
+        """
+        self.reachability = reachability
+
+        # Only the rotation and translation of each inverted pose are stored,
+        # in single precision: there is one per reachable cell and bin.
+        cells, bins = numpy.nonzero(reachability.reachable)
+        hand_from_base = numpy.swapaxes(reachability.rotations, 1, 2)
+        self.rotations = hand_from_base.astype(numpy.float32)[bins]
+        centers = reachability.GetCellCenters().astype(numpy.float32)
+        self.translations = -numpy.einsum('nij,nj->ni', self.rotations,
+                                          centers[cells])
+        self.scores = reachability.cell_scores[cells]
+
+    def GetBasePoses(self, hand_pose, floor_height=0., tilt_tolerance=0.35):
+        """Find planar base poses from which an end-effector pose is reachable.
+        Base poses are (x, y, yaw) of the \ref BASE_LINK_NAME frame. Entries
+        that would require the base to leave the floor or tilt by more than
+        \p tilt_tolerance are discarded.
+        @param hand_pose 4x4 end-effector pose in the world frame
+        @param floor_height height of the base frame above the world origin
+        @param tilt_tolerance maximum tilt of the base frame, in radians
+        @return poses,scores (K, 3) array of base poses sorted by decreasing
+                score and the score of each pose
+        """
+        hand_pose = numpy.asarray(hand_pose, dtype=float)
+        hand_rotation, hand_position = hand_pose[0:3, 0:3], hand_pose[0:3, 3]
+
+        # Filter on the height and tilt of the base before transforming the
+        # remaining entries: both only need the last row of the rotation.
+        heights = self.translations.dot(hand_rotation[2]) + hand_position[2]
+        tilts = self.rotations[:, :, 2].dot(hand_rotation[2])
+        height_tolerance = self.reachability.resolution
+        valid = numpy.nonzero(
+            (numpy.abs(heights - floor_height) <= height_tolerance)
+            & (tilts >= numpy.cos(tilt_tolerance)))[0]
+        scores = self.scores[valid]
+
+        order = numpy.argsort(-scores, kind='mergesort')
+        valid = valid[order]
+        positions = (self.translations[valid].dot(hand_rotation[0:2].T)
+                     + hand_position[0:2])
+        x_axes = self.rotations[valid, :, 0].dot(hand_rotation[0:2].T)
+        poses = numpy.column_stack((
+            positions, numpy.arctan2(x_axes[:, 1], x_axes[:, 0])))
+        return poses, scores[order]
+
+    def ScoreBasePoses(self, base_poses, hand_poses, floor_height=0.):
+        """Score candidate base poses by how many end-effector poses they reach.
+        @param base_poses (K, 3) array of (x, y, yaw) base poses
+        @param hand_poses (N, 4, 4) array of end-effector poses in the world
+                          frame, e.g. samples of a TSR
+        @param floor_height height of the base frame above the world origin
+        @return array of K scores; the fraction of \p hand_poses reachable
+        """
+        base_poses = numpy.asarray(base_poses, dtype=float).reshape(-1, 3)
+        hand_poses = numpy.asarray(hand_poses, dtype=float).reshape(-1, 4, 4)
+
+        cos_yaw, sin_yaw = numpy.cos(base_poses[:, 2]), numpy.sin(base_poses[:, 2])
+        transforms = numpy.tile(numpy.eye(4), (len(base_poses), 1, 1))
+        transforms[:, 0, 0], transforms[:, 0, 1] = cos_yaw, -sin_yaw
+        transforms[:, 1, 0], transforms[:, 1, 1] = sin_yaw, cos_yaw
+        transforms[:, 0:2, 3] = base_poses[:, 0:2]
+        transforms[:, 2, 3] = floor_height
+
+        inverses = _InvertTransforms(transforms)
+        relative = numpy.einsum('kij,njl->knil', inverses, hand_poses)
+        reachable = self.reachability.IsReachable(relative.reshape(-1, 4, 4))
+        return reachable.reshape(len(base_poses), len(hand_poses)).mean(axis=1)
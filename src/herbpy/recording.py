@@ -0,0 +1,364 @@
+import json
+import logging
+import numpy
+import os
+import threading
+import time
+from .jointstate import GetJointIndexMap
+
+logger = logging.getLogger('herbpy')
+
+# Stream identifiers stored in each record. Zero marks unused space at the end
+# of a log that was not closed cleanly.
+JOINT_STATES = 1
+LEFT_FT = 2
+RIGHT_FT = 3
+TRAJECTORY = 4
+
+STREAM_NAMES = {
+    JOINT_STATES: 'joint_states',
+    LEFT_FT: 'left_ft',
+    RIGHT_FT: 'right_ft',
+    TRAJECTORY: 'trajectory',
+}
+
+
+def GetRecordType(width):
+    """Get the fixed-size record type of a log.
+    @param width number of values stored in each record
+    @return numpy dtype of a record
+    """
+    return numpy.dtype([
+        ('stream', numpy.uint8),
+        ('stamp', numpy.float64),
+        ('values', numpy.float64, (width,)),
+    ])
+
+
+def GetHeaderPath(path):
+    return path + '.json'
+
+
+class StreamLogWriter(object):
+    def __init__(self, path, width, metadata=None, chunk_size=65536):
+        """Append-only log of fixed-size records in a memory-mapped file.
+        The file is grown \p chunk_size records at a time and truncated to
+        the records that were written when the log is closed. Unused values
+        in a record are NaN. A JSON header with the record width and \p
+        metadata is written next to the log.
+        @param path path of the binary log
+        @param width number of values stored in each record
+        @param metadata optional JSON-serializable dict saved in the header
+        @param chunk_size number of records to grow the file by
+        """
+        self.path = path
+        self.width = width
+        self.chunk_size = chunk_size
+        self.record_type = GetRecordType(width)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._records = None
+
+        header = {
+            'version': 1,
+            'width': width,
+            'streams': dict((str(k), v) for k, v in STREAM_NAMES.items()),
+            'metadata': metadata or {},
+        }
+        with open(GetHeaderPath(path), 'w') as header_file:
+            json.dump(header, header_file, indent=2)
+
+        with open(path, 'wb'):
+            pass
+        self._Grow()
+
+    def Append(self, stream, stamp, values):
+        """Append a record.
+        @param stream stream identifier, e.g. \ref JOINT_STATES
+        @param stamp timestamp, in seconds
+        @param values up to width values; the remainder is set to NaN
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        with self._lock:
+            if self._records is None:
+                raise ValueError('Log "{:s}" is closed.'.format(self.path))
+            if self._count == len(self._records):
+                self._Grow()
+
+            index = self._count
+            self._records['values'][index, :len(values)] = values
+            self._records['values'][index, len(values):] = numpy.nan
+            self._records['stamp'][index] = stamp
+            self._records['stream'][index] = stream
+            self._count += 1
+
+    def Flush(self):
+        """Write the records appended so far to disk."""
+        with self._lock:
+            if self._records is not None:
+                self._records.flush()
+
+    def Close(self):
+        """Flush the log and truncate it to the written records."""
+        with self._lock:
+            if self._records is None:
+                return
+            self._records.flush()
+            self._records = None
+
+            with open(self.path, 'r+b') as log_file:
+                log_file.truncate(self._count * self.record_type.itemsize)
+
+    def _Grow(self):
+        capacity = self._count + self.chunk_size
+        if self._records is not None:
+            self._records.flush()
+            self._records = None
+
+        with open(self.path, 'r+b') as log_file:
+            log_file.truncate(capacity * self.record_type.itemsize)
+
+        self._records = numpy.memmap(self.path, dtype=self.record_type,
+                                     mode='r+', shape=(capacity,))
+
+
+class StreamLog(object):
+    def __init__(self, path):
+        """Read-only, memory-mapped view of a log written by
+        \ref StreamLogWriter.
+        @param path path of the binary log
+        """
+        with open(GetHeaderPath(path), 'r') as header_file:
+            self.header = json.load(header_file)
+
+        self.path = path
+        self.width = self.header['width']
+        self.metadata = self.header['metadata']
+        self.record_type = GetRecordType(self.width)
+
+        num_records = os.path.getsize(path) // self.record_type.itemsize
+        if num_records > 0:
+            records = numpy.memmap(path, dtype=self.record_type, mode='r',
+                                   shape=(num_records,))
+            # Ignore preallocated space left by a log that was not closed.
+            num_records = numpy.count_nonzero(records['stream'])
+            self.records = records[:num_records]
+        else:
+            self.records = numpy.zeros(0, dtype=self.record_type)
+
+    def __len__(self):
+        return len(self.records)
+
+    def GetStream(self, stream):
+        """Get all records of one stream.
+        @param stream stream identifier, e.g. \ref JOINT_STATES
+        @return stamps,values arrays of timestamps and record values
+        """
+        mask = self.records['stream'] == stream
+        return self.records['stamp'][mask], self.records['values'][mask]
+
+
+class StreamRecorder(object):
+    def __init__(self, path, robot, chunk_size=65536):
+        """Record HERB's joint states, force/torque readings, and commanded
+        trajectories to a \ref StreamLogWriter log.
+        Joint states and trajectory waypoints are stored as full DOF vectors,
+        with NaN for DOFs that are not part of the message. Force/torque
+        records store the force followed by the torque.
+        @param path path of the binary log
+        @param robot robot whose DOFs are recorded
+        @param chunk_size number of records to grow the file by
+        """
+        self.robot = robot
+        self.num_dofs = robot.GetDOF()
+        metadata = {
+            'robot': robot.GetName(),
+            'dof_names': [robot.GetJointFromDOFIndex(i).GetName()
+                          for i in range(self.num_dofs)],
+        }
+        self.writer = StreamLogWriter(path, max(self.num_dofs, 6),
+                                      metadata=metadata,
+                                      chunk_size=chunk_size)
+        self._index_maps = {}
+        self._subscribers = []
+
+    def Start(self, joint_states_topic='/joint_states', ft_topics=None):
+        """Subscribe to the joint state and force/torque topics.
+        @param joint_states_topic sensor_msgs/JointState topic
+        @param ft_topics dict mapping stream identifiers to
+                         geometry_msgs/WrenchStamped topics; defaults to
+                         both hands' ft_wrench topics
+        """
+        import rospy
+        from geometry_msgs.msg import WrenchStamped
+        from sensor_msgs.msg import JointState
+
+        if ft_topics is None:
+            ft_topics = {LEFT_FT: '/left/ft_wrench',
+                         RIGHT_FT: '/right/ft_wrench'}
+
+        self._subscribers.append(rospy.Subscriber(
+            joint_states_topic, JointState, self.RecordJointState))
+        for stream, topic in ft_topics.items():
+            self._subscribers.append(rospy.Subscriber(
+                topic, WrenchStamped, self.RecordWrench, callback_args=stream))
+
+    def Stop(self):
+        """Unsubscribe from all topics and close the log."""
+        for subscriber in self._subscribers:
+            subscriber.unregister()
+        self._subscribers = []
+        self.writer.Close()
+
+    def RecordJointState(self, msg):
+        """Record a sensor_msgs/JointState message.
+        @param msg joint state message
+        """
+        names = tuple(msg.name)
+        index_map = self._index_maps.get(names)
+        if index_map is None:
+            index_map = GetJointIndexMap(self.robot, names)
+            self._index_maps[names] = index_map
+        columns, dof_indices = index_map
+
+        values = numpy.empty(self.num_dofs)
+        values.fill(numpy.nan)
+        values[dof_indices] = numpy.asarray(msg.position)[columns]
+        self.writer.Append(JOINT_STATES, msg.header.stamp.to_sec(), values)
+
+    def RecordWrench(self, msg, stream):
+        """Record a geometry_msgs/WrenchStamped message.
+        @param msg wrench message
+        @param stream \ref LEFT_FT or \ref RIGHT_FT
+        """
+        force, torque = msg.wrench.force, msg.wrench.torque
+        self.writer.Append(stream, msg.header.stamp.to_sec(),
+                           [force.x, force.y, force.z,
+                            torque.x, torque.y, torque.z])
+
+    def RecordTrajectory(self, traj, start_time=None):
+        """Record the waypoints of a commanded trajectory.
+        @param traj timed trajectory that is about to be executed
+        @param start_time time execution starts; defaults to now
+        """
+        from .validation import (
+            GetDeltaTimeColumn, GetJointColumns, GetWaypointMatrix)
+
+        if start_time is None:
+            start_time = time.time()
+
+        cspec = traj.GetConfigurationSpecification()
+        waypoints = GetWaypointMatrix(traj)
+        dof_indices, columns = GetJointColumns(cspec, self.robot)
+        deltatime_column = GetDeltaTimeColumn(cspec)
+        if deltatime_column is not None:
+            stamps = start_time + numpy.cumsum(waypoints[:, deltatime_column])
+        else:
+            stamps = numpy.repeat(start_time, len(waypoints))
+
+        values = numpy.empty(self.num_dofs)
+        for stamp, waypoint in zip(stamps, waypoints):
+            values.fill(numpy.nan)
+            values[dof_indices] = waypoint[columns]
+            self.writer.Append(TRAJECTORY, stamp, values)
+
+
+class ReplayForceTorqueSource(object):
+    def __init__(self):
+        """Latest force/torque reading of one replayed sensor."""
+        self.force = numpy.zeros(3)
+        self.torque = numpy.zeros(3)
+
+    def GetForceTorque(self):
+        """Get the most recent replayed force/torque reading.
+        @return force,torque force/torque in the hand frame
+        """
+        return self.force, self.torque
+
+
+class ReplaySource(object):
+    def __init__(self, path, robot=None, speed=1.):
+        """Replay a log recorded by \ref StreamRecorder without ROS.
+        Joint states are written into the robot like the joint state client
+        does on the real robot, and force/torque readings are available
+        through \ref ReplayForceTorqueSource objects. Use \ref Attach to make
+        the robot's hands read from the replay.
+        @param path path of the binary log
+        @param robot robot to update; may be None to only replay forces
+        @param speed playback rate relative to real time; infinity replays
+                     as fast as possible
+        """
+        self.log = StreamLog(path)
+        self.robot = robot
+        self.speed = float(speed)
+        self.ft_sources = {
+            LEFT_FT: ReplayForceTorqueSource(),
+            RIGHT_FT: ReplayForceTorqueSource(),
+        }
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def Attach(self):
+        """Make the robot's hands report the replayed force/torque readings."""
+        self.robot.left_hand.ft_source = self.ft_sources[LEFT_FT]
+        self.robot.right_hand.ft_source = self.ft_sources[RIGHT_FT]
+
+    def Detach(self):
+        """Restore the hands' own force/torque sensors."""
+        self.robot.left_hand.ft_source = None
+        self.robot.right_hand.ft_source = None
+
+    def Start(self):
+        """Replay the log in a background thread."""
+        if self._thread is not None:
+            raise RuntimeError('Replay is already running.')
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.Run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def Stop(self):
+        """Stop the background replay."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def IsDone(self):
+        return self._thread is None or not self._thread.is_alive()
+
+    def Run(self):
+        """Replay the log in the calling thread."""
+        records = self.log.records
+        if len(records) == 0:
+            return
+
+        order = numpy.argsort(records['stamp'], kind='mergesort')
+        first_stamp = records['stamp'][order[0]]
+        start_time = time.time()
+
+        for index in order:
+            if self._stop_event.is_set():
+                break
+
+            record = records[index]
+            delay = (record['stamp'] - first_stamp) / self.speed
+            remaining = start_time + delay - time.time()
+            if remaining > 0.:
+                self._stop_event.wait(remaining)
+
+            self._Apply(record['stream'], record['values'])
+
+    def _Apply(self, stream, values):
+        if stream == JOINT_STATES:
+            if self.robot is None:
+                return
+            dof_indices = numpy.flatnonzero(
+                ~numpy.isnan(values[:self.robot.GetDOF()]))
+            with self.robot.GetEnv():
+                self.robot.SetDOFValues(values[dof_indices], dof_indices)
+        elif stream in self.ft_sources:
+            source = self.ft_sources[stream]
+            source.force, source.torque = (numpy.array(values[0:3]),
+                                           numpy.array(values[3:6]))
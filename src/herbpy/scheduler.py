@@ -0,0 +1,182 @@
+import logging
+import numpy
+import threading
+import time
+
+logger = logging.getLogger('herbpy')
+
+# Not affected by changes to the system clock. Python 2 does not have it.
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class TickScheduler(object):
+    def __init__(self, rate=50., idle_timeout=1.):
+        """Drive many simulated components from one thread.
+        Components are objects with a Tick(dt) method that returns whether
+        they want to keep being ticked. A component is added to the active
+        set with \ref Activate and is dropped as soon as its Tick returns
+        False. The thread is started the first time a component is activated
+        and exits after it has had no active components for \p idle_timeout
+        seconds, so idle robots and their clones cost nothing.
+        @param rate tick rate, in Hz
+        @param idle_timeout time without active components before the thread
+                            exits, in seconds
+        """
+        self.period = 1. / rate
+        self.idle_timeout = idle_timeout
+        self._active = []
+        # Activation count of each active component, by id. A component
+        # activated again while it is being ticked is not dropped.
+        self._generations = dict()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def Activate(self, component):
+        """Start ticking a component, if it is not ticking already.
+        @param component object with a Tick(dt) method
+        """
+        with self._condition:
+            key = id(component)
+            if any(c is component for c in self._active):
+                self._generations[key] += 1
+                return
+
+            self._generations[key] = 0
+
+            self._active.append(component)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._Run,
+                                                name='herbpy-tick-scheduler')
+                self._thread.daemon = True
+                self._thread.start()
+            else:
+                self._condition.notify()
+
+    def IsRunning(self):
+        with self._condition:
+            return self._thread is not None
+
+    def GetNumActive(self):
+        with self._condition:
+            return len(self._active)
+
+    def _Run(self):
+        last_time = _monotonic()
+        next_deadline = last_time + self.period
+
+        while True:
+            with self._condition:
+                if not self._active:
+                    # Sleep until a component is activated or the thread has
+                    # been idle long enough to exit.
+                    self._condition.wait(self.idle_timeout)
+                    if not self._active:
+                        self._thread = None
+                        return
+                    last_time = _monotonic()
+                    next_deadline = last_time
+                components = [(c, self._generations[id(c)])
+                              for c in self._active]
+
+            remaining = next_deadline - _monotonic()
+            if remaining > 0.:
+                time.sleep(remaining)
+
+            now = _monotonic()
+            dt = now - last_time
+            last_time = now
+            next_deadline += self.period
+            if next_deadline < now:
+                next_deadline = now + self.period
+
+            finished = []
+            for component, generation in components:
+                try:
+                    keep_ticking = component.Tick(dt)
+                except Exception as e:
+                    logger.error('Stopped ticking %r: %s', component, e)
+                    keep_ticking = False
+                if not keep_ticking:
+                    finished.append((component, generation))
+
+            if finished:
+                with self._condition:
+                    # Keep components that were activated again after their
+                    # Tick returned False, or their new command is lost.
+                    for component, generation in finished:
+                        key = id(component)
+                        if self._generations.get(key) == generation:
+                            del self._generations[key]
+                            self._active = [c for c in self._active
+                                            if c is not component]
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def GetDefaultScheduler():
+    """Get the process-wide tick scheduler shared by all simulated robots.
+    @return TickScheduler
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = TickScheduler()
+        return _default_scheduler
+
+
+class SimulatedServo(object):
+    def __init__(self, manip, watchdog_timeout=0.1, scheduler=None):
+        """Simulate joint velocity control of an arm.
+        Velocities are integrated by a shared \ref TickScheduler. The servo
+        is only ticked between a \ref SetVelocity call and the watchdog
+        expiring or a zero velocity being commanded. Time advances at the
+        speedup of the robot's SimulationClock, if it has a finite one.
+        @param manip manipulator to servo
+        @param watchdog_timeout time after the last command at which the arm
+                                stops, in seconds
+        @param scheduler TickScheduler; defaults to \ref GetDefaultScheduler
+        """
+        self.manip = manip
+        self.robot = manip.GetRobot()
+        self.dof_indices = manip.GetArmIndices()
+        self.watchdog_timeout = watchdog_timeout
+        self.scheduler = scheduler or GetDefaultScheduler()
+
+        with self.robot.GetEnv():
+            self._lower, self._upper = [numpy.array(limits) for limits in
+                self.robot.GetDOFLimits(self.dof_indices)]
+        self._velocities = numpy.zeros(len(self.dof_indices))
+        self._command_time = 0.
+        self._lock = threading.Lock()
+
+    def SetVelocity(self, velocities):
+        """Command joint velocities.
+        @param velocities joint velocities, in radians per second
+        """
+        with self._lock:
+            self._velocities[:] = velocities
+            self._command_time = _monotonic()
+            is_moving = numpy.any(self._velocities != 0.)
+
+        if is_moving:
+            self.scheduler.Activate(self)
+
+    def Tick(self, dt):
+        with self._lock:
+            if _monotonic() - self._command_time > self.watchdog_timeout:
+                self._velocities.fill(0.)
+            if not numpy.any(self._velocities != 0.):
+                return False
+            step = self._velocities * dt
+
+        clock = getattr(self.robot, 'clock', None)
+        if clock is not None and not clock.IsInstant():
+            step *= clock.speedup
+
+        with self.robot.GetEnv():
+            dof_values = self.robot.GetDOFValues(self.dof_indices) + step
+            numpy.clip(dof_values, self._lower, self._upper, out=dof_values)
+            self.robot.SetDOFValues(dof_values, self.dof_indices)
+        return True
@@ -0,0 +1,256 @@
+import logging
+import math
+import numpy
+import threading
+import time
+
+logger = logging.getLogger('herbpy')
+
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
+
+# Not affected by changes to the system clock. Python 2 does not have it.
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class TimingStatistics(object):
+    def __init__(self, period):
+        """Running statistics of a periodic loop.
+        Jitter is the delay between a tick's deadline and the time the tick
+        actually started. A tick overruns if it finishes after the deadline
+        of the next tick; the ticks whose deadlines passed are skipped.
+        @param period nominal period of the loop, in seconds
+        """
+        self.period = period
+        self.num_ticks = 0
+        self.num_overruns = 0
+        self.num_skipped = 0
+        self.max_jitter = 0.
+        self._jitter_sum = 0.
+        self._jitter_sum_squares = 0.
+        self.max_step_time = 0.
+
+    def Add(self, jitter, step_time):
+        self.num_ticks += 1
+        self._jitter_sum += jitter
+        self._jitter_sum_squares += jitter * jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.max_step_time = max(self.max_step_time, step_time)
+
+    def GetMeanJitter(self):
+        if self.num_ticks == 0:
+            return 0.
+        return self._jitter_sum / self.num_ticks
+
+    def GetJitterStd(self):
+        if self.num_ticks == 0:
+            return 0.
+        mean = self.GetMeanJitter()
+        return math.sqrt(max(self._jitter_sum_squares / self.num_ticks
+                             - mean * mean, 0.))
+
+    def __str__(self):
+        return ('{:d} ticks at {:.1f} Hz: jitter {:.2f} +/- {:.2f} ms (max'
+                ' {:.2f} ms), max step {:.2f} ms, {:d} overruns, {:d} skipped'
+                ' ticks').format(
+                    self.num_ticks, 1. / self.period,
+                    1e3 * self.GetMeanJitter(), 1e3 * self.GetJitterStd(),
+                    1e3 * self.max_jitter, 1e3 * self.max_step_time,
+                    self.num_overruns, self.num_skipped)
+
+
+class PeriodicExecutor(object):
+    def __init__(self, period):
+        """Call a function at a fixed rate.
+        Tick k is scheduled at an absolute deadline start + k * period, so
+        the time spent in the function and in waking up does not accumulate
+        into drift. If a tick runs past the next deadline, the missed ticks
+        are skipped instead of being run back to back.
+        @param period period of the loop, in seconds
+        """
+        if period <= 0.:
+            raise ValueError('Period must be positive; got {}.'.format(period))
+
+        self.period = float(period)
+        self.statistics = TimingStatistics(self.period)
+        self._stop_event = threading.Event()
+
+    def Stop(self):
+        """Stop the loop after the current tick. Safe to call from any thread."""
+        self._stop_event.set()
+
+    def Run(self, step, duration=None):
+        """Run the loop in the calling thread.
+        @param step function called with the elapsed time, in seconds, at
+                    every tick; the loop stops if it returns False
+        @param duration maximum time to run, in seconds; None runs until
+                        \p step returns False or \ref Stop is called
+        @return TimingStatistics of this run
+        """
+        self._stop_event.clear()
+        self.statistics = TimingStatistics(self.period)
+
+        start_time = _monotonic()
+        tick = 0
+        while not self._stop_event.is_set():
+            deadline = start_time + tick * self.period
+            remaining = deadline - _monotonic()
+            if remaining > 0.:
+                self._stop_event.wait(remaining)
+                if self._stop_event.is_set():
+                    break
+
+            now = _monotonic()
+            elapsed = now - start_time
+            if duration is not None and elapsed >= duration:
+                break
+
+            result = step(elapsed)
+            self.statistics.Add(now - deadline, _monotonic() - now)
+            if result is False:
+                break
+
+            tick += 1
+            next_tick = int((_monotonic() - start_time) / self.period) + 1
+            if next_tick > tick:
+                self.statistics.num_overruns += 1
+                self.statistics.num_skipped += next_tick - tick
+                tick = next_tick
+
+        return self.statistics
+
+
+class TargetStream(object):
+    def __init__(self, source):
+        """Latest target from a callback or a thread-safe queue.
+        A callback is called once per tick and returns the current target.
+        A queue is drained every tick and only its newest item is used, so a
+        producer that publishes faster than the servo rate does not build up
+        latency. A target of None ends the stream.
+        @param source function or Queue of target configurations
+        """
+        self._source = source
+        self._is_queue = hasattr(source, 'get_nowait')
+        self.target = None
+        self.is_done = False
+
+    def GetLatest(self):
+        """Get the newest target.
+        @return newest target, or the previous one if nothing new arrived
+        """
+        if self._is_queue:
+            while True:
+                try:
+                    item = self._source.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    self.is_done = True
+                    break
+                self.target = numpy.array(item, dtype=float)
+        else:
+            item = self._source()
+            if item is None:
+                self.is_done = True
+            else:
+                self.target = numpy.array(item, dtype=float)
+
+        return self.target
+
+
+class CartesianServo(object):
+    def __init__(self, manip, damping=0.05, joint_limit_margin=0.1):
+        """Convert end-effector twists into joint velocities.
+        The joint velocities are the damped least-squares solution
+        qdot = J^T (J J^T + damping^2 I)^-1 twist, where J is the 6xN
+        Jacobian of the end-effector in the world frame. Joints that are
+        within \p joint_limit_margin of a limit are slowed down linearly as
+        they move towards it, and the result is scaled down uniformly to
+        respect the velocity limits. The limits are read at every call, so
+        limit profiles (see WAM.UseLimitProfile) apply to a running servo.
+        The Jacobian and the other intermediate results are kept in buffers
+        allocated once; only the arrays returned by OpenRAVE and the 6x6
+        solve are allocated per call.
+        @param manip WAM to servo
+        @param damping damping factor; larger values are more robust near
+                       singularities but track the twist less accurately
+        @param joint_limit_margin distance from a joint limit at which the
+                                  joint starts slowing down, in radians
+        """
+        self.manip = manip
+        self.robot = manip.GetRobot()
+        self.arm_indices = manip.GetArmIndices()
+        self.damping = damping
+        self.joint_limit_margin = joint_limit_margin
+
+        num_dofs = len(self.arm_indices)
+        with self.robot.GetEnv():
+            self._lower, self._upper = [numpy.array(limits) for limits in
+                self.robot.GetDOFLimits(self.arm_indices)]
+        self._velocity_limits = numpy.zeros(num_dofs)
+
+        self._jacobian = numpy.zeros((6, num_dofs))
+        self._jjt = numpy.zeros((6, 6))
+        self._damping_matrix = damping ** 2 * numpy.eye(6)
+        self._dual = numpy.zeros(6)
+        self._velocities = numpy.zeros(num_dofs)
+        self._scale = numpy.zeros(num_dofs)
+        self._distance = numpy.zeros(num_dofs)
+        self._mask = numpy.zeros(num_dofs, dtype=bool)
+
+        self.num_ticks = 0
+        self.last_compute_time = 0.
+        self.max_compute_time = 0.
+        self._compute_time_sum = 0.
+
+    def GetMeanComputeTime(self):
+        if self.num_ticks == 0:
+            return 0.
+        return self._compute_time_sum / self.num_ticks
+
+    def ComputeJointVelocities(self, twist):
+        """Compute the joint velocities that produce a twist.
+        @param twist linear and angular velocity of the end-effector in the
+                     world frame, [vx, vy, vz, wx, wy, wz]
+        @return joint velocities; this buffer is overwritten by the next call
+        """
+        start_time = _monotonic()
+
+        with self.robot.GetEnv():
+            dof_values = self.robot.GetDOFValues(self.arm_indices)
+            self._velocity_limits[:] = self.robot.GetDOFVelocityLimits(
+                self.arm_indices)
+            self._jacobian[0:3, :] = self.manip.CalculateJacobian()
+            self._jacobian[3:6, :] = self.manip.CalculateAngularVelocityJacobian()
+
+        numpy.dot(self._jacobian, self._jacobian.T, out=self._jjt)
+        self._jjt += self._damping_matrix
+        self._dual[:] = numpy.linalg.solve(self._jjt, twist)
+        numpy.dot(self._jacobian.T, self._dual, out=self._velocities)
+
+        # Slow down joints that move towards a nearby limit.
+        self._scale.fill(1.)
+        for limit, sign, moving in ((self._lower, 1., numpy.less),
+                                    (self._upper, -1., numpy.greater)):
+            numpy.subtract(dof_values, limit, out=self._distance)
+            self._distance *= sign / self.joint_limit_margin
+            numpy.clip(self._distance, 0., 1., out=self._distance)
+            moving(self._velocities, 0., out=self._mask)
+            numpy.copyto(self._scale, self._distance, where=self._mask)
+        self._velocities *= self._scale
+
+        # Scale uniformly so the end-effector keeps its direction of motion.
+        numpy.abs(self._velocities, out=self._distance)
+        self._distance /= self._velocity_limits
+        peak = self._distance.max()
+        if peak > 1.:
+            self._velocities /= peak
+
+        compute_time = _monotonic() - start_time
+        self.num_ticks += 1
+        self.last_compute_time = compute_time
+        self.max_compute_time = max(self.max_compute_time, compute_time)
+        self._compute_time_sum += compute_time
+        return self._velocities
@@ -0,0 +1,196 @@
+import logging
+import numpy
+import os
+import threading
+import time
+
+logger = logging.getLogger('herbpy')
+
+
+class TrackingMonitor(object):
+    TAG = 'tracking_error'
+
+    def __init__(self, robot, rate=100., capacity=10000, max_lag=0.5,
+                 output_dir=None):
+        """Record how closely executed trajectories are tracked.
+        While a trajectory executes, the actual joint values (as written into
+        OpenRAVE by the joint state feed) are sampled at \p rate into a
+        ring buffer that is allocated once. When execution finishes, they
+        are compared against the commanded trajectory to compute per-joint
+        tracking error, lag, and overshoot. If a trajectory runs longer than
+        the buffer, only its most recent samples are kept.
+        @param robot robot whose trajectories are monitored
+        @param rate sampling rate, in Hz
+        @param capacity number of samples stored in the ring buffer
+        @param max_lag largest lag to search for, in seconds
+        @param output_dir optional directory to save compressed recordings in
+        """
+        self.robot = robot
+        self.rate = float(rate)
+        self.capacity = int(capacity)
+        self.max_lag = max_lag
+        self.output_dir = output_dir
+        self.last_summary = None
+
+        self._times = numpy.zeros(self.capacity)
+        self._actual = numpy.zeros((self.capacity, robot.GetDOF()))
+        self._num_samples = 0
+        self._traj = None
+        self._dof_indices = None
+        self._columns = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def Start(self, traj):
+        """Start sampling the robot's state for a trajectory.
+        @param traj trajectory that is about to be sent to the controllers
+        """
+        from .validation import GetJointColumns
+
+        if self._thread is not None:
+            raise RuntimeError('TrackingMonitor is already recording.')
+
+        cspec = traj.GetConfigurationSpecification()
+        dof_indices, self._columns = GetJointColumns(cspec, self.robot)
+        self._traj = traj
+        self._dof_indices = dof_indices.tolist()
+        self._num_samples = 0
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._Run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def Stop(self, tag_traj=None):
+        """Stop sampling and summarize the tracking error.
+        @param tag_traj optional trajectory to store the summary on as a tag
+        @return summary dict, or None if no samples were recorded
+        """
+        if self._thread is None:
+            return None
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+        summary = self._Summarize()
+        self.last_summary = summary
+
+        if summary is not None and tag_traj is not None:
+            from prpy.util import SetTrajectoryTags
+            SetTrajectoryTags(tag_traj, {self.TAG: summary}, append=True)
+
+        return summary
+
+    def _Run(self):
+        env = self.robot.GetEnv()
+        num_dofs = len(self._dof_indices)
+        period = 1. / self.rate
+        start_time = time.time()
+        next_time = start_time
+
+        while not self._stop_event.is_set():
+            index = self._num_samples % self.capacity
+            with env:
+                self._actual[index, :num_dofs] = self.robot.GetDOFValues(
+                    self._dof_indices)
+            self._times[index] = time.time() - start_time
+            self._num_samples += 1
+
+            next_time += period
+            self._stop_event.wait(max(0., next_time - time.time()))
+
+    def _GetSamples(self):
+        """Unroll the ring buffer into chronological order.
+        @return times,actual arrays of sample times and joint values
+        """
+        num_dofs = len(self._dof_indices)
+        count = min(self._num_samples, self.capacity)
+        order = numpy.arange(self._num_samples - count, self._num_samples)
+        order %= self.capacity
+        return self._times[order], self._actual[order, :num_dofs]
+
+    def _Summarize(self):
+        if self._num_samples < 2:
+            return None
+
+        times, actual = self._GetSamples()
+        if self._num_samples > self.capacity:
+            logger.warning('Tracking buffer overflowed; only the last %d'
+                           ' samples were kept.', self.capacity)
+
+        # Sample the commanded trajectory at the recorded times.
+        traj = self._traj
+        duration = traj.GetDuration()
+        commanded = numpy.array([
+            traj.Sample(min(t, duration)) for t in times])[:, self._columns]
+
+        error = actual - commanded
+        summary = {
+            'dof_indices': list(self._dof_indices),
+            'num_samples': len(times),
+            'duration': float(times[-1]),
+            'rms_error': numpy.sqrt(numpy.mean(error ** 2, axis=0)).tolist(),
+            'max_error': numpy.max(numpy.abs(error), axis=0).tolist(),
+            'lag': self._ComputeLag(actual, commanded).tolist(),
+            'overshoot': self._ComputeOvershoot(actual, commanded).tolist(),
+        }
+
+        if self.output_dir is not None:
+            self._Save(times, commanded, actual)
+
+        return summary
+
+    def _ComputeLag(self, actual, commanded):
+        """Estimate how far each joint lags behind the command.
+        The lag is the shift, in whole samples, that minimizes the mean
+        squared difference between the actual and the delayed commanded
+        values of each joint.
+        @return array of per-joint lags, in seconds
+        """
+        num_samples, num_dofs = actual.shape
+        max_shift = min(int(self.max_lag * self.rate), num_samples - 1)
+
+        costs = numpy.empty((max_shift + 1, num_dofs))
+        for shift in range(max_shift + 1):
+            difference = actual[shift:] - commanded[:num_samples - shift]
+            costs[shift] = numpy.mean(difference ** 2, axis=0)
+
+        return numpy.argmin(costs, axis=0) / self.rate
+
+    def _ComputeOvershoot(self, actual, commanded, tolerance=1e-6):
+        """Measure how far each joint travels past its final commanded value.
+        The overshoot is measured in the direction of the joint's final
+        approach, i.e. of its last commanded motion, and only after that
+        motion starts. This also covers motions that return to their start,
+        e.g. hold-and-return motions. Joints whose command never changes
+        have no overshoot.
+        @param tolerance commanded changes smaller than this are ignored
+        @return array of per-joint overshoot, in radians
+        """
+        num_samples, num_dofs = commanded.shape
+        goal = commanded[-1]
+
+        # Last sample at which each joint is commanded away from its goal.
+        away = numpy.abs(commanded - goal) > tolerance
+        moved = numpy.any(away, axis=0)
+        last_away = num_samples - 1 - numpy.argmax(away[::-1], axis=0)
+        direction = numpy.where(
+            moved, numpy.sign(goal - commanded[last_away, numpy.arange(num_dofs)]),
+            0.)
+
+        past_goal = direction * (actual - goal)
+        before_approach = (numpy.arange(num_samples)[:, numpy.newaxis]
+                           < last_away)
+        past_goal[before_approach] = 0.
+        return numpy.maximum(numpy.max(past_goal, axis=0), 0.)
+
+    def _Save(self, times, commanded, actual):
+        now = time.time()
+        filename = 'tracking_{:s}-{:03d}.npz'.format(
+            time.strftime('%Y%m%d-%H%M%S', time.localtime(now)),
+            int(1000 * (now % 1.)))
+        path = os.path.join(self.output_dir, filename)
+        numpy.savez_compressed(path, times=times, commanded=commanded,
+                               actual=actual,
+                               dof_indices=numpy.array(self._dof_indices))
+        logger.info('Saved tracking data to "%s".', path)
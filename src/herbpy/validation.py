@@ -0,0 +1,250 @@
+import logging
+import numpy
+
+logger = logging.getLogger('herbpy')
+
+
+class TrajectoryReport(object):
+    """Result of validating a trajectory against the robot's state and limits.
+    All checks are computed from a single (num_waypoints x cspec DOF) waypoint
+    matrix extracted from the trajectory by \ref ValidateTrajectory.
+    """
+    def __init__(self):
+        self.num_waypoints = 0
+        self.dof_indices = []
+        self.manipulators = []
+        self.has_affine = False
+        self.has_joints = False
+        self.is_timed = False
+        self.is_at_start = False
+        self.start_error = 0.
+        self.duration = 0.
+        self.position_violations = {}
+        self.velocity_violations = {}
+        self.acceleration_violations = {}
+
+    def IsWithinLimits(self):
+        """Check whether the trajectory respects all joint limits.
+        @return True if no position, velocity, or acceleration limit is
+                exceeded at any waypoint
+        """
+        return not (self.position_violations or
+                    self.velocity_violations or
+                    self.acceleration_violations)
+
+    def GetViolations(self):
+        """Describe every limit violation found in the trajectory.
+        @return list of human-readable violation strings
+        """
+        messages = []
+        for name, violations in [
+                ('position', self.position_violations),
+                ('velocity', self.velocity_violations),
+                ('acceleration', self.acceleration_violations)]:
+            for dof_index, (waypoint, ratio) in sorted(violations.items()):
+                messages.append(
+                    'DOF {:d} exceeds its {:s} limit at waypoint {:d}'
+                    ' ({:.1f}% of limit).'.format(
+                        dof_index, name, waypoint, 100. * ratio))
+        return messages
+
+
+def GetWaypointMatrix(traj):
+    """Extract all waypoints of a trajectory in one call.
+    @param traj OpenRAVE trajectory
+    @return (num_waypoints x cspec DOF) array of waypoints
+    """
+    cspec = traj.GetConfigurationSpecification()
+    num_waypoints = traj.GetNumWaypoints()
+    waypoints = numpy.array(traj.GetWaypoints(0, num_waypoints), dtype=float)
+    return waypoints.reshape((num_waypoints, cspec.GetDOF()))
+
+
+def GetJointColumns(cspec, robot, group_name='joint_values'):
+    """Find the columns of a configuration group for a robot's DOFs.
+    @param cspec configuration specification of the trajectory
+    @param robot robot whose DOFs to look up
+    @param group_name group type, e.g. 'joint_values' or 'joint_velocities'
+    @return dof_indices,columns parallel arrays of DOF indices and the
+            waypoint column that stores each of them
+    """
+    dof_indices = []
+    columns = []
+    for group in cspec.GetGroups():
+        tokens = group.name.split()
+        if (len(tokens) < 2 or tokens[0] != group_name
+                or tokens[1] != robot.GetName()):
+            continue
+
+        group_indices = [int(token) for token in tokens[2:]]
+        dof_indices.extend(group_indices)
+        columns.extend(group.offset + i for i in range(len(group_indices)))
+
+    return numpy.array(dof_indices, dtype=int), numpy.array(columns, dtype=int)
+
+
+def GetDeltaTimeColumn(cspec):
+    """Find the deltatime column of a configuration specification.
+    @param cspec configuration specification of the trajectory
+    @return column index, or None if the trajectory is not timed
+    """
+    for group in cspec.GetGroups():
+        if group.name.split()[0] == 'deltatime':
+            return group.offset
+    return None
+
+
+def _SubtractPositions(values0, values1, is_circular):
+    """Compute values0 - values1, wrapping circular joints to [-pi, pi).
+    @param values0 array of joint values; DOFs along the last axis
+    @param values1 array of joint values; DOFs along the last axis
+    @param is_circular boolean mask of circular DOFs
+    @return difference between the joint values
+    """
+    difference = numpy.array(values0, dtype=float) - values1
+    difference[..., is_circular] = numpy.mod(
+        difference[..., is_circular] + numpy.pi, 2. * numpy.pi) - numpy.pi
+    return difference
+
+
+def _FindViolations(values, limits, tolerance):
+    """Find the worst waypoint at which each DOF exceeds a symmetric limit.
+    @param values (num_waypoints x num_dofs) array
+    @param limits array of num_dofs limits
+    @param tolerance fractional slack allowed before a value is a violation
+    @return dict mapping column index to (waypoint index, value/limit ratio)
+    """
+    if values.size == 0:
+        return {}
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratios = numpy.abs(values) / limits
+    ratios[~numpy.isfinite(ratios)] = 0.
+
+    worst_waypoints = numpy.argmax(ratios, axis=0)
+    worst_ratios = ratios[worst_waypoints, numpy.arange(ratios.shape[1])]
+    violating = numpy.flatnonzero(worst_ratios > 1. + tolerance)
+    return dict((i, (int(worst_waypoints[i]), float(worst_ratios[i])))
+                for i in violating)
+
+
+def ValidateTrajectory(robot, traj, start_tolerance=1e-3,
+                       limit_tolerance=0.01):
+    """Check a trajectory before sending it to the controllers.
+    The waypoint matrix is extracted from the trajectory once and all checks
+    are evaluated on it in vectorized form: whether the trajectory starts at
+    the robot's current configuration, whether it is timed, and whether it
+    respects the robot's joint position, velocity, and acceleration limits.
+    Velocities are read from the trajectory if it stores them and are
+    otherwise estimated as the average velocity of each segment.
+    Accelerations are finite differences of the velocities: of the waypoint
+    velocities, which is exact for the piecewise constant accelerations of
+    parabolic trajectories, or of consecutive segment averages, divided by
+    the time between the segments' midpoints.
+    @param robot robot that will execute the trajectory
+    @param traj OpenRAVE trajectory
+    @param start_tolerance maximum joint distance from the current
+                           configuration to the first waypoint, in radians
+    @param limit_tolerance fractional slack allowed on the limits
+    @return TrajectoryReport describing the trajectory
+    """
+    import prpy.util
+
+    report = TrajectoryReport()
+    cspec = traj.GetConfigurationSpecification()
+    waypoints = GetWaypointMatrix(traj)
+    report.num_waypoints = waypoints.shape[0]
+    report.has_affine = prpy.util.HasAffineDOFs(cspec)
+    report.has_joints = prpy.util.HasJointDOFs(cspec)
+
+    dof_indices, position_columns = GetJointColumns(cspec, robot)
+    report.dof_indices = dof_indices.tolist()
+    report.manipulators = [
+        manipulator for manipulator in robot.GetManipulators()
+        if not set(manipulator.GetArmIndices()).isdisjoint(report.dof_indices)]
+
+    if report.num_waypoints == 0:
+        return report
+
+    # Check that the trajectory starts at the current configuration. Base
+    # trajectories are checked by prpy, since they are not stored as joints.
+    is_circular = numpy.array([
+        robot.GetJointFromDOFIndex(dof_index).IsCircular(0)
+        for dof_index in dof_indices], dtype=bool)
+
+    if len(dof_indices) > 0:
+        with robot.GetEnv():
+            current_values = robot.GetDOFValues(dof_indices)
+        start_difference = _SubtractPositions(
+            waypoints[0, position_columns], current_values, is_circular)
+        report.start_error = float(numpy.max(numpy.abs(start_difference)))
+        report.is_at_start = report.start_error <= start_tolerance
+    else:
+        report.is_at_start = prpy.util.IsAtTrajectoryStart(robot, traj)
+
+    deltatime_column = GetDeltaTimeColumn(cspec)
+    report.is_timed = deltatime_column is not None
+    if report.is_timed:
+        deltatimes = waypoints[:, deltatime_column]
+        report.duration = float(numpy.sum(deltatimes))
+
+    if len(dof_indices) == 0:
+        return report
+
+    # Joint limits. Circular joints have no meaningful position limits.
+    positions = waypoints[:, position_columns]
+    lower_limits, upper_limits = robot.GetDOFLimits(dof_indices)
+    slack = limit_tolerance * (upper_limits - lower_limits)
+    excess = numpy.maximum(lower_limits - slack - positions,
+                           positions - upper_limits - slack)
+    excess[:, is_circular] = -numpy.inf
+    for i in numpy.flatnonzero(numpy.max(excess, axis=0) > 0.):
+        worst_waypoint = int(numpy.argmax(excess[:, i]))
+        report.position_violations[int(dof_indices[i])] = (
+            worst_waypoint, 1. + excess[worst_waypoint, i] /
+            (upper_limits[i] - lower_limits[i]))
+
+    if not report.is_timed or report.num_waypoints < 2:
+        return report
+
+    # Velocity and acceleration limits. Zero-duration segments, e.g. from
+    # duplicate waypoints, carry no motion and are skipped.
+    intervals = deltatimes[1:]
+
+    velocity_indices, velocity_columns = GetJointColumns(
+        cspec, robot, group_name='joint_velocities')
+    if numpy.array_equal(velocity_indices, dof_indices):
+        velocities = waypoints[:, velocity_columns]
+        accelerations = numpy.zeros_like(velocities)
+        moving = intervals > 0.
+        accelerations[1:][moving] = ((velocities[1:] - velocities[:-1])[moving]
+                                     / intervals[moving, numpy.newaxis])
+    else:
+        # Estimate the average velocity of each segment. Consecutive
+        # segment averages are sampled at the segments' midpoints, which
+        # are (dt_k + dt_k+1) / 2 apart. Their difference is reported at
+        # the waypoint between the two segments.
+        segments = numpy.flatnonzero(intervals > 0.)
+        segment_intervals = intervals[segments, numpy.newaxis]
+        segment_velocities = _SubtractPositions(
+            positions[segments + 1], positions[segments],
+            is_circular) / segment_intervals
+
+        velocities = numpy.zeros_like(positions)
+        velocities[segments + 1] = segment_velocities
+        accelerations = numpy.zeros_like(positions)
+        accelerations[segments[:-1] + 1] = (
+            (segment_velocities[1:] - segment_velocities[:-1])
+            / (0.5 * (segment_intervals[1:] + segment_intervals[:-1])))
+
+    velocity_limits = robot.GetDOFVelocityLimits(dof_indices)
+    acceleration_limits = robot.GetDOFAccelerationLimits(dof_indices)
+
+    for column, violation in _FindViolations(
+            velocities, velocity_limits, limit_tolerance).items():
+        report.velocity_violations[int(dof_indices[column])] = violation
+    for column, violation in _FindViolations(
+            accelerations, acceleration_limits, limit_tolerance).items():
+        report.acceleration_violations[int(dof_indices[column])] = violation
+
+    return report
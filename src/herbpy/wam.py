@@ -28,15 +28,62 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
-import math
 import logging
 import numpy
 import openravepy
+import os
+import threading
 import warnings
 from prpy.base.manipulator import Manipulator
+from .ik import GetSceneRevision, IkSolutionCache, QuantizePose
+from .ikcache import GetDefaultCache
+from .limits import (
+    DEFAULT_PROFILE, GetProfile, LimitProfile, SetArmLimits, UseLimitProfiles)
+from .reachability import GetDefaultPath, ReachabilityMap
+from .scheduler import SimulatedServo
+from .servo import CartesianServo, PeriodicExecutor, TargetStream
 
 logger = logging.getLogger('wam')
 
+
+def FindFirstContact(check_collision, duration, step, tolerance):
+    """Find the first time at which a trajectory is in collision.
+    The trajectory is checked every \p step seconds and at its end. If a
+    check collides, the interval between it and the last collision-free
+    check is bisected until it is shorter than \p tolerance. With \p step
+    equal to \p tolerance this is a linear search.
+    @param check_collision function that returns whether the trajectory is
+                           in collision at a time
+    @param duration duration of the trajectory, in seconds
+    @param step coarse step, in seconds
+    @param tolerance time resolution of the contact, in seconds
+    @return free_time,contact_time last collision-free time, or None if the
+            start is in collision, and first time in collision, or None if
+            the trajectory is collision-free
+    """
+    sample_times = numpy.arange(0., duration, step)
+    if len(sample_times) == 0 or duration - sample_times[-1] > 1e-9:
+        sample_times = numpy.append(sample_times, duration)
+
+    free_time, contact_time = None, None
+    for t in sample_times:
+        if check_collision(t):
+            contact_time = t
+            break
+        free_time = t
+
+    # The slack keeps rounding errors from bisecting a linear search.
+    if contact_time is not None and free_time is not None:
+        while contact_time - free_time > tolerance + 1e-9:
+            t = 0.5 * (free_time + contact_time)
+            if check_collision(t):
+                contact_time = t
+            else:
+                free_time = t
+
+    return free_time, contact_time
+
+
 class WAM(Manipulator):
     def __init__(self, sim, namespace='',
                  iktype=openravepy.IkParameterization.Type.Transform6D):
@@ -45,14 +92,29 @@ class WAM(Manipulator):
         self.simulated = sim
         self._iktype = iktype
         self.namespace = namespace
-
+        self._ik_ready = threading.Event()
+        self._ik_loaded = threading.Event()
+        self.ik_solution_cache = IkSolutionCache()
+        self._reachability_map = None
+        self.servo_statistics = None
+        self.last_contact = None
+        self._cartesian_servo = None
+
+        # HERBRobot captures the nominal limits again once it has set the
+        # acceleration limits, which are not specified in URDF.
+        self._nominal_limits = None
+        self.SetNominalLimits()
+        self._limit_profile = DEFAULT_PROFILE
+
+        # Created on the first Servo call and ticked by the shared scheduler.
+        self.servo_simulator = None
+
+        # HERBRobot waits for both arms with WaitForIKLoad, so they load in
+        # parallel.
         if iktype is not None:
-            self._SetupIK(iktype)
-
-        if sim:
-            from prpy.simulation import ServoSimulator
-            self.servo_simulator = ServoSimulator(
-                self, rate=20, watchdog_timeout=0.1)
+            self._SetupIK(iktype, wait=False)
+        else:
+            self._ik_loaded.set()
 
     def IsSimulated(self):
         return self.simulated
@@ -66,20 +128,259 @@ class WAM(Manipulator):
 
         self.simulated = True
         self._iktype = parent._iktype
+        self._ik_ready = threading.Event()
+        self._ik_loaded = threading.Event()
+        self.ik_solution_cache = IkSolutionCache()
+        self._reachability_map = parent._reachability_map
+        self.servo_statistics = None
+        self.last_contact = None
+        self._cartesian_servo = None
+        self._nominal_limits = parent._nominal_limits
+        self._limit_profile = parent._limit_profile
+        self.servo_simulator = None
 
         if self._iktype is not None:
             self._SetupIK(self._iktype)
+        else:
+            self._ik_loaded.set()
 
-    def _SetupIK(self, iktype):
+    def _SetupIK(self, iktype, wait=True):
+        """Load the IK database, or start generating it if it is missing.
+        @param iktype IK parameterization type
+        @param wait load in this thread; otherwise load in a background
+                    thread and signal \ref WaitForIKLoad when done
+        """
         from openravepy.databases.inversekinematics import InverseKinematicsModel
 
         robot = self.GetRobot()
+        free_indices = [self.GetIndices()[2]]
         self.ikmodel = InverseKinematicsModel(robot=robot, manip=self,
                                               iktype=iktype)
-        if not self.ikmodel.load():
-            self.ikmodel.generate(iktype=iktype, precision=4,
-                                  freeindices=[self.GetIndices()[2]])
-            self.ikmodel.save()
+
+        if wait:
+            try:
+                self._LoadOrGenerateIK(iktype, free_indices)
+            finally:
+                self._ik_loaded.set()
+        else:
+            thread = threading.Thread(target=self._LoadIK,
+                                      args=(iktype, free_indices),
+                                      name='ik-load-' + self.GetName())
+            thread.daemon = True
+            thread.start()
+
+    def _LoadIK(self, iktype, free_indices):
+        try:
+            self._LoadOrGenerateIK(iktype, free_indices)
+        except Exception as e:
+            logger.error('Failed loading the IK database for manipulator'
+                         ' "%s": %s', self.GetName(), e)
+        finally:
+            self._ik_loaded.set()
+
+    def _LoadOrGenerateIK(self, iktype, free_indices):
+        robot = self.GetRobot()
+        cache = GetDefaultCache()
+
+        # This may run in a background thread while HERBRobot binds the rest
+        # of the robot, so hold the environment lock while changing the
+        # manipulator's IK solver.
+        with robot.GetEnv():
+            if self.ikmodel.load():
+                self._ik_ready.set()
+                return
+
+            key = cache.GetKey(self, iktype, free_indices)
+            if cache.Fetch(self.ikmodel, key) and self.ikmodel.load():
+                self._ik_ready.set()
+                return
+
+            # Compiling ikfast takes minutes. Do it in the background and use
+            # a numerical solver until the database is ready.
+            logger.warning('Generating the IK database for manipulator "%s"'
+                           ' in the background.', self.GetName())
+            self._SetNumericalIkSolver()
+
+        ikmodel = self.ikmodel
+
+        def generate():
+            ikmodel.generate(iktype=iktype, precision=4,
+                             freeindices=free_indices)
+            ikmodel.save()
+            cache.Store(ikmodel, key)
+
+        def on_generated(success):
+            if success:
+                with robot.GetEnv():
+                    success = ikmodel.load()
+
+            if success:
+                logger.info('Loaded the IK database for manipulator "%s".',
+                            self.GetName())
+                self._ik_ready.set()
+            else:
+                logger.error('Failed loading the IK database for manipulator'
+                             ' "%s".', self.GetName())
+
+        cache.GenerateAsync(key, generate, on_generated)
+
+    def _SetNumericalIkSolver(self):
+        from openravepy import RaveCreateIkSolver
+
+        env = self.GetRobot().GetEnv()
+        solver = RaveCreateIkSolver(env, 'NloptIK')
+        if solver is None:
+            logger.warning('Unable to create the NloptIK solver. Do you have'
+                           ' or_nlopt_ik installed? IK is unavailable until'
+                           ' the IK database is generated.')
+            return
+
+        with env:
+            self.SetIkSolver(solver)
+
+    def IsIKReady(self):
+        """Check whether the ikfast IK database is loaded.
+        @return False while the IK database is being generated
+        """
+        return self._ik_ready.is_set()
+
+    def WaitForIKLoad(self, timeout=None):
+        """Block until the IK database is loaded or its generation started.
+        After this, IK queries use either ikfast or the numerical solver.
+        @param timeout maximum time to wait, in seconds; None waits forever
+        @return whether loading finished
+        """
+        self._ik_loaded.wait(timeout)
+        return self._ik_loaded.is_set()
+
+    def WaitForIK(self, timeout=None):
+        """Block until the ikfast IK database is loaded.
+        @param timeout maximum time to wait, in seconds; None waits forever
+        @return whether the IK database is loaded
+        """
+        self._ik_ready.wait(timeout)
+        return self._ik_ready.is_set()
+
+    def FindIKSolutionsBatch(self, poses, num_free_samples=16,
+                             check_collisions=True, use_cache=True,
+                             position_resolution=0.001,
+                             rotation_resolution=0.001):
+        """Find all IK solutions for a batch of end-effector poses.
+        The ikfast solver from \ref _SetupIK is called at \p num_free_samples
+        evenly spaced values of the free joint. The candidate solutions of all
+        poses are then checked for collision inside a single collision
+        checker context. Results are stored in \ref ik_solution_cache, keyed
+        by the quantized pose and a digest of the scene, so repeated queries
+        are free until something in the environment moves.
+        @param poses (N, 4, 4) array of end-effector poses in the world frame;
+                     they are converted to the IK type the arm was created with
+        @param num_free_samples number of free joint values to sample
+        @param check_collisions discard solutions in collision
+        @param use_cache read and write the solution cache
+        @param position_resolution pose quantization for the cache, in meters
+        @param rotation_resolution pose quantization of the rotation entries
+        @return list of N (k, 7) arrays of arm configurations
+        """
+        from openravepy import IkFilterOptions, IkParameterization, Robot
+
+        poses = numpy.asarray(poses, dtype=float).reshape(-1, 4, 4)
+        robot = self.GetRobot()
+        env = robot.GetEnv()
+        arm_indices = self.GetArmIndices()
+        num_dofs = len(arm_indices)
+        iktype = self._iktype
+        if iktype is None:
+            iktype = IkParameterization.Type.Transform6D
+
+        # The numerical solver used while ikfast is generated does not take
+        # free joint values.
+        if self.IsIKReady():
+            free_samples = [[v] for v in numpy.linspace(0., 1., num_free_samples)]
+        else:
+            free_samples = [None]
+
+        results = [None] * len(poses)
+        missing = []
+
+        with env:
+            if use_cache:
+                revision = GetSceneRevision(robot, ignore_indices=arm_indices)
+                options = (num_free_samples, check_collisions, self.IsIKReady(),
+                           str(iktype))
+                keys = [(QuantizePose(pose, position_resolution,
+                                      rotation_resolution), revision, options)
+                        for pose in poses]
+                for i, key in enumerate(keys):
+                    results[i] = self.ik_solution_cache.Get(key)
+                    if results[i] is None:
+                        missing.append(i)
+            else:
+                missing = list(range(len(poses)))
+
+            # Solve without collision checking; candidates are filtered below.
+            candidates = []
+            for i in missing:
+                ikparam = IkParameterization(poses[i], iktype)
+                solutions = []
+                for free_values in free_samples:
+                    if free_values is None:
+                        found = self.FindIKSolutions(
+                            ikparam, IkFilterOptions.IgnoreEndEffectorCollisions)
+                    else:
+                        found = self.FindIKSolutions(
+                            ikparam, free_values,
+                            IkFilterOptions.IgnoreEndEffectorCollisions)
+                    if found is not None and len(found) > 0:
+                        solutions.append(numpy.asarray(found).reshape(-1, num_dofs))
+
+                if solutions:
+                    solutions = numpy.vstack(solutions)
+                    # Neighboring free joint samples often converge to the same
+                    # solution branch.
+                    seen = set()
+                    unique = []
+                    for k, solution in enumerate(numpy.round(solutions, 4)):
+                        key = tuple(solution)
+                        if key not in seen:
+                            seen.add(key)
+                            unique.append(k)
+                    solutions = solutions[unique]
+                else:
+                    solutions = numpy.zeros((0, num_dofs))
+                candidates.append(solutions)
+
+            if check_collisions and any(len(c) > 0 for c in candidates):
+                robot_saver = robot.CreateRobotStateSaver(
+                    Robot.SaveParameters.LinkTransformation)
+                with robot_saver, robot.robot_checker_factory(robot) as checker:
+                    for j, solutions in enumerate(candidates):
+                        valid = numpy.ones(len(solutions), dtype=bool)
+                        for k, solution in enumerate(solutions):
+                            robot.SetDOFValues(solution, arm_indices)
+                            valid[k] = not checker.CheckCollision()
+                        candidates[j] = solutions[valid]
+
+            for i, solutions in zip(missing, candidates):
+                results[i] = solutions
+                if use_cache:
+                    self.ik_solution_cache.Put(keys[i], solutions)
+
+        return [numpy.array(solutions) for solutions in results]
+
+    def GetReachabilityMap(self):
+        """Get the arm's reachability map.
+        The map is loaded from \ref reachability.GetDefaultPath the first
+        time it is requested. Build it with scripts/build_reachability_herb.py.
+        @return ReachabilityMap, or None if no map has been built
+        """
+        if self._reachability_map is None:
+            path = GetDefaultPath(self)
+            if not os.path.exists(path):
+                logger.warning('No reachability map for manipulator "%s" at'
+                               ' "%s".', self.GetName(), path)
+                return None
+            self._reachability_map = ReachabilityMap.Load(path)
+        return self._reachability_map
 
     def SetStiffness(self, stiffness):
         """Set the WAM's stiffness.
@@ -122,40 +423,190 @@ class WAM(Manipulator):
                                       'supported under ros_control.')
 
         else:
+            if self.servo_simulator is None:
+                self.servo_simulator = SimulatedServo(self, watchdog_timeout=0.1)
             self.servo_simulator.SetVelocity(velocities)
 
     def ServoTo(self, target, duration, timeStep=0.05, collisionChecking=True):
         """Servo the arm towards a target configuration over some duration.
         Servos the arm towards a target configuration with a constant joint
-        velocity. This function uses the \ref Servo command to control the arm
-        and must be called repeatidly until the arm reaches the goal. If \tt
-        collisionChecking is enabled, then the servo will terminate and return
-        False if a collision is detected with the simulation environment.
+        velocity. The velocity command is re-sent every \p timeStep seconds
+        by a \ref PeriodicExecutor, so the loop does not drift. Timing
+        statistics of the last servo are stored in \ref servo_statistics. If
+        \tt collisionChecking is enabled, then the servo will terminate and
+        return False if the target is in collision with the simulation
+        environment.
         @param target desired configuration
         @param duration duration in seconds
         @param timestep period of the control loop, in seconds
         @param collisionchecking check collisions in the simulation environment
         @return whether the servo was successful
         """
-        steps = int(math.ceil(duration/timeStep))
-        original_dofs = self.GetRobot().GetDOFValues(self.GetArmIndices())
-        velocity = numpy.array(target - self.GetRobot().GetDOFValues(self.GetArmIndices()))
-        velocities = [v/steps for v in velocity]
-        inCollision = False
-        if collisionChecking:
-            inCollision = self.CollisionCheck(target)
-
-        if not inCollision:
-            for i in range(1, steps):
-                import time
-                self.Servo(velocities)
-                time.sleep(timeStep)
-            self.Servo([0] * len(self.GetArmIndices()))
-            # new_dofs = self.GetRobot().GetDOFValues(self.GetArmIndices())
-            return True
-        else:
+        robot = self.GetRobot()
+        arm_indices = self.GetArmIndices()
+        with robot.GetEnv():
+            current = robot.GetDOFValues(arm_indices)
+        velocities = (numpy.asarray(target, dtype=float) - current) / duration
+
+        if collisionChecking and self.CollisionCheck(target):
             return False
 
+        executor = PeriodicExecutor(timeStep)
+        try:
+            self.servo_statistics = executor.Run(
+                lambda elapsed: self.Servo(velocities), duration=duration)
+        finally:
+            self.Servo(numpy.zeros(len(arm_indices)))
+
+        logger.debug('ServoTo: %s', self.servo_statistics)
+        return True
+
+    def ServoStream(self, targets, period=0.05, gain=2., timeout=None):
+        """Servo the arm towards a stream of target configurations.
+        At every tick the newest target is read from \p targets and the arm
+        is commanded with a velocity proportional to its distance from the
+        target, scaled down uniformly to respect the joint velocity limits.
+        The stream ends when \p targets produces None.
+        @param targets function returning the current target, or a Queue
+                       that another thread puts targets into; see
+                       \ref TargetStream
+        @param period period of the control loop, in seconds
+        @param gain proportional gain, in 1/s
+        @param timeout maximum time to servo, in seconds; None servos until
+                       the stream ends
+        @return TimingStatistics of the servo loop
+        """
+        robot = self.GetRobot()
+        arm_indices = self.GetArmIndices()
+        stream = TargetStream(targets)
+        velocity_limits = numpy.array(self.GetVelocityLimits())
+        zero = numpy.zeros(len(arm_indices))
+
+        def step(elapsed):
+            target = stream.GetLatest()
+            if stream.is_done:
+                return False
+            if target is None:
+                self.Servo(zero)
+                return True
+
+            with robot.GetEnv():
+                current = robot.GetDOFValues(arm_indices)
+            velocities = gain * (target - current)
+            scale = max(1., numpy.max(numpy.abs(velocities) / velocity_limits))
+            self.Servo(velocities / scale)
+            return True
+
+        executor = PeriodicExecutor(period)
+        try:
+            self.servo_statistics = executor.Run(step, duration=timeout)
+        finally:
+            self.Servo(zero)
+
+        logger.debug('ServoStream: %s', self.servo_statistics)
+        return self.servo_statistics
+
+    def GetCartesianServo(self):
+        """Get the arm's Cartesian servo engine.
+        The engine is created the first time it is requested.
+        @return herbpy.servo.CartesianServo
+        """
+        if self._cartesian_servo is None:
+            self._cartesian_servo = CartesianServo(self)
+        return self._cartesian_servo
+
+    def ServoTwist(self, twists, period=0.01, timeout=None):
+        """Servo the end-effector with a stream of twists.
+        At every tick the newest twist is read from \p twists, converted into
+        joint velocities by \ref GetCartesianServo, and sent with \ref Servo.
+        The stream ends when \p twists produces None.
+        @param twists function returning the current twist, or a Queue that
+                      another thread puts twists into; twists are
+                      [vx, vy, vz, wx, wy, wz] in the world frame
+        @param period period of the control loop, in seconds
+        @param timeout maximum time to servo, in seconds; None servos until
+                       the stream ends
+        @return TimingStatistics of the servo loop
+        """
+        engine = self.GetCartesianServo()
+        stream = TargetStream(twists)
+        zero = numpy.zeros(len(self.GetArmIndices()))
+
+        def step(elapsed):
+            twist = stream.GetLatest()
+            if stream.is_done:
+                return False
+            if twist is None:
+                self.Servo(zero)
+            else:
+                self.Servo(engine.ComputeJointVelocities(twist))
+            return True
+
+        executor = PeriodicExecutor(period)
+        try:
+            self.servo_statistics = executor.Run(step, duration=timeout)
+        finally:
+            self.Servo(zero)
+
+        logger.debug('ServoTwist: %s, mean compute %.3f ms, max compute'
+                     ' %.3f ms', self.servo_statistics,
+                     1e3 * engine.GetMeanComputeTime(),
+                     1e3 * engine.max_compute_time)
+        return self.servo_statistics
+
+    def GetLimitProfile(self):
+        """Get the active limit profile.
+        @return profile name, LimitProfile, or None if the limits were set
+                with \ref SetVelocityLimits
+        """
+        return self._limit_profile
+
+    def GetNominalLimits(self):
+        """Get the limits that limit profiles are relative to.
+        @return velocities,accelerations nominal limits of the arm
+        """
+        return self._nominal_limits
+
+    def SetNominalLimits(self):
+        """Use the arm's current limits as its nominal limits.
+        Limit profiles set afterwards are relative to these limits. Call this
+        after changing the limits loaded with the robot model, e.g. to set
+        acceleration limits that are not specified in URDF.
+        """
+        robot = self.GetRobot()
+        with robot.GetEnv():
+            arm_indices = self.GetArmIndices()
+            self._nominal_limits = (robot.GetDOFVelocityLimits(arm_indices),
+                                    robot.GetDOFAccelerationLimits(arm_indices))
+
+    def SetLimitProfile(self, profile):
+        """Set the arm's velocity and acceleration limits from a profile.
+        Profiles are defined in \ref herbpy.limits.PROFILES relative to the
+        nominal limits of the arm. Trajectories post-processed afterwards are
+        retimed with the profile's limits. Limits that do not change are not
+        written, so switching to the active profile is free.
+        @param profile profile name, e.g. 'fast', 'careful', or 'pour', or a
+                       herbpy.limits.LimitProfile
+        """
+        velocities, accelerations = GetProfile(profile).GetLimits(
+            *self._nominal_limits)
+
+        robot = self.GetRobot()
+        with robot.GetEnv():
+            SetArmLimits(robot, self.GetArmIndices(), velocities, accelerations)
+        self._limit_profile = profile
+
+    def UseLimitProfile(self, profile):
+        """Switch to a limit profile for the duration of a with block.
+
+            with robot.right_arm.UseLimitProfile('careful'):
+                robot.right_arm.PlanToNamedConfiguration('home', execute=True)
+
+        @param profile profile name or herbpy.limits.LimitProfile
+        @return context manager that restores the previous limits
+        """
+        return UseLimitProfiles([self], profile)
+
     def GetVelocityLimits(self, openrave=None, owd=None):
         """Get the OpenRAVE and OWD joint velocity limits.
         This function checks both the OpenRAVE and OWD joint velocity limits.
@@ -192,6 +643,7 @@ class WAM(Manipulator):
         # Update the OpenRAVE limits.
         if openrave:
             Manipulator.SetVelocityLimits(self, velocity_limits, min_accel_time)
+            self._limit_profile = None
 
     def GetTrajectoryStatus(manipulator):
         """Gets the status of the current (or previous) trajectory executed by OWD.
@@ -208,7 +660,8 @@ class WAM(Manipulator):
 
     def MoveUntilTouch(manipulator, direction, distance, max_distance=None,
                        max_force=5.0, max_torque=None, ignore_collisions=None,
-                       velocity_limit_scale=0.25, **kw_args):
+                       velocity_limit_scale=0.25, contact_search='bisect',
+                       contact_step=0.1, contact_tolerance=0.001, **kw_args):
         """Execute a straight move-until-touch action.
         This action stops when a sufficient force is is felt or the manipulator
         moves the maximum distance. The motion is considered successful if the
@@ -223,9 +676,19 @@ class WAM(Manipulator):
         @param ignore_collisions collisions with these objects are ignored when
         planning the path, e.g. the object you think you will touch
         @param velocity_limit_scale A multiplier to use to scale velocity limits
-        when executing MoveUntilTouch ( < 1 in most cases).
+        when executing MoveUntilTouch ( < 1 in most cases). The trajectory is
+        retimed with a \ref LimitProfile that scales the nominal limits.
+        @param contact_search how the first contact is found in simulation:
+        'bisect' (the default) checks every \p contact_step seconds, then
+        bisects to the first contact; see \ref FindFirstContact. It can step
+        over obstacles thinner than the distance the hand moves in
+        \p contact_step. 'linear' checks every 0.01 s of the trajectory.
+        @param contact_step coarse step of 'bisect', in seconds
+        @param contact_tolerance time resolution of 'bisect', in seconds
         @param **kw_args planner parameters
-        @return felt_force flag indicating whether we felt a force.
+        @return felt_force flag indicating whether we felt a force. On the
+        real robot, the \ref ContactEvent with the contact time and the
+        reaction latency is stored in \p last_contact.
         """
         from contextlib import nested
         from openravepy import CollisionReport, KinBody, Robot, RaveCreateTrajectory
@@ -277,52 +740,90 @@ class WAM(Manipulator):
                 path = robot.PlanToEndEffectorOffset(direction=direction,
                     distance=distance, max_distance=max_distance, **kw_args)
 
-        # Execute on the real robot by tagging the trajectory with options that
-        # tell the controller to stop on force/torque input.
+        approach_profile = LimitProfile(velocity_scale=velocity_limit_scale)
+
+        # Execute on the real robot with a guard that cancels the trajectory
+        # as soon as the force/torque sensor reports contact.
         if not manipulator.simulated:
-            raise NotImplementedError('MoveUntilTouch not yet implemented under ros_control.')
+            hand = manipulator.hand
+            guard = hand.GetForceTorqueGuard()
+            controller = robot.GetArmSide(manipulator) + '_trajectory_controller'
+            with manipulator.UseLimitProfile(approach_profile):
+                traj = robot.PostProcessPath(path)
+
+            hand.TareForceTorqueSensor()
+            guard.Arm([controller], max_force, max_torque,
+                      force_direction=force_direction)
+            try:
+                robot.ExecuteTrajectory(traj)
+            except Exception as e:
+                # The controller reports the cancelled goal as a failure.
+                if not guard.IsTriggered():
+                    raise
+                logger.debug('Trajectory cancelled on contact: %s', e)
+            finally:
+                contact = guard.Disarm()
+
+            manipulator.last_contact = contact
+            return contact is not None
         # Forward-simulate the motion until it hits an object.
         else:
-            traj = robot.PostProcessPath(path)
-            is_collision = False
-
-            traj_cspec = traj.GetConfigurationSpecification()
-            new_traj = RaveCreateTrajectory(env, '')
-            new_traj.Init(traj_cspec)
+            if contact_search == 'linear':
+                contact_step = contact_tolerance = delta_t
+            elif contact_search != 'bisect':
+                raise ValueError('Unknown contact search "{:s}".'.format(
+                                 contact_search))
+
+            with manipulator.UseLimitProfile(approach_profile):
+                traj = robot.PostProcessPath(path)
+            duration = traj.GetDuration()
+
+            def CheckCollisionAt(t):
+                dof_values = robot_cspec.ExtractJointValues(
+                    traj.Sample(t), robot, dof_indices, 0)
+                manipulator.SetDOFValues(dof_values)
+
+                report = CollisionReport()
+                if env.CheckCollision(robot, report=report):
+                    logger.info('Terminated from collision: %s',
+                        str(CollisionPlanningError.FromReport(report)))
+                    return True
+                elif robot.CheckSelfCollision(report=report):
+                    logger.info('Terminated from self-collision: %s',
+                        str(CollisionPlanningError.FromReport(report)))
+                    return True
+                return False
 
             robot_saver = robot.CreateRobotStateSaver(
                 Robot.SaveParameters.LinkTransformation)
 
             with env, robot_saver:
-                for t in numpy.arange(0, traj.GetDuration(), delta_t):
-                    waypoint = traj.Sample(t)
-
-                    dof_values = robot_cspec.ExtractJointValues(
-                        waypoint, robot, dof_indices, 0)
-                    manipulator.SetDOFValues(dof_values)
-
-                    # Terminate if we detect collision with the environment.
-                    report = CollisionReport()
-                    if env.CheckCollision(robot, report=report):
-                        logger.info('Terminated from collision: %s',
-                            str(CollisionPlanningError.FromReport(report)))
-                        is_collision = True
-                        break
-                    elif robot.CheckSelfCollision(report=report):
-                        logger.info('Terminated from self-collision: %s',
-                            str(CollisionPlanningError.FromReport(report)))
-                        is_collision = True
-                        break
-
-                    # Build the output trajectory that stops in contact.
-                    if new_traj.GetNumWaypoints() == 0:
-                        traj_cspec.InsertDeltaTime(waypoint, 0.)
-                    else:
-                        traj_cspec.InsertDeltaTime(waypoint, delta_t)
+                free_time, contact_time = FindFirstContact(
+                    CheckCollisionAt, duration, contact_step,
+                    contact_tolerance)
+
+            is_collision = contact_time is not None
+            if free_time is None:
+                return is_collision
+
+            # Build the output trajectory that stops in contact. A sample
+            # that would end a tiny segment before free_time is moved there
+            # instead.
+            times = numpy.arange(0, free_time, delta_t)
+            if len(times) > 1 and free_time - times[-1] < 0.5 * delta_t:
+                times[-1] = free_time
+            elif len(times) == 0 or times[-1] < free_time:
+                times = numpy.append(times, free_time)
 
-                    new_traj.Insert(new_traj.GetNumWaypoints(), waypoint)
+            traj_cspec = traj.GetConfigurationSpecification()
+            waypoints = numpy.array([traj.Sample(t) for t in times])
+            deltatime_offset = traj_cspec.GetGroupFromName('deltatime').offset
+            waypoints[0, deltatime_offset] = 0.
+            waypoints[1:, deltatime_offset] = numpy.diff(times)
 
-            if new_traj.GetNumWaypoints() > 0:
-                robot.ExecuteTrajectory(new_traj)
+            new_traj = RaveCreateTrajectory(env, '')
+            new_traj.Init(traj_cspec)
+            new_traj.Insert(0, waypoints.ravel())
+            robot.ExecuteTrajectory(new_traj)
 
             return is_collision
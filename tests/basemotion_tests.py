@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+from herbpy.basemotion import GuardedBaseMotion, GuardedMotionResult
+from herbpy.forcetorque import ForceTorqueBuffer
+
+
+class GuardedBaseMotionTest(unittest.TestCase):
+    def setUp(self):
+        self._buffers = [ForceTorqueBuffer(), ForceTorqueBuffer()]
+        for buffer in self._buffers:
+            buffer.Append(time.time(), [0.] * 6)
+        self._velocities = []
+        self._motion = GuardedBaseMotion(self._buffers, force_threshold=3.,
+                                         rate=100.)
+
+    def _GetDistance(self):
+        return 0.01 * len([v for v in self._velocities if v > 0.])
+
+    def test_Run_StopsOnContact(self):
+        def Touch():
+            time.sleep(0.05)
+            self._buffers[1].Append(time.time(), [0., 5., 0., 0., 0., 0.])
+
+        thread = threading.Thread(target=Touch)
+        thread.start()
+        result = self._motion.Run(self._velocities.append, self._GetDistance,
+                                  velocity=0.1, timeout=2.)
+        thread.join()
+
+        self.assertEqual(result.reason, GuardedMotionResult.CONTACT)
+        self.assertTrue(result.felt_force)
+        self.assertEqual(self._velocities[-1], 0.)
+        self.assertLess(result.duration, 1.)
+        self.assertLess(result.reaction_latency, 0.5)
+
+    def test_Run_StopsAtMaxDistance(self):
+        result = self._motion.Run(self._velocities.append, self._GetDistance,
+                                  velocity=0.1, max_distance=0.05, timeout=2.)
+
+        self.assertEqual(result.reason, GuardedMotionResult.DISTANCE)
+        self.assertFalse(result.felt_force)
+        self.assertAlmostEqual(result.distance, 0.05)
+        self.assertEqual(self._velocities, [0.1] * 5 + [0.])
+        self.assertIsNone(result.reaction_latency)
+
+    def test_Run_StopsAtTimeout(self):
+        result = self._motion.Run(self._velocities.append, self._GetDistance,
+                                  velocity=0.1, timeout=0.05)
+
+        self.assertEqual(result.reason, GuardedMotionResult.TIMEOUT)
+        self.assertGreater(result.loop_rate, 0.)
+        self.assertEqual(self._velocities[-1], 0.)
+
+    def test_Run_StopsOnStaleData(self):
+        stale = ForceTorqueBuffer()
+        stale.Append(time.time() - 1., [0.] * 6)
+        motion = GuardedBaseMotion(self._buffers + [stale], force_threshold=3.,
+                                   rate=100.)
+        result = motion.Run(self._velocities.append, self._GetDistance,
+                            velocity=0.1, timeout=2.)
+
+        self.assertEqual(result.reason, GuardedMotionResult.STALE_DATA)
+        self.assertFalse(result.felt_force)
+        self.assertEqual(self._velocities, [0.])
+
+    def test_Run_StopsWithoutData(self):
+        motion = GuardedBaseMotion(self._buffers + [ForceTorqueBuffer()],
+                                   force_threshold=3., rate=100.)
+        result = motion.Run(self._velocities.append, self._GetDistance,
+                            velocity=0.1, timeout=2.)
+
+        self.assertEqual(result.reason, GuardedMotionResult.STALE_DATA)
+        self.assertEqual(self._velocities, [0.])
+
+    def test_Run_IgnoresStaleDataWhenDisabled(self):
+        stale = ForceTorqueBuffer()
+        stale.Append(time.time() - 1., [0.] * 6)
+        motion = GuardedBaseMotion(self._buffers + [stale], force_threshold=3.,
+                                   rate=100., max_data_age=None)
+        result = motion.Run(self._velocities.append, self._GetDistance,
+                            velocity=0.1, timeout=0.05)
+
+        self.assertEqual(result.reason, GuardedMotionResult.TIMEOUT)
+        self.assertGreater(result.max_data_age, 0.9)
@@ -0,0 +1,80 @@
+import numpy
+import unittest
+from herbpy.clock import SimulationClock
+from herbpy.validation import GetWaypointMatrix
+
+
+class FakeGroup(object):
+    def __init__(self, name, offset, dof):
+        self.name, self.offset, self.dof = name, offset, dof
+
+
+class FakeSpecification(object):
+    def __init__(self, groups):
+        self.groups = groups
+
+    def GetGroups(self):
+        return self.groups
+
+    def GetDOF(self):
+        return sum(group.dof for group in self.groups)
+
+
+class FakeTrajectory(object):
+    def __init__(self, cspec, waypoints):
+        self.cspec = cspec
+        self.waypoints = numpy.array(waypoints, dtype=float)
+
+    def GetConfigurationSpecification(self):
+        return self.cspec
+
+    def GetNumWaypoints(self):
+        return len(self.waypoints)
+
+    def GetWaypoints(self, start, end):
+        return self.waypoints[start:end].ravel()
+
+
+class SimulationClockTest(unittest.TestCase):
+    def setUp(self):
+        self.cspec = FakeSpecification([
+            FakeGroup('joint_values herb 0 1', 0, 2),
+            FakeGroup('joint_velocities herb 0 1', 2, 2),
+            FakeGroup('joint_accelerations herb 0 1', 4, 2),
+            FakeGroup('deltatime', 6, 1)])
+        self.traj = FakeTrajectory(self.cspec, [
+            [0., 0., 0., 0., 1., 1., 0.],
+            [1., 2., 2., 4., -1., -1., 1.]])
+
+    def test_Sleep_ScalesDuration(self):
+        sleeps = []
+        SimulationClock(speedup=4., sleep=sleeps.append).Sleep(2.)
+        self.assertEqual(sleeps, [0.5])
+
+    def test_Sleep_InstantDoesNotWait(self):
+        sleeps = []
+        clock = SimulationClock(speedup='instant', sleep=sleeps.append)
+        clock.Sleep(2.)
+        self.assertEqual(sleeps, [])
+        self.assertTrue(clock.IsInstant())
+
+    def test_Init_RejectsNonPositiveSpeedup(self):
+        with self.assertRaises(ValueError):
+            SimulationClock(speedup=0.)
+
+    def test_ScaleWaypoints_KeepsPath(self):
+        clock = SimulationClock(speedup=2.)
+        waypoints = GetWaypointMatrix(self.traj)
+        scaled = clock.ScaleWaypoints(self.cspec, waypoints)
+
+        numpy.testing.assert_array_equal(scaled[:, 0:2], waypoints[:, 0:2])
+        numpy.testing.assert_array_equal(scaled[:, 2:4], 2. * waypoints[:, 2:4])
+        numpy.testing.assert_array_equal(scaled[:, 4:6], 4. * waypoints[:, 4:6])
+        numpy.testing.assert_array_equal(scaled[:, 6], 0.5 * waypoints[:, 6])
+        # The input is not modified.
+        self.assertEqual(waypoints[1, 6], 1.)
+
+    def test_ScaleWaypoints_InstantRaises(self):
+        clock = SimulationClock(speedup='instant')
+        with self.assertRaises(ValueError):
+            clock.ScaleWaypoints(self.cspec, GetWaypointMatrix(self.traj))
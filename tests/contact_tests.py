@@ -0,0 +1,38 @@
+import numpy
+import unittest
+from herbpy.contact import ContactChange, ContactDetector
+
+
+class ContactDetectorTest(unittest.TestCase):
+    def setUp(self):
+        random = numpy.random.RandomState(0)
+        self._stamps = 0.01 * numpy.arange(300)
+        self._wrenches = 0.05 * random.randn(300, 6)
+        self._wrenches[150:250, 2] += 5.
+
+    def _Run(self, method):
+        detector = ContactDetector(method=method, window=50)
+        changes = []
+        detector.AddCallback(changes.append)
+        detector.ProcessArray(self._stamps, self._wrenches)
+        return changes
+
+    def test_Process_CusumDetectsStep(self):
+        changes = self._Run('cusum')
+        self.assertEqual([c.kind for c in changes],
+                         [ContactChange.CONTACT, ContactChange.RELEASE])
+        self.assertAlmostEqual(changes[0].stamp, 1.5, places=1)
+        self.assertAlmostEqual(changes[1].stamp, 2.5, places=1)
+
+    def test_Process_ZScoreDetectsStep(self):
+        changes = self._Run('zscore')
+        self.assertEqual(changes[0].kind, ContactChange.CONTACT)
+        self.assertAlmostEqual(changes[0].stamp, 1.5, places=2)
+
+    def test_Process_IgnoresNoise(self):
+        detector = ContactDetector(window=50)
+        events = detector.ProcessArray(self._stamps[:150], self._wrenches[:150])
+        self.assertEqual(events, [])
+
+    def test_Constructor_UnknownMethodThrows(self):
+        self.assertRaises(ValueError, ContactDetector, method='magic')
@@ -0,0 +1,119 @@
+import unittest
+from herbpy.controller_transaction import ControllerTransaction
+
+
+class FakeControllerManager(object):
+    def __init__(self):
+        self.running = set()
+        self.switches = []
+        self.fail = set()
+
+    def request(self, controllers):
+        manager = self
+
+        class Request(object):
+            def switch(self):
+                manager.switches.append(list(controllers))
+                if manager.fail.intersection(controllers):
+                    raise RuntimeError('Switch failed.')
+                manager.running.update(controllers)
+
+        return Request()
+
+
+class FakeRobot(object):
+    def __init__(self):
+        self.controller_manager = FakeControllerManager()
+        self._controller_resources = {}
+        self._controller_transaction = None
+        self.num_list_calls = 0
+
+    def ControllerTransaction(self):
+        return ControllerTransaction(self, parent=self._controller_transaction)
+
+    def GetRunningControllers(self):
+        self.num_list_calls += 1
+        return set(self.controller_manager.running)
+
+
+class ControllerTransactionTest(unittest.TestCase):
+    def setUp(self):
+        self.robot = FakeRobot()
+        self.manager = self.robot.controller_manager
+
+    def test_Commit_SwitchesOnceForNestedTransactions(self):
+        with self.robot.ControllerTransaction() as outer:
+            outer.RequestTrajectoryController('left_trajectory_controller')
+            with self.robot.ControllerTransaction() as inner:
+                inner.RequestController('joint_state_controller')
+            self.assertEqual(self.manager.switches, [])
+
+        self.assertEqual(self.manager.switches, [
+            ['joint_state_controller', 'left_trajectory_controller']])
+
+    def test_Commit_SkipsRunningControllers(self):
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestController('joint_state_controller')
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestController('joint_state_controller')
+        self.assertEqual(len(self.manager.switches), 1)
+        self.assertEqual(self.robot.num_list_calls, 0)
+
+    def test_Commit_SwitchesControllersStoppedOutsideTransaction(self):
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestController('joint_state_controller')
+        self.manager.running.clear()
+
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestController('joint_state_controller')
+        self.assertEqual(len(self.manager.switches), 1)
+
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestController('joint_state_controller')
+            transaction.Commit(refresh=True)
+        self.assertEqual(len(self.manager.switches), 2)
+        self.assertEqual(self.robot.num_list_calls, 1)
+
+    def test_Commit_ReleasesDisplacedResources(self):
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestTrajectoryController(
+                'bimanual_trajectory_controller')
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestTrajectoryController(
+                'left_trajectory_controller')
+
+        self.assertEqual(self.robot._controller_resources,
+                         {'left_arm': 'left_trajectory_controller'})
+
+        # The right arm's controller was stopped with the bimanual one, so
+        # it has to be switched on.
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestTrajectoryController(
+                'right_trajectory_controller')
+        self.assertEqual(self.manager.switches[-1],
+                         ['right_trajectory_controller'])
+
+    def test_Commit_RestoresPreviousControllersOnFailure(self):
+        with self.robot.ControllerTransaction() as transaction:
+            transaction.RequestTrajectoryController(
+                'left_trajectory_controller')
+        self.manager.fail.add('bimanual_trajectory_controller')
+
+        with self.assertRaises(RuntimeError):
+            with self.robot.ControllerTransaction() as transaction:
+                transaction.RequestTrajectoryController(
+                    'bimanual_trajectory_controller')
+                transaction.Commit()
+
+        self.assertEqual(self.manager.switches[-2:], [
+            ['bimanual_trajectory_controller'],
+            ['left_trajectory_controller']])
+        self.assertEqual(self.robot._controller_resources, {})
+        self.assertIsNone(self.robot._controller_transaction)
+
+    def test_Exit_DiscardsRequestsOnException(self):
+        with self.assertRaises(ValueError):
+            with self.robot.ControllerTransaction() as transaction:
+                transaction.RequestController('joint_state_controller')
+                raise ValueError()
+        self.assertEqual(self.manager.switches, [])
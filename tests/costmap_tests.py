@@ -0,0 +1,63 @@
+import numpy
+import unittest
+from herbpy.costmap import BaseCostmap, FREE, CIRCUMSCRIBED, LETHAL
+from herbpy.footprint import FootprintTable
+from herbpy.primitivegen import GeneratePrimitives, GetCircleFootprint
+
+# A 0.2 m box on the floor, centered at (1, 1).
+BOX = [[[0.9, 0.9, 0.], [1.1, 1.1, 0.5]]]
+
+
+class BaseCostmapTest(unittest.TestCase):
+    def setUp(self):
+        self.costmap = BaseCostmap((0., 0.), (30, 30), 0.1,
+                                   inflation_radius=0.2)
+
+    def test_SetBody_MarksCells(self):
+        self.costmap.SetBody('box', BOX)
+        occupied = numpy.argwhere(self.costmap.occupancy)
+        self.assertEqual(occupied.min(axis=0).tolist(), [9, 9])
+        self.assertEqual(occupied.max(axis=0).tolist(), [11, 11])
+
+        costs = self.costmap.GetCostGrid()
+        self.assertEqual(costs[10, 10], LETHAL)
+        self.assertEqual(costs[13, 10], CIRCUMSCRIBED)
+        self.assertEqual(costs[14, 10], FREE)
+
+    def test_SetBody_IgnoresFloor(self):
+        self.costmap.SetBody('floor', [[[-5., -5., -0.1], [5., 5., 0.]]])
+        self.assertFalse(self.costmap.occupancy.any())
+
+    def test_SetBody_MovesOverlappingBodies(self):
+        self.costmap.SetBody('box', BOX)
+        self.costmap.SetBody('other', BOX)
+        self.costmap.SetBody('box', numpy.add(BOX, [1., 0., 0.]))
+        self.assertTrue(self.costmap.IsOccupied([[1., 1.], [2., 1.]]).all())
+
+        self.costmap.RemoveBody('other')
+        numpy.testing.assert_array_equal(
+            self.costmap.IsOccupied([[1., 1.], [2., 1.]]), [False, True])
+        numpy.testing.assert_array_equal(
+            self.costmap.IsOccupied([[1.7, 1.], [1.6, 1.]], inflated=True),
+            [True, False])
+
+        self.costmap.RemoveBody('box')
+        self.assertFalse(self.costmap.inflated.any())
+
+    def test_IsOccupied_OutsideGrid(self):
+        self.assertTrue(self.costmap.IsOccupied([[-1., 0.]])[0])
+        self.assertFalse(self.costmap.IsOccupied([[0., 0.]])[0])
+
+    def test_CheckPrimitives_UsesWorldPose(self):
+        primitives = FootprintTable.Generate(
+            GetCircleFootprint(0.15), 0.1, 16).AddSweptCells(
+            GeneratePrimitives(numangles=16, cellsize=0.1))
+        costmap = BaseCostmap((-2., -2.), (50, 50), 0.1)
+        costmap.SetBody('box', BOX)
+
+        indices, toward = costmap.CheckPrimitives(primitives, (0.5, 1., 0.))
+        _, away = costmap.CheckPrimitives(primitives, (0.5, 1., numpy.pi))
+        forward = indices[numpy.argmax(
+            [primitives.GetPoses(i)[-1, 0] for i in indices])]
+        self.assertFalse(toward[list(indices).index(forward)])
+        self.assertTrue(away.all())
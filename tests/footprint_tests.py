@@ -0,0 +1,60 @@
+import numpy
+import unittest
+from herbpy.footprint import CheckPrimitives, FootprintTable, _ConvexHull
+from herbpy.primitivegen import GeneratePrimitives, GetCircleFootprint
+
+# 0.3 m by 0.1 m, pointing along the robot's x-axis.
+RECTANGLE = numpy.array([[-0.05, -0.05], [0.25, -0.05],
+                         [0.25, 0.05], [-0.05, 0.05]])
+
+
+class FootprintTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = FootprintTable.Generate(RECTANGLE, 0.1, 4)
+
+    def test_ConvexHull_DropsInteriorPoints(self):
+        points = [[0, 0], [1, 0], [1, 1], [0, 1], [0.5, 0.5], [1, 0.5]]
+        hull = _ConvexHull(points)
+        self.assertEqual(len(hull), 4)
+        self.assertFalse(any((hull == [0.5, 0.5]).all(axis=1)))
+
+    def test_Generate_RotatesMask(self):
+        numpy.testing.assert_array_equal(self.table.GetCells(0),
+                                         [[0, 0], [1, 0], [2, 0]])
+        numpy.testing.assert_array_equal(self.table.GetCells(1),
+                                         [[0, 0], [0, 1], [0, 2]])
+
+    def test_IsValid_ChecksEachPose(self):
+        occupancy = numpy.zeros((5, 5), dtype=bool)
+        occupancy[3, 1] = True
+        valid = self.table.IsValid(occupancy, [[1, 1], [1, 1], [1, 1], [3, 3]],
+                                   [0, 1, 2, 2])
+        numpy.testing.assert_array_equal(valid, [False, True, False, True])
+
+    def test_CheckPrimitives_MatchesPoseChecks(self):
+        primitives = self.table.AddSweptCells(
+            GeneratePrimitives(numangles=4, cellsize=0.1))
+        rng = numpy.random.RandomState(0)
+        occupancy = rng.uniform(size=(30, 30)) < 0.05
+
+        for angle in range(4):
+            indices, valid = CheckPrimitives(occupancy, primitives, (15, 15),
+                                             angle)
+            for index, is_valid in zip(indices, valid):
+                cells, angles = self.table.DiscretizePoses(
+                    primitives.GetPoses(index))
+                expected = self.table.IsValid(occupancy, cells + 15, angles)
+                self.assertEqual(is_valid, expected.all())
+
+    def test_CheckPrimitives_OutsideGridIsBlocked(self):
+        primitives = self.table.AddSweptCells(
+            GeneratePrimitives(numangles=4, cellsize=0.1))
+        occupancy = numpy.zeros((3, 3), dtype=bool)
+        _, valid = CheckPrimitives(occupancy, primitives, (1, 1), 0)
+        self.assertFalse(valid.any())
+
+    def test_AddSweptCells_RejectsOtherGrid(self):
+        primitives = GeneratePrimitives(numangles=8, cellsize=0.1,
+                                        footprint=GetCircleFootprint(0.1))
+        with self.assertRaises(ValueError):
+            self.table.AddSweptCells(primitives)
@@ -0,0 +1,100 @@
+import numpy
+import threading
+import unittest
+from herbpy.forcetorque import ForceTorqueBuffer, TareFuture, WaitForTares
+
+
+class ForceTorqueBufferTest(unittest.TestCase):
+    def test_GetLatest_EmptyReturnsNone(self):
+        self.assertIsNone(ForceTorqueBuffer().GetLatest())
+
+    def test_GetLatest_ReturnsNewestReading(self):
+        buffer = ForceTorqueBuffer(capacity=2)
+        buffer.Append(1., [1., 0., 0., 0., 0., 0.])
+        buffer.Append(2., [2., 0., 0., 0., 0., 0.])
+        sample = buffer.GetLatest()
+        self.assertEqual(sample.stamp, 2.)
+        numpy.testing.assert_array_almost_equal(sample.force, [2., 0., 0.])
+
+    def test_GetHistory_KeepsNewestReadings(self):
+        buffer = ForceTorqueBuffer(capacity=2)
+        for stamp in [1., 2., 3.]:
+            buffer.Append(stamp, numpy.repeat(stamp, 6))
+        stamps, wrenches = buffer.GetHistory()
+        numpy.testing.assert_array_almost_equal(stamps, [2., 3.])
+        numpy.testing.assert_array_almost_equal(wrenches[:, 0], [2., 3.])
+
+        stamps, _ = buffer.GetHistory(since=2.)
+        numpy.testing.assert_array_almost_equal(stamps, [3.])
+
+    def test_WaitForNewer_TimesOut(self):
+        buffer = ForceTorqueBuffer()
+        buffer.Append(1., numpy.zeros(6))
+        self.assertIsNone(buffer.WaitForNewer(1., timeout=0.01))
+
+    def test_WaitForNewer_WakesOnAppend(self):
+        buffer = ForceTorqueBuffer()
+        timer = threading.Timer(0.05, buffer.Append, args=(1., numpy.ones(6)))
+        timer.start()
+        sample = buffer.WaitForNewer(timeout=1.)
+        timer.join()
+        self.assertEqual(sample.stamp, 1.)
+
+    def test_Append_FiltersReadings(self):
+        buffer = ForceTorqueBuffer(cutoff_frequency=1.)
+        buffer.Append(0., numpy.zeros(6))
+        buffer.Append(0.01, numpy.ones(6))
+        sample = buffer.GetLatest()
+        self.assertTrue(0. < sample.filtered[0] < 0.1)
+        self.assertEqual(sample.wrench[0], 1.)
+
+    def test_SoftTare_SubtractsWindowMean(self):
+        buffer = ForceTorqueBuffer()
+        buffer.Append(0., numpy.repeat(5., 6))
+        buffer.Append(1., numpy.repeat(1., 6))
+        buffer.Append(1.05, numpy.repeat(3., 6))
+        bias = buffer.SoftTare(duration=0.1)
+        numpy.testing.assert_array_almost_equal(bias, numpy.repeat(2., 6))
+
+        buffer.Append(2., numpy.repeat(2., 6))
+        numpy.testing.assert_array_almost_equal(buffer.GetLatest().wrench,
+                                                numpy.zeros(6))
+
+    def test_SoftTare_ReplacesPreviousBias(self):
+        buffer = ForceTorqueBuffer()
+        buffer.Append(0., numpy.repeat(1., 6))
+        buffer.Append(0.05, numpy.repeat(3., 6))
+        numpy.testing.assert_array_almost_equal(
+            buffer.SoftTare(duration=0.1), numpy.repeat(2., 6))
+
+        # Both readings were taken before the first tare, so taring again
+        # over the same window gives the same bias.
+        numpy.testing.assert_array_almost_equal(
+            buffer.SoftTare(duration=0.1), numpy.repeat(2., 6))
+
+        buffer.Append(0.1, numpy.repeat(5., 6))
+        numpy.testing.assert_array_almost_equal(
+            buffer.SoftTare(duration=0.1), numpy.repeat(4., 6))
+        buffer.Append(0.2, numpy.repeat(4., 6))
+        numpy.testing.assert_array_almost_equal(buffer.GetLatest().wrench,
+                                                numpy.zeros(6))
+
+
+class TareFutureTest(unittest.TestCase):
+    def test_result_ReturnsValue(self):
+        future = TareFuture(lambda: 42)
+        self.assertEqual(future.result(timeout=1.), 42)
+        self.assertTrue(future.done())
+
+    def test_result_RaisesException(self):
+        def Fail():
+            raise ValueError('tare failed')
+        future = TareFuture(Fail)
+        self.assertRaises(ValueError, future.result, 1.)
+
+    def test_WaitForTares_RunsConcurrently(self):
+        import time
+        start_time = time.time()
+        futures = [TareFuture(lambda: time.sleep(0.2)) for _ in range(2)]
+        WaitForTares(futures, timeout=1.)
+        self.assertLess(time.time() - start_time, 0.35)
@@ -0,0 +1,148 @@
+import numpy
+import threading
+import time
+import unittest
+from herbpy.ftguard import ForceTorqueGuard
+
+
+class FakeSample(object):
+    def __init__(self, force, torque=(0., 0., 0.), stamp=1.):
+        self.force = numpy.array(force, dtype=float)
+        self.torque = numpy.array(torque, dtype=float)
+        self.stamp = stamp
+
+
+class FakeSubscriber(object):
+    def __init__(self):
+        self.callbacks = []
+
+    def AddCallback(self, callback):
+        self.callbacks.append(callback)
+
+    def RemoveCallback(self, callback):
+        self.callbacks.remove(callback)
+
+    def Publish(self, sample):
+        for callback in self.callbacks:
+            callback(sample)
+
+
+class FakeHand(object):
+    def __init__(self):
+        self.subscriber = FakeSubscriber()
+
+    def GetName(self):
+        return 'hand'
+
+    def GetForceTorqueSubscriber(self):
+        return self.subscriber
+
+
+class FakePublisher(object):
+    def __init__(self):
+        self.messages = []
+        self.unregistered = False
+        self.num_connections = 1
+
+    def get_num_connections(self):
+        return self.num_connections
+
+    def publish(self, message):
+        self.messages.append(message)
+
+    def unregister(self):
+        self.unregistered = True
+
+
+class FakeGuard(ForceTorqueGuard):
+    def GetCancelPublisher(self, controller):
+        return self._publishers.setdefault(controller, FakePublisher())
+
+    def _CreateCancelMessage(self):
+        return 'cancel'
+
+    def _GetTime(self):
+        return 1.25
+
+
+class ForceTorqueGuardTest(unittest.TestCase):
+    def setUp(self):
+        self.hand = FakeHand()
+        self.guard = FakeGuard(self.hand)
+        self.publisher = self.guard.GetCancelPublisher('right_trajectory_controller')
+
+    def test_OnSample_IgnoredWhileDisarmed(self):
+        self.hand.subscriber.Publish(FakeSample([100., 0., 0.]))
+        self.assertFalse(self.guard.IsTriggered())
+        self.assertEqual(self.publisher.messages, [])
+
+    def test_OnSample_CancelsOnForceMagnitude(self):
+        self.guard.Arm(['right_trajectory_controller'], 5., [10., 10., 10.])
+        self.hand.subscriber.Publish(FakeSample([3., 3., 0.]))
+        self.assertFalse(self.guard.IsTriggered())
+
+        self.hand.subscriber.Publish(FakeSample([4., 3., 0.], stamp=1.))
+        self.assertTrue(self.guard.IsTriggered())
+        self.assertEqual(self.publisher.messages, ['cancel'])
+
+        contact = self.guard.Disarm()
+        self.assertAlmostEqual(contact.latency, 0.25)
+        numpy.testing.assert_array_equal(contact.force, [4., 3., 0.])
+
+    def test_OnSample_CancelsOnlyOnce(self):
+        self.guard.Arm(['right_trajectory_controller'], 5., [10., 10., 10.])
+        self.hand.subscriber.Publish(FakeSample([10., 0., 0.]))
+        self.hand.subscriber.Publish(FakeSample([10., 0., 0.]))
+        self.assertEqual(len(self.publisher.messages), 1)
+
+    def test_IsExceeded_ChecksForceAlongDirection(self):
+        self.guard.Arm(['right_trajectory_controller'], 5., [10., 10., 10.],
+                       force_direction=[0., 0., 2.])
+        self.assertFalse(self.guard._IsExceeded([10., 0., 0.], [0., 0., 0.]))
+        self.assertFalse(self.guard._IsExceeded([0., 0., -10.], [0., 0., 0.]))
+        self.assertTrue(self.guard._IsExceeded([0., 0., 5.], [0., 0., 0.]))
+
+    def test_IsExceeded_ChecksEachTorqueAxis(self):
+        self.guard.Arm(['right_trajectory_controller'], 5., [1., 2., 3.])
+        self.assertFalse(self.guard._IsExceeded([0., 0., 0.], [0.9, -1.9, 2.9]))
+        self.assertTrue(self.guard._IsExceeded([0., 0., 0.], [0., -2., 0.]))
+
+    def test_Disarm_StopsChecking(self):
+        self.guard.Arm(['right_trajectory_controller'], 5., [10., 10., 10.])
+        self.assertIsNone(self.guard.Disarm())
+        self.hand.subscriber.Publish(FakeSample([10., 0., 0.]))
+        self.assertFalse(self.guard.IsTriggered())
+
+    def test_Shutdown_UnregistersPublishers(self):
+        self.guard.Shutdown()
+        self.assertTrue(self.publisher.unregistered)
+        self.assertEqual(self.hand.subscriber.callbacks, [])
+
+    def test_Init_CreatesPublishers(self):
+        guard = FakeGuard(self.hand, controllers=['left_trajectory_controller',
+                                                  'bimanual_trajectory_controller'])
+        self.assertEqual(sorted(guard._publishers),
+                         ['bimanual_trajectory_controller',
+                          'left_trajectory_controller'])
+
+    def test_Arm_WaitsForConnections(self):
+        self.publisher.num_connections = 0
+
+        def Connect():
+            time.sleep(0.05)
+            self.publisher.num_connections = 1
+
+        thread = threading.Thread(target=Connect)
+        thread.start()
+        start_time = time.time()
+        self.guard.Arm(['right_trajectory_controller'], 5., [10., 10., 10.])
+        thread.join()
+        self.assertGreaterEqual(time.time() - start_time, 0.04)
+        self.assertLess(time.time() - start_time, 0.5)
+
+    def test_Arm_StopsWaitingAfterTimeout(self):
+        self.publisher.num_connections = 0
+        self.guard.Arm(['right_trajectory_controller'], 5., [10., 10., 10.],
+                       connection_timeout=0.05)
+        self.hand.subscriber.Publish(FakeSample([10., 0., 0.]))
+        self.assertTrue(self.guard.IsTriggered())
@@ -0,0 +1,84 @@
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+from herbpy.graspeval import ComputeGraspQuality, GraspTable, LoadPreshapes
+
+
+def _GetRingContacts(num_contacts, radius=0.05):
+    """Contacts spread evenly around a cylinder, pointing at its axis."""
+    angles = 2. * numpy.pi * numpy.arange(num_contacts) / num_contacts
+    positions = radius * numpy.column_stack((numpy.cos(angles),
+                                             numpy.sin(angles),
+                                             numpy.zeros(num_contacts)))
+    return numpy.hstack((positions, -positions / radius))
+
+
+class GraspQualityTest(unittest.TestCase):
+    def test_ComputeGraspQuality_OneContactIsZero(self):
+        quality = ComputeGraspQuality(_GetRingContacts(1), numpy.zeros(3), 0.1)
+        self.assertEqual(quality, 0.)
+
+    def test_ComputeGraspQuality_MoreFrictionIsBetter(self):
+        contacts = _GetRingContacts(3)
+        low = ComputeGraspQuality(contacts, numpy.zeros(3), 0.1, friction=0.2)
+        high = ComputeGraspQuality(contacts, numpy.zeros(3), 0.1, friction=0.8)
+        self.assertGreater(low, 0.)
+        self.assertGreater(high, low)
+
+
+class GraspTableTest(unittest.TestCase):
+    def setUp(self):
+        num_poses = 3
+        poses = numpy.tile(numpy.eye(4), (num_poses, 1, 1))
+        poses[:, 0, 3] = numpy.arange(num_poses)
+        in_contact = numpy.ones((num_poses, 2, 3), dtype=bool)
+        in_contact[2, 1] = [True, False, False]
+        self._table = GraspTable(
+            poses, ['bowl_grasp', 'glass_grasp'], numpy.zeros((2, 4)),
+            numpy.zeros((num_poses, 2, 4)), in_contact,
+            quality=[[0.1, 0.3], [0.5, 0.2], [0.4, 0.9]],
+            collision=[[False, False], [False, True], [False, False]],
+            metadata={'object': 'glass'})
+
+    def test_GetGrasps_SortsAndFilters(self):
+        pose_indices, preshape_indices = self._table.GetGrasps()
+        # (1, 1) collides and (2, 1) has only one finger in contact.
+        numpy.testing.assert_array_equal(pose_indices, [1, 2, 0, 0])
+        numpy.testing.assert_array_equal(preshape_indices, [0, 0, 1, 0])
+
+        pose_indices, _ = self._table.GetGrasps(preshape='bowl_grasp',
+                                                min_quality=0.2)
+        numpy.testing.assert_array_equal(pose_indices, [1, 2])
+
+    def test_GetHandPoses_TransformsToWorld(self):
+        obj_pose = numpy.eye(4)
+        obj_pose[2, 3] = 1.
+        poses, preshapes = self._table.GetHandPoses(obj_pose, max_count=1)
+        numpy.testing.assert_array_almost_equal(poses[0, 0:3, 3], [1., 0., 1.])
+        self.assertEqual(preshapes.shape, (1, 4))
+
+    def test_Save_RoundTrips(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'grasps', 'glass.npz')
+            self._table.Save(path)
+            table = GraspTable.Load(path)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(table.preshape_names, self._table.preshape_names)
+        self.assertEqual(table.metadata, {'object': 'glass'})
+        numpy.testing.assert_array_equal(table.collision, self._table.collision)
+        numpy.testing.assert_array_almost_equal(table.quality,
+                                                self._table.quality)
+
+    def test_LoadPreshapes_ReadsNamedPreshapes(self):
+        path = os.path.join(os.path.dirname(__file__), '..', 'config',
+                            'barrett_preshapes.yaml')
+        preshapes = LoadPreshapes(path, names=['glass_grasp', 'open'])
+        self.assertEqual(list(preshapes.keys()), ['glass_grasp', 'open'])
+        numpy.testing.assert_array_almost_equal(
+            preshapes['glass_grasp'], [0.488, 0.488, 0.488, 0.])
+        self.assertRaises(ValueError, LoadPreshapes, path, ['missing'])
@@ -66,3 +66,48 @@ class BarrettHandTest(unittest.TestCase):
         self._robot.WaitForController(0)
         numpy.testing.assert_array_almost_equal(
             self._robot.GetDOFValues(self._hand.GetIndices()), after)
+
+    def test_ClosingSimulator_NoBodiesClosesFully(self):
+        self._robot.SetDOFValues(numpy.zeros(4), self._hand.GetIndices())
+        simulator = self._hand.GetClosingSimulator()
+        result = simulator.Close(bodies=[])
+
+        numpy.testing.assert_array_almost_equal(
+            result.dof_values[0:3], simulator.upper)
+        self.assertEqual(result.in_contact, [False, False, False])
+        numpy.testing.assert_array_almost_equal(
+            self._hand.GetDOFValues(), numpy.zeros(4))
+
+    def test_ClosingSimulator_DefaultBodiesIncludeRobotLinks(self):
+        simulator = self._hand.GetClosingSimulator()
+        with self._env:
+            bodies = simulator.GetDefaultBodies()
+        hand_links = self._wam.GetChildLinks()
+        left_links = self._robot.left_arm.GetChildLinks()
+
+        self.assertNotIn(self._robot, bodies)
+        self.assertFalse(any(link in bodies for link in hand_links))
+        self.assertTrue(any(link in bodies for link in left_links))
+
+    def test_ClosingSimulator_StopsAtObject(self):
+        import openravepy
+
+        self._robot.SetDOFValues(numpy.zeros(4), self._hand.GetIndices())
+        box = openravepy.RaveCreateKinBody(self._env, '')
+        box.SetName('closing_box')
+        box.InitFromBoxes(numpy.array([[0., 0., 0., 0.02, 0.02, 0.02]]), True)
+        self._env.Add(box)
+
+        try:
+            box.SetTransform(self._wam.GetEndEffectorTransform())
+            simulator = self._hand.GetClosingSimulator()
+            result = simulator.Close(bodies=box)
+
+            for i, contacts in enumerate(result.contacts):
+                if contacts:
+                    self.assertLess(result.dof_values[i], simulator.upper[i])
+                else:
+                    self.assertAlmostEqual(result.dof_values[i],
+                                           simulator.upper[i])
+        finally:
+            self._env.Remove(box)
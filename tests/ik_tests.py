@@ -0,0 +1,35 @@
+import numpy
+import unittest
+from herbpy.ik import IkSolutionCache, QuantizePose
+
+
+class QuantizePoseTest(unittest.TestCase):
+    def test_QuantizePose_NearbyPosesShareKey(self):
+        pose = numpy.eye(4)
+        pose[0:3, 3] = [0.5, 0.2, 1.0]
+        nearby = pose.copy()
+        nearby[0, 3] += 1e-4
+        self.assertEqual(QuantizePose(pose), QuantizePose(nearby))
+
+    def test_QuantizePose_DistantPosesDiffer(self):
+        pose = numpy.eye(4)
+        other = pose.copy()
+        other[2, 3] += 0.01
+        self.assertNotEqual(QuantizePose(pose), QuantizePose(other))
+
+
+class IkSolutionCacheTest(unittest.TestCase):
+    def test_Get_MissingReturnsNone(self):
+        cache = IkSolutionCache(capacity=2)
+        self.assertIsNone(cache.Get('a'))
+        self.assertEqual(cache.misses, 1)
+
+    def test_Put_EvictsLeastRecentlyUsed(self):
+        cache = IkSolutionCache(capacity=2)
+        cache.Put('a', 1)
+        cache.Put('b', 2)
+        cache.Get('a')
+        cache.Put('c', 3)
+        self.assertEqual(cache.Get('a'), 1)
+        self.assertIsNone(cache.Get('b'))
+        self.assertEqual(cache.Get('c'), 3)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from herbpy.ikcache import IkDatabaseCache, _AtomicCopy
+
+
+class FakeManipulator(object):
+    def __init__(self, kinematics_hash):
+        self.kinematics_hash = kinematics_hash
+
+    def GetKinematicsStructureHash(self):
+        return self.kinematics_hash
+
+
+class FakeIkModel(object):
+    def __init__(self, path):
+        self.path = path
+
+    def getfilename(self, read):
+        return self.path
+
+
+class IkDatabaseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.shared = os.path.join(self.directory, 'shared')
+        self.cache = IkDatabaseCache(self.shared)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_GetKey_DependsOnKinematicsTypeAndFreeJoints(self):
+        manip = FakeManipulator('abc123')
+        key = self.cache.GetKey(manip, 'Transform6D', [2])
+        self.assertEqual(key, os.path.join('abc123', 'Transform6D.free_2.so'))
+        self.assertNotEqual(key, self.cache.GetKey(manip, 'Transform6D', [3]))
+        self.assertNotEqual(key, self.cache.GetKey(
+            FakeManipulator('def456'), 'Transform6D', [2]))
+        self.assertTrue(self.cache.GetKey(manip, 'Transform6D', [])
+                        .endswith('free_none.so'))
+
+    def test_Fetch_MissesWithoutDatabase(self):
+        ikmodel = FakeIkModel(os.path.join(self.directory, 'local', 'ik.so'))
+        self.assertFalse(self.cache.Fetch(ikmodel, 'abc/ik.so'))
+        self.assertFalse(IkDatabaseCache(None).Fetch(ikmodel, 'abc/ik.so'))
+
+    def test_StoreAndFetch_CopyDatabase(self):
+        generated = os.path.join(self.directory, 'generated.so')
+        with open(generated, 'wb') as database:
+            database.write(b'ikfast')
+        self.cache.Store(FakeIkModel(generated), 'abc/ik.so')
+
+        local = os.path.join(self.directory, 'local', 'ik.so')
+        self.assertTrue(self.cache.Fetch(FakeIkModel(local), 'abc/ik.so'))
+        with open(local, 'rb') as database:
+            self.assertEqual(database.read(), b'ikfast')
+
+    def test_AtomicCopy_LeavesNoTemporaryFileOnFailure(self):
+        destination = os.path.join(self.directory, 'copy', 'ik.so')
+        with self.assertRaises(IOError):
+            _AtomicCopy(os.path.join(self.directory, 'missing.so'), destination)
+        self.assertEqual(os.listdir(os.path.dirname(destination)), [])
+
+    def test_GenerateAsync_SharesGeneration(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+        done = threading.Semaphore(0)
+
+        def generate():
+            calls.append(None)
+            started.set()
+            release.wait(5.)
+
+        def callback(success):
+            results.append(success)
+            done.release()
+
+        self.cache.GenerateAsync('abc/ik.so', generate, callback)
+        started.wait(5.)
+        self.cache.GenerateAsync('abc/ik.so', generate, callback)
+        release.set()
+        done.acquire()
+        done.acquire()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [True, True])
@@ -0,0 +1,39 @@
+import numpy
+import unittest
+from herbpy.jointstate import JointStateHistory
+
+
+class JointStateHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self._history = JointStateHistory(num_dofs=2, capacity=4)
+
+    def test_GetStateAt_EmptyThrows(self):
+        self.assertRaises(ValueError, self._history.GetStateAt, 0.)
+
+    def test_GetStateAt_InterpolatesBetweenStates(self):
+        self._history.Append(1., [0., 0.])
+        self._history.Append(2., [1., -2.])
+        numpy.testing.assert_array_almost_equal(
+            self._history.GetStateAt(1.25), [0.25, -0.5])
+
+    def test_GetStateAt_ClampsOutsideWindow(self):
+        self._history.Append(1., [0., 0.])
+        self._history.Append(2., [1., -2.])
+        numpy.testing.assert_array_almost_equal(
+            self._history.GetStateAt(0.), [0., 0.])
+        numpy.testing.assert_array_almost_equal(
+            self._history.GetStateAt(3.), [1., -2.])
+
+    def test_GetStateAt_SelectsDOFs(self):
+        self._history.Append(1., [0., 0.])
+        self._history.Append(2., [1., -2.])
+        numpy.testing.assert_array_almost_equal(
+            self._history.GetStateAt(1.5, dof_indices=[1]), [-1.])
+
+    def test_Append_OverwritesOldestState(self):
+        for i in range(6):
+            self._history.Append(float(i), [float(i), 0.])
+        numpy.testing.assert_array_almost_equal(
+            self._history.GetStamps(), [2., 3., 4., 5.])
+        numpy.testing.assert_array_almost_equal(
+            self._history.GetStateAt(0.), [2., 0.])
@@ -0,0 +1,29 @@
+import numpy
+import unittest
+from herbpy.limits import GetProfile, LimitProfile
+
+
+class LimitProfileTest(unittest.TestCase):
+    def setUp(self):
+        self._velocities = numpy.array([1., 2.])
+        self._accelerations = numpy.array([4., 8.])
+
+    def test_GetLimits_ScalesNominalLimits(self):
+        velocities, accelerations = LimitProfile(velocity_scale=0.5).GetLimits(
+            self._velocities, self._accelerations)
+        numpy.testing.assert_array_almost_equal(velocities, [0.5, 1.])
+        numpy.testing.assert_array_almost_equal(accelerations, [2., 4.])
+
+    def test_GetLimits_MinAccelTime(self):
+        profile = LimitProfile(velocities=[3., 3.], min_accel_time=0.5)
+        velocities, accelerations = profile.GetLimits(
+            self._velocities, self._accelerations)
+        numpy.testing.assert_array_almost_equal(velocities, [3., 3.])
+        numpy.testing.assert_array_almost_equal(accelerations, [6., 6.])
+
+    def test_GetProfile_UnknownNameThrows(self):
+        self.assertRaises(ValueError, GetProfile, 'warp')
+
+    def test_GetProfile_PassesThroughProfiles(self):
+        profile = LimitProfile()
+        self.assertIs(GetProfile(profile), profile)
@@ -0,0 +1,66 @@
+import numpy
+import os
+import unittest
+from herbpy.primitivegen import (
+    GeneratePrimitives, GetCircleFootprint, GetFootprintCells,
+    GetPrimitiveTemplates, InterpolatePrimitive)
+from herbpy.primitives import PrimitiveSet
+
+YAML_PATH = os.path.join(os.path.dirname(__file__), '..', 'config',
+                         'base_planner_parameters.yaml')
+
+
+class PrimitiveGeneratorTest(unittest.TestCase):
+    def test_GeneratePrimitives_MatchesShippedPrimitives(self):
+        expected = PrimitiveSet.LoadYaml(YAML_PATH)
+        actual = GeneratePrimitives(numangles=16, cellsize=0.1)
+
+        numpy.testing.assert_array_equal(actual.angles, expected.angles)
+        numpy.testing.assert_array_equal(actual.weights, expected.weights)
+        numpy.testing.assert_array_equal(actual.offsets, expected.offsets)
+        numpy.testing.assert_array_almost_equal(actual.poses, expected.poses)
+
+    def test_GeneratePrimitives_EndsOnLattice(self):
+        for numangles in [8, 24, 32]:
+            primitives = GeneratePrimitives(numangles=numangles, cellsize=0.05)
+            templates = GetPrimitiveTemplates(numangles)
+            heading_step = 2. * numpy.pi / numangles
+
+            for index in range(primitives.num_primitives):
+                angle = primitives.angles[index]
+                dx, dy, dtheta, _ = templates[angle][index % 7]
+                poses = primitives.GetPoses(index)
+                numpy.testing.assert_array_almost_equal(
+                    poses[-1, 0:2], [0.05 * dx, 0.05 * dy])
+                end_angle = (angle + dtheta) % numangles * heading_step
+                self.assertAlmostEqual(
+                    numpy.cos(poses[-1, 2] - end_angle), 1.)
+                # Intermediate poses are dense enough for collision checks.
+                steps = numpy.diff(poses[:, 0:2], axis=0)
+                self.assertLess(numpy.max(numpy.hypot(steps[:, 0], steps[:, 1])),
+                                0.07)
+
+    def test_InterpolatePrimitive_TurnInPlace(self):
+        poses = InterpolatePrimitive(0., (0, 0), 1, 0.1, 16,
+                                     angular_resolution=0.1)
+        numpy.testing.assert_array_almost_equal(poses[:, 0:2], 0.)
+        self.assertAlmostEqual(poses[-1, 2], 2. * numpy.pi / 16)
+        self.assertEqual(len(poses), 5)
+
+    def test_GetFootprintCells_SweepsAlongPrimitive(self):
+        footprint = GetCircleFootprint(0.15)
+        cells = GetFootprintCells(footprint, numpy.zeros((1, 3)), 0.1)
+        self.assertEqual(len(cells), 9)
+
+        poses = InterpolatePrimitive(0., (8, 0), 0, 0.1, 16)
+        cells = GetFootprintCells(footprint, poses, 0.1)
+        numpy.testing.assert_array_equal(
+            numpy.unique(cells[:, 0]), numpy.arange(-1, 10))
+        numpy.testing.assert_array_equal(
+            numpy.unique(cells[:, 1]), [-1, 0, 1])
+
+    def test_GeneratePrimitives_StoresSweptCells(self):
+        primitives = GeneratePrimitives(footprint=GetCircleFootprint(0.15))
+        for index in range(primitives.num_primitives):
+            cells = primitives.GetSweptCells(index)
+            self.assertTrue(any((cells == [0, 0]).all(axis=1)))
@@ -0,0 +1,66 @@
+import numpy
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from herbpy.primitives import LoadPrimitives, PrimitiveSet
+
+YAML_PATH = os.path.join(os.path.dirname(__file__), '..', 'config',
+                         'base_planner_parameters.yaml')
+
+
+class PrimitiveSetTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._primitives = PrimitiveSet.LoadYaml(YAML_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_LoadYaml_ReadsAllPrimitives(self):
+        self.assertEqual(self._primitives.numangles, 16)
+        self.assertAlmostEqual(self._primitives.cellsize, 0.1)
+        self.assertEqual(self._primitives.num_primitives, 16 * 7)
+        numpy.testing.assert_array_equal(
+            self._primitives.GetPrimitiveIndices(0), numpy.arange(7))
+        numpy.testing.assert_array_almost_equal(
+            self._primitives.GetPoses(0), [[0., 0., 0.], [0.05, 0., 0.],
+                                           [0.1, 0., 0.]])
+
+    def test_Save_RoundTrips(self):
+        path = os.path.join(self._directory, 'nested', 'primitives.prim')
+        self._primitives.Save(path)
+
+        for mmap in [True, False]:
+            loaded = PrimitiveSet.Load(path, mmap=mmap)
+            self.assertEqual(loaded.ToParameters(),
+                             self._primitives.ToParameters())
+
+    def test_Load_RejectsOtherFiles(self):
+        path = os.path.join(self._directory, 'other.prim')
+        with open(path, 'wb') as other_file:
+            other_file.write(b'\0' * 128)
+        self.assertRaises(ValueError, PrimitiveSet.Load, path)
+
+    def test_LoadPrimitives_PrefersNewerBinary(self):
+        yaml_path = os.path.join(self._directory, 'primitives.yaml')
+        binary_path = os.path.join(self._directory, 'primitives.prim')
+        shutil.copy(YAML_PATH, yaml_path)
+
+        # The first load converts the YAML file.
+        primitives = LoadPrimitives(yaml_path, binary_path=binary_path)
+        self.assertTrue(os.path.exists(binary_path))
+        self.assertEqual(primitives.num_primitives,
+                         self._primitives.num_primitives)
+
+        # A newer binary file is used as is.
+        PrimitiveSet(0.2, 16, 1., 1., [0], [1.], [0, 1],
+                     [[0., 0., 0.]]).Save(binary_path)
+        self.assertEqual(LoadPrimitives(yaml_path, binary_path).cellsize, 0.2)
+
+        # An older binary file is replaced.
+        old_time = time.time() - 100.
+        os.utime(binary_path, (old_time, old_time))
+        self.assertEqual(LoadPrimitives(yaml_path, binary_path).cellsize, 0.1)
+        self.assertEqual(PrimitiveSet.Load(binary_path).cellsize, 0.1)
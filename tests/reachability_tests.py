@@ -0,0 +1,70 @@
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+from herbpy.reachability import (
+    GetOrientationBins, InverseReachabilityMap, ReachabilityMap)
+
+
+class ReachabilityMapTest(unittest.TestCase):
+    def setUp(self):
+        rotations = GetOrientationBins(num_directions=6, num_rolls=2)
+        reachable = numpy.zeros((8, len(rotations)), dtype=bool)
+        reachable[7, 0] = True
+        self._map = ReachabilityMap(origin=[0., 0., 0.], resolution=0.5,
+                                    shape=(2, 2, 2), rotations=rotations,
+                                    reachable=reachable)
+
+    def _GetPose(self, position, bin_index):
+        pose = numpy.eye(4)
+        pose[0:3, 0:3] = self._map.rotations[bin_index]
+        pose[0:3, 3] = position
+        return pose
+
+    def test_GetOrientationBins_AreRotations(self):
+        rotations = GetOrientationBins(num_directions=8, num_rolls=3)
+        self.assertEqual(rotations.shape, (24, 3, 3))
+        for rotation in rotations:
+            numpy.testing.assert_array_almost_equal(
+                numpy.dot(rotation.T, rotation), numpy.eye(3))
+            self.assertAlmostEqual(numpy.linalg.det(rotation), 1.)
+
+    def test_IsReachable_MatchesCellAndBin(self):
+        poses = [self._GetPose([0.75, 0.75, 0.75], 0),
+                 self._GetPose([0.75, 0.75, 0.75], 1),
+                 self._GetPose([0.25, 0.25, 0.25], 0),
+                 self._GetPose([2., 0., 0.], 0)]
+        numpy.testing.assert_array_equal(self._map.IsReachable(poses),
+                                         [True, False, False, False])
+
+    def test_SaveLoad_RoundTrips(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'map.npz')
+            self._map.Save(path)
+            loaded = ReachabilityMap.Load(path)
+        finally:
+            shutil.rmtree(directory)
+
+        numpy.testing.assert_array_equal(loaded.reachable, self._map.reachable)
+        numpy.testing.assert_array_almost_equal(loaded.rotations,
+                                                self._map.rotations)
+        self.assertEqual(loaded.shape, self._map.shape)
+
+    def test_GetBasePoses_ReachesHandPose(self):
+        inverse = InverseReachabilityMap(self._map)
+        hand_pose = self._GetPose([2., 1., 0.75], 0)
+        poses, scores = inverse.GetBasePoses(hand_pose, tilt_tolerance=numpy.pi)
+        self.assertEqual(len(poses), 1)
+
+        scores = inverse.ScoreBasePoses(poses, [hand_pose])
+        self.assertEqual(scores[0], 1.)
+
+    def test_InverseReachabilityMap_StoresRotationsAndTranslations(self):
+        inverse = InverseReachabilityMap(self._map)
+        num_entries = numpy.count_nonzero(self._map.reachable)
+        self.assertEqual(inverse.rotations.shape, (num_entries, 3, 3))
+        self.assertEqual(inverse.translations.shape, (num_entries, 3))
+        self.assertEqual(inverse.rotations.dtype, numpy.float32)
+        self.assertEqual(inverse.translations.dtype, numpy.float32)
@@ -0,0 +1,53 @@
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+from herbpy.recording import (
+    JOINT_STATES, LEFT_FT, ReplaySource, StreamLog, StreamLogWriter)
+
+
+class StreamLogTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, 'log.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_StreamLog_ReadsAppendedRecords(self):
+        writer = StreamLogWriter(self._path, width=8, chunk_size=4)
+        for i in range(10):
+            writer.Append(JOINT_STATES, float(i), numpy.arange(8.) + i)
+        writer.Append(LEFT_FT, 10., numpy.ones(6))
+        writer.Close()
+
+        log = StreamLog(self._path)
+        self.assertEqual(len(log), 11)
+
+        stamps, values = log.GetStream(JOINT_STATES)
+        numpy.testing.assert_array_equal(stamps, numpy.arange(10.))
+        numpy.testing.assert_array_equal(values[3], numpy.arange(8.) + 3)
+
+        stamps, values = log.GetStream(LEFT_FT)
+        numpy.testing.assert_array_equal(values[0, :6], numpy.ones(6))
+        self.assertTrue(numpy.isnan(values[0, 6:]).all())
+
+    def test_StreamLog_IgnoresUnusedSpaceOfUnclosedLog(self):
+        writer = StreamLogWriter(self._path, width=6, chunk_size=16)
+        writer.Append(LEFT_FT, 1., numpy.zeros(6))
+        writer.Flush()
+        self.assertEqual(len(StreamLog(self._path)), 1)
+        writer.Close()
+
+    def test_ReplaySource_UpdatesForceTorque(self):
+        writer = StreamLogWriter(self._path, width=6)
+        writer.Append(LEFT_FT, 0., [1., 2., 3., 4., 5., 6.])
+        writer.Append(LEFT_FT, 0.1, [6., 5., 4., 3., 2., 1.])
+        writer.Close()
+
+        replay = ReplaySource(self._path, speed=float('inf'))
+        replay.Run()
+        force, torque = replay.ft_sources[LEFT_FT].GetForceTorque()
+        numpy.testing.assert_array_equal(force, [6., 5., 4.])
+        numpy.testing.assert_array_equal(torque, [3., 2., 1.])
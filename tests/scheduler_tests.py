@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+from herbpy.scheduler import TickScheduler
+
+
+class CountingComponent(object):
+    def __init__(self, num_ticks):
+        self.num_ticks = num_ticks
+        self.ticks = 0
+        self.done = threading.Event()
+
+    def Tick(self, dt):
+        self.ticks += 1
+        if self.ticks >= self.num_ticks:
+            self.done.set()
+            return False
+        return True
+
+
+class ReactivatingComponent(object):
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.ticks = 0
+        self.done = threading.Event()
+
+    def Tick(self, dt):
+        self.ticks += 1
+        if self.ticks == 1:
+            # A new command arrives after this tick decided to stop, but
+            # before the scheduler removed the component.
+            self.scheduler.Activate(self)
+        else:
+            self.done.set()
+        return False
+
+
+class TickSchedulerTest(unittest.TestCase):
+    def test_Activate_StartsThreadLazily(self):
+        scheduler = TickScheduler(rate=200., idle_timeout=0.05)
+        self.assertFalse(scheduler.IsRunning())
+
+        component = CountingComponent(3)
+        scheduler.Activate(component)
+        self.assertTrue(component.done.wait(1.))
+        self.assertEqual(component.ticks, 3)
+
+    def test_Run_ExitsWhenIdle(self):
+        scheduler = TickScheduler(rate=200., idle_timeout=0.05)
+        component = CountingComponent(1)
+        scheduler.Activate(component)
+        self.assertTrue(component.done.wait(1.))
+
+        time.sleep(0.3)
+        self.assertFalse(scheduler.IsRunning())
+        self.assertEqual(scheduler.GetNumActive(), 0)
+
+    def test_Activate_TicksComponentsFromOneThread(self):
+        scheduler = TickScheduler(rate=200., idle_timeout=0.05)
+        components = [CountingComponent(5) for _ in range(4)]
+        for component in components:
+            scheduler.Activate(component)
+            scheduler.Activate(component)
+
+        for component in components:
+            self.assertTrue(component.done.wait(1.))
+            self.assertEqual(component.ticks, 5)
+
+    def test_Activate_DuringFinalTickKeepsTicking(self):
+        scheduler = TickScheduler(rate=200., idle_timeout=0.05)
+        component = ReactivatingComponent(scheduler)
+        scheduler.Activate(component)
+        self.assertTrue(component.done.wait(1.))
+        self.assertEqual(component.ticks, 2)
+
+        time.sleep(0.3)
+        self.assertEqual(scheduler.GetNumActive(), 0)
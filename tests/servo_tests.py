@@ -0,0 +1,59 @@
+import unittest
+from herbpy.servo import PeriodicExecutor, TargetStream
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class PeriodicExecutorTest(unittest.TestCase):
+    def test_Run_StopsAfterDuration(self):
+        executor = PeriodicExecutor(0.01)
+        times = []
+        executor.Run(times.append, duration=0.1)
+        self.assertTrue(9 <= len(times) <= 11)
+        self.assertEqual(executor.statistics.num_ticks, len(times))
+
+    def test_Run_StopsWhenStepReturnsFalse(self):
+        executor = PeriodicExecutor(0.001)
+        times = []
+
+        def step(elapsed):
+            times.append(elapsed)
+            return len(times) < 3
+
+        executor.Run(step)
+        self.assertEqual(len(times), 3)
+
+    def test_Run_SkipsOverrunTicks(self):
+        import time
+        executor = PeriodicExecutor(0.01)
+        statistics = executor.Run(lambda elapsed: time.sleep(0.025),
+                                  duration=0.1)
+        self.assertGreater(statistics.num_overruns, 0)
+        self.assertLess(statistics.num_ticks, 10)
+
+    def test_Constructor_RejectsNonPositivePeriod(self):
+        self.assertRaises(ValueError, PeriodicExecutor, 0.)
+
+
+class TargetStreamTest(unittest.TestCase):
+    def test_GetLatest_DrainsQueue(self):
+        queue = Queue()
+        stream = TargetStream(queue)
+        self.assertIsNone(stream.GetLatest())
+
+        queue.put([1., 2.])
+        queue.put([3., 4.])
+        self.assertEqual(list(stream.GetLatest()), [3., 4.])
+        self.assertEqual(list(stream.GetLatest()), [3., 4.])
+
+        queue.put(None)
+        stream.GetLatest()
+        self.assertTrue(stream.is_done)
+
+    def test_GetLatest_CallsFunction(self):
+        stream = TargetStream(lambda: [0.5])
+        self.assertEqual(list(stream.GetLatest()), [0.5])
+        self.assertFalse(stream.is_done)
@@ -0,0 +1,64 @@
+import numpy
+import unittest
+from herbpy.tracking import TrackingMonitor
+
+
+class FakeRobot(object):
+    def GetDOF(self):
+        return 3
+
+
+class TrackingMonitorTest(unittest.TestCase):
+    def setUp(self):
+        self.monitor = TrackingMonitor(FakeRobot(), rate=100., capacity=5,
+                                       max_lag=0.2)
+        self.monitor._dof_indices = [0, 2]
+
+    def test_GetSamples_UnrollsRingBuffer(self):
+        for i in range(7):
+            self.monitor._times[i % 5] = i
+            self.monitor._actual[i % 5, 0:2] = [i, -i]
+        self.monitor._num_samples = 7
+
+        times, actual = self.monitor._GetSamples()
+        numpy.testing.assert_array_equal(times, [2, 3, 4, 5, 6])
+        numpy.testing.assert_array_equal(actual[:, 1], [-2, -3, -4, -5, -6])
+
+    def test_GetSamples_BeforeWraparound(self):
+        self.monitor._times[0:3] = [0., 1., 2.]
+        self.monitor._num_samples = 3
+        times, actual = self.monitor._GetSamples()
+        numpy.testing.assert_array_equal(times, [0., 1., 2.])
+        self.assertEqual(actual.shape, (3, 2))
+
+    def test_ComputeLag_FindsShift(self):
+        t = numpy.arange(200) / 100.
+        commanded = numpy.column_stack((numpy.sin(t), numpy.cos(3. * t)))
+        actual = numpy.empty_like(commanded)
+        actual[:, 0] = numpy.sin(t - 0.05)
+        actual[:, 1] = numpy.cos(3. * (t - 0.12))
+
+        lag = self.monitor._ComputeLag(actual, commanded)
+        numpy.testing.assert_array_almost_equal(lag, [0.05, 0.12])
+
+    def test_ComputeOvershoot_FollowsFinalApproach(self):
+        # Joint 0 moves up and overshoots; joint 1 moves up and back down to
+        # its start and overshoots below it; joint 2 is held.
+        commanded = numpy.array([[0., 0., 1.],
+                                 [1., 1., 1.],
+                                 [1., 0., 1.],
+                                 [1., 0., 1.]])
+        actual = numpy.array([[0., 0., 1.],
+                              [1.2, 0.9, 1.],
+                              [1.1, -0.3, 1.1],
+                              [1., -0.1, 0.9]])
+
+        overshoot = self.monitor._ComputeOvershoot(actual, commanded)
+        numpy.testing.assert_array_almost_equal(overshoot, [0.2, 0.3, 0.])
+
+    def test_ComputeOvershoot_IgnoresEarlierExcursions(self):
+        # The dip below the goal happens before the final approach from below.
+        commanded = numpy.array([[0.], [-1.], [0.], [0.]])
+        actual = numpy.array([[0.], [-1.], [-0.1], [0.05]])
+        overshoot = self.monitor._ComputeOvershoot(actual, commanded)
+        numpy.testing.assert_array_almost_equal(overshoot, [0.05])
@@ -0,0 +1,90 @@
+import herbpy
+import numpy
+import openravepy
+import unittest
+from herbpy.validation import ValidateTrajectory
+
+env, robot = herbpy.initialize(sim=True)
+
+
+class ValidateTrajectoryTest(unittest.TestCase):
+    def setUp(self):
+        self._env, self._robot = env, robot
+        self._wam = robot.right_arm
+        self._indices = self._wam.GetArmIndices()
+        self._cspec = self._wam.GetArmConfigurationSpecification()
+        self._cspec.AddDeltaTimeGroup()
+
+    def _CreateTrajectory(self, waypoints, deltatime):
+        traj = openravepy.RaveCreateTrajectory(self._env, '')
+        traj.Init(self._cspec)
+        for i, dof_values in enumerate(waypoints):
+            waypoint = numpy.zeros(self._cspec.GetDOF())
+            self._cspec.InsertJointValues(
+                waypoint, dof_values, self._robot, self._indices, False)
+            self._cspec.InsertDeltaTime(waypoint, 0. if i == 0 else deltatime)
+            traj.Insert(i, waypoint)
+        return traj
+
+    def test_ValidateTrajectory_StartsAtCurrentConfiguration(self):
+        start = self._robot.GetDOFValues(self._indices)
+        traj = self._CreateTrajectory([start, start + 0.01], 1.)
+        report = ValidateTrajectory(self._robot, traj)
+        self.assertTrue(report.is_at_start)
+        self.assertTrue(report.is_timed)
+        self.assertAlmostEqual(report.duration, 1.)
+        self.assertIn(self._wam, report.manipulators)
+
+    def test_ValidateTrajectory_DifferentStartIsReported(self):
+        start = self._robot.GetDOFValues(self._indices)
+        traj = self._CreateTrajectory([start + 0.1, start + 0.2], 1.)
+        report = ValidateTrajectory(self._robot, traj)
+        self.assertFalse(report.is_at_start)
+        self.assertAlmostEqual(report.start_error, 0.1)
+
+    def test_ValidateTrajectory_VelocityViolationIsReported(self):
+        start = self._robot.GetDOFValues(self._indices)
+        velocity_limits = self._robot.GetDOFVelocityLimits(self._indices)
+        end = start.copy()
+        end[0] += 2. * velocity_limits[0] * 0.01
+        traj = self._CreateTrajectory([start, end], 0.01)
+        report = ValidateTrajectory(self._robot, traj)
+        self.assertFalse(report.IsWithinLimits())
+        self.assertIn(self._indices[0], report.velocity_violations)
+
+    def test_ValidateTrajectory_PositionViolationIsReported(self):
+        start = self._robot.GetDOFValues(self._indices)
+        lower_limits, upper_limits = self._robot.GetDOFLimits(self._indices)
+        end = start.copy()
+        end[1] = upper_limits[1] + 0.1 * (upper_limits[1] - lower_limits[1])
+        traj = self._CreateTrajectory([start, end], 100.)
+        report = ValidateTrajectory(self._robot, traj)
+        self.assertEqual(list(report.position_violations), [self._indices[1]])
+        self.assertFalse(report.velocity_violations)
+
+    def test_ValidateTrajectory_AccelerationViolationIsReported(self):
+        start = self._robot.GetDOFValues(self._indices)
+        velocity_limits = self._robot.GetDOFVelocityLimits(self._indices)
+        middle = start.copy()
+        middle[0] += 0.5 * velocity_limits[0] * 0.01
+        traj = self._CreateTrajectory([start, middle, start], 0.01)
+        report = ValidateTrajectory(self._robot, traj)
+        self.assertFalse(report.velocity_violations)
+        self.assertEqual(report.acceleration_violations[self._indices[0]][0], 1)
+
+    def test_ValidateTrajectory_ConstantVelocityHasNoAcceleration(self):
+        # Segments of different durations at the same velocity.
+        start = self._robot.GetDOFValues(self._indices)
+        velocity = 0.5 * self._robot.GetDOFVelocityLimits(self._indices)
+        traj = openravepy.RaveCreateTrajectory(self._env, '')
+        traj.Init(self._cspec)
+        for i, (time, deltatime) in enumerate([(0., 0.), (0.01, 0.01),
+                                               (0.03, 0.02)]):
+            waypoint = numpy.zeros(self._cspec.GetDOF())
+            self._cspec.InsertJointValues(waypoint, start + time * velocity,
+                                          self._robot, self._indices, False)
+            self._cspec.InsertDeltaTime(waypoint, deltatime)
+            traj.Insert(i, waypoint)
+
+        report = ValidateTrajectory(self._robot, traj)
+        self.assertTrue(report.IsWithinLimits())
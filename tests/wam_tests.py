@@ -3,6 +3,7 @@ PKG = 'herbpy'
 import roslib; roslib.load_manifest(PKG)
 import numpy, unittest
 import herbpy
+from herbpy.wam import FindFirstContact
 
 env, robot = herbpy.initialize(sim=True)
 
@@ -43,6 +44,39 @@ class WamTest(unittest.TestCase):
         self.assertRaises(Exception, self._wam.Servo, (velocity_limits, -0.1))
         self.assertRaises(Exception, self._wam.Servo, (velocity_limits,  0.0))
 
+    def test_CartesianServo_RespectsVelocityLimits(self):
+        servo = self._wam.GetCartesianServo()
+        velocities = servo.ComputeJointVelocities([10., 0., 0., 0., 0., 10.])
+        velocity_limits = self._wam.GetVelocityLimits()
+        self.assertTrue(numpy.all(numpy.abs(velocities) <= velocity_limits + 1e-6))
+
+    def test_CartesianServo_FollowsLimitProfile(self):
+        servo = self._wam.GetCartesianServo()
+        with self._wam.UseLimitProfile('careful'):
+            velocities = servo.ComputeJointVelocities([10., 0., 0., 0., 0., 10.])
+            velocity_limits = self._robot.GetDOFVelocityLimits(self._indices)
+        self.assertTrue(numpy.all(numpy.abs(velocities) <= velocity_limits + 1e-6))
+
+    def test_UseLimitProfile_RestoresLimits(self):
+        self._wam.SetLimitProfile('fast')
+        velocity_limits = self._robot.GetDOFVelocityLimits(self._indices)
+        with self._wam.UseLimitProfile('careful'):
+            numpy.testing.assert_array_almost_equal(
+                self._robot.GetDOFVelocityLimits(self._indices),
+                0.25 * velocity_limits)
+        numpy.testing.assert_array_almost_equal(
+            self._robot.GetDOFVelocityLimits(self._indices), velocity_limits)
+
+    def test_SetLimitProfile_ScalesAccelerationLimits(self):
+        self._wam.SetLimitProfile('fast')
+        numpy.testing.assert_array_almost_equal(
+            self._robot.GetDOFAccelerationLimits(self._indices),
+            2. * numpy.ones(self._num_dofs))
+        with self._wam.UseLimitProfile('careful'):
+            numpy.testing.assert_array_almost_equal(
+                self._robot.GetDOFAccelerationLimits(self._indices),
+                0.5 * numpy.ones(self._num_dofs))
+
     def test_SetVelocityLimits_SetsLimits(self):
         velocity_limits = 0.1 * numpy.ones(self._num_dofs)
         self._wam.SetVelocityLimits(velocity_limits, 0.3)
@@ -57,6 +91,29 @@ class WamTest(unittest.TestCase):
     def test_MoveUntilTouch_NonPositiveForceThrows(self):
         self.assertRaises(Exception, self._wam.MoveUntilTouch, (numpy.array([1., 0., 0.]), 0.1, 0.))
 
+class FindFirstContactTest(unittest.TestCase):
+    def test_FindFirstContact_BisectMatchesLinear(self):
+        for contact in [0.005, 0.237, 0.5, 0.999]:
+            check = lambda t: t >= contact
+            linear_free, linear_contact = FindFirstContact(check, 1., 0.01, 0.01)
+            bisect_free, bisect_contact = FindFirstContact(check, 1., 0.1, 0.001)
+
+            self.assertLess(bisect_free, contact)
+            self.assertGreaterEqual(bisect_contact, contact)
+            self.assertLessEqual(bisect_contact - bisect_free, 0.001)
+            self.assertLessEqual(abs(bisect_contact - linear_contact), 0.01)
+            self.assertGreaterEqual(bisect_free, linear_free)
+
+    def test_FindFirstContact_ChecksEnd(self):
+        self.assertEqual(FindFirstContact(lambda t: t >= 1., 1., 0.3, 0.001)[1], 1.)
+        self.assertEqual(FindFirstContact(lambda t: False, 1., 0.3, 0.001),
+                         (1., None))
+
+    def test_FindFirstContact_StartInCollision(self):
+        self.assertEqual(FindFirstContact(lambda t: True, 1., 0.1, 0.001),
+                         (None, 0.))
+
 if __name__ == '__main__':
     import rosunit
     rosunit.unitrun(PKG, 'test_wam', WamTest)
+    rosunit.unitrun(PKG, 'test_find_first_contact', FindFirstContactTest)